@@ -0,0 +1,5 @@
+from .synthetic_data import generate_dataset, dataset_paths, zipf_probabilities
+from .mock_llm import MockLLM, MockEmbeddings, MockLLMError
+from .mock_server import MockAPIServer
+
+__all__ = ['generate_dataset', 'dataset_paths', 'zipf_probabilities', 'MockLLM', 'MockEmbeddings', 'MockLLMError', 'MockAPIServer']
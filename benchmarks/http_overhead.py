@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+import requests
+from websocietysimulator.llm import InfinigenceLLM
+from websocietysimulator.llm.http import get_session
+from .mock_server import MockAPIServer
+
+logger = logging.getLogger("websocietysimulator")
+
+
+def _timing(elapsed: float, calls: int) -> Dict[str, float]:
+    # ms_per_call is wall-clock time divided by calls, so it reflects throughput at the concurrency
+    return {'seconds': elapsed, 'calls_per_second': calls / elapsed, 'ms_per_call': elapsed / calls * 1000}
+
+
+def _threaded(fn: Callable[[], Any], calls: int, concurrency: int) -> Dict[str, float]:
+    """Run a sync call from a pool of concurrency threads."""
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda _: fn(), range(concurrency)))  # warm up the threads and connections
+        start = time.perf_counter()
+        list(executor.map(lambda _: fn(), range(calls)))
+        return _timing(time.perf_counter() - start, calls)
+
+
+def _gathered(coro_fn: Callable[[], Any], calls: int, concurrency: int) -> Dict[str, float]:
+    """Run an async call with at most concurrency calls in flight."""
+    async def run() -> float:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                await coro_fn()
+
+        await asyncio.gather(*[one() for _ in range(concurrency)])  # warm up the connections
+        start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(calls)])
+        return time.perf_counter() - start
+
+    return _timing(asyncio.run(run()), calls)
+
+
+def _measure(llm: InfinigenceLLM, url: str, calls: int, concurrency: int) -> Dict[str, Any]:
+    embeddings = llm.get_embedding_model()
+    payload = {'model': 'bge-m3', 'input': ['benchmark text']}
+    messages = [{'role': 'user', 'content': 'Write a review.'}]
+    results = {
+        'embeddings': {
+            'unpooled_requests_post': _threaded(lambda: requests.post(url, json=payload), calls, concurrency),
+            'pooled_session_post': _threaded(lambda: get_session().post(url, json=payload), calls, concurrency),
+            'embed_documents': _threaded(lambda: embeddings.embed_documents(['benchmark text']), calls, concurrency),
+            'aembed_documents': _gathered(lambda: embeddings.aembed_documents(['benchmark text']), calls, concurrency),
+        },
+        'llm': {
+            'call': _threaded(lambda: llm(messages=messages), calls, concurrency),
+            'acall': _gathered(lambda: llm.acall(messages=messages), calls, concurrency),
+        },
+    }
+    saved = results['embeddings']['unpooled_requests_post']['ms_per_call'] - results['embeddings']['pooled_session_post']['ms_per_call']
+    results['embeddings']['ms_saved_per_call_by_pooling'] = saved
+    return results
+
+
+def run_http_overhead(calls: int = 500, concurrency: int = 32) -> Dict[str, Any]:
+    """
+    Measure client overhead against a local mock server with zero server latency, comparing
+    unpooled requests with the pooled sync and async clients
+
+    Every client is measured one call at a time and with concurrency calls in flight, the sync
+    clients from a pool of as many threads, so the sync and async numbers of a level compare.
+    """
+    server = MockAPIServer().start()
+    try:
+        llm = InfinigenceLLM(api_key='mock', model='mock-llm', base_url=server.base_url)
+        url = f'{server.base_url}/embeddings'
+        return {
+            'concurrency': concurrency,
+            'sequential': _measure(llm, url, calls, 1),
+            'concurrent': _measure(llm, url, calls, concurrency),
+        }
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-call HTTP overhead of the LLM and embedding clients')
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32, help='Calls in flight in the concurrent measurements')
+    parser.add_argument('--output', default='http_overhead_results.json')
+    args = parser.parse_args()
+    results = run_http_overhead(calls=args.calls, concurrency=args.concurrency)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+    logger.info(f"HTTP overhead results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
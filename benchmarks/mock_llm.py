@@ -0,0 +1,113 @@
+import ast
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Union
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from websocietysimulator.llm import LLMBase
+from websocietysimulator.llm.utils import llm_request_payload, request_key
+
+
+class MockLLMError(RuntimeError):
+    """Injected failure raised by MockLLM and MockEmbeddings."""
+
+
+class _LatencyModel:
+    """Log-normal latency around a median, with optional failure injection."""
+
+    def __init__(self, latency: float, jitter: float, failure_rate: float, seed: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            delay = self.latency * self._rng.lognormvariate(0, self.jitter) if self.jitter else self.latency
+            fail = self._rng.random() < self.failure_rate
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise MockLLMError("Injected failure")
+
+
+class MockEmbeddings(Embeddings):
+    def __init__(self, dim: int = 64, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        """
+        Deterministic hash-based embeddings with simulated latency
+
+        Args:
+            dim: Embedding dimension
+            latency: Median latency of each call in seconds
+            jitter: Sigma of the log-normal latency distribution, 0 for constant latency
+            failure_rate: Probability that a call raises MockLLMError
+            seed: Random seed of the latency and failure model
+        """
+        self.model = f'mock-embedding-{dim}'
+        self.dim = dim
+        self.latency_model = _LatencyModel(latency, jitter, failure_rate, seed)
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        rng = np.random.default_rng(int(request_key(text)[:16], 16))
+        vector = rng.standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.latency_model.wait()
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class MockLLM(LLMBase):
+    def __init__(self, model: str = "mock-llm", latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0, embedding_dim: int = 64):
+        """
+        Offline LLM with configurable latency and failure injection for benchmarks
+
+        Ranking prompts get a deterministic permutation of their last list literal of item ids back,
+        every other prompt gets a 'stars:/review:' answer.
+
+        Args:
+            model: Model name reported to the framework
+            latency: Median latency of each call in seconds
+            jitter: Sigma of the log-normal latency distribution, 0 for constant latency
+            failure_rate: Probability that a call raises MockLLMError
+            seed: Random seed of the latency and failure model
+            embedding_dim: Dimension of the MockEmbeddings returned by get_embedding_model
+        """
+        super().__init__(model)
+        self.latency_model = _LatencyModel(latency, jitter, failure_rate, seed)
+        self.embedding_model = MockEmbeddings(dim=embedding_dim, seed=seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _respond(self, prompt: str, rng: random.Random) -> str:
+        if 'rank' in prompt.lower():
+            for match in reversed(list(re.finditer(r"\[[^\[\]]*\]", prompt))):
+                try:
+                    candidates = ast.literal_eval(match.group())
+                except (ValueError, SyntaxError):
+                    continue
+                if isinstance(candidates, list) and len(candidates) > 1 and all(isinstance(c, str) for c in candidates):
+                    rng.shuffle(candidates)
+                    return str(candidates)
+        return f"stars: {rng.randint(1, 5)}.0\nreview: This is a synthetic review number {rng.randint(0, 10 ** 6)}."
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        with self._lock:
+            self.calls += 1
+        self.latency_model.wait()
+        key = request_key(llm_request_payload(messages, model or self.model, temperature, max_tokens, stop_strs, n))
+        rng = random.Random(key)
+        prompt = messages[-1]['content'] if messages else ''
+        responses = [self._respond(prompt, rng) for _ in range(n)]
+        return responses[0] if n == 1 else responses
+
+    def get_embedding_model(self):
+        return self.embedding_model
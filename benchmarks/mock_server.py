@@ -0,0 +1,272 @@
+import email.parser
+import email.policy
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from .mock_llm import MockLLM
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions (optionally streamed), /embeddings, /files and /batches endpoints backed by MockLLM."""
+
+    protocol_version = 'HTTP/1.1'
+    # Keep-alive responses must not wait on Nagle's algorithm, or every call pays a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send_json(self, data, status: int = 200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, request: dict, response: dict):
+        """Send a chat completion as server-sent events, one chunk per word."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def event(data):
+            payload = f"data: {data if isinstance(data, str) else json.dumps(data)}\n\n".encode()
+            self.wfile.write(f'{len(payload):x}\r\n'.encode() + payload + b'\r\n')
+            self.wfile.flush()
+
+        def chunk(choices, usage=None):
+            return {
+                'id': response['id'],
+                'object': 'chat.completion.chunk',
+                'created': response['created'],
+                'model': response['model'],
+                'choices': choices,
+                'usage': usage
+            }
+
+        try:
+            for piece in re.findall(r'\s*\S+', response['choices'][0]['message']['content']):
+                time.sleep(self.server.stream_delay)
+                event(chunk([{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]))
+            event(chunk([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+            if (request.get('stream_options') or {}).get('include_usage'):
+                event(chunk([], response['usage']))
+            event('[DONE]')
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the stream
+            self.close_connection = True
+
+    def _read_multipart(self) -> dict:
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        header = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode()
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + body)
+        return {
+            part.get_param('name', header='content-disposition'): part.get_payload(decode=True)
+            for part in message.iter_parts()
+        }
+
+    def _not_found(self):
+        self._send_json({'error': {'message': f'Unknown endpoint {self.path}'}}, status=404)
+
+    def do_POST(self):
+        path = self.path.rstrip('/')
+        if path.endswith('/chat/completions'):
+            request = self._read_json()
+            response = self.server.chat_completion(request)
+            self._send_stream(request, response) if request.get('stream') else self._send_json(response)
+        elif path.endswith('/embeddings'):
+            self._send_json(self.server.embeddings(self._read_json()))
+        elif path.endswith('/files'):
+            fields = self._read_multipart()
+            self._send_json(self.server.create_file(fields['file'], fields.get('purpose', b'batch').decode()))
+        elif path.endswith('/batches'):
+            self._send_json(self.server.create_batch(self._read_json()))
+        elif path.endswith('/cancel') and '/batches/' in path:
+            self._read_json()
+            batch = self.server.cancel_batch(path.split('/')[-2])
+            self._send_json(batch) if batch else self._not_found()
+        else:
+            self._not_found()
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if '/batches/' in path:
+            batch = self.server.batches.get(path.split('/')[-1])
+            self._send_json(batch) if batch else self._not_found()
+        elif path.endswith('/content') and '/files/' in path:
+            content = self.server.files.get(path.split('/')[-2], {}).get('content')
+            if content is None:
+                return self._not_found()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        else:
+            self._not_found()
+
+
+class MockAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, llm: Optional[MockLLM] = None, handler=MockAPIHandler, batch_delay: float = 0.0, stream_delay: float = 0.0):
+        """
+        Local stand-in for an OpenAI-compatible API, serving MockLLM responses
+
+        Args:
+            host: Interface to bind
+            port: Port to bind, 0 picks a free port
+            llm: MockLLM generating the responses, defaults to one without latency
+            handler: Request handler class
+            batch_delay: Seconds a batch stays in progress before it is processed
+            stream_delay: Seconds between two chunks of a streamed response
+        """
+        super().__init__((host, port), handler)
+        self.llm = llm or MockLLM()
+        self.batch_delay = batch_delay
+        self.stream_delay = stream_delay
+        self.files = {}
+        self.batches = {}
+        self._batch_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/v1'
+
+    def chat_completion(self, request: dict) -> dict:
+        n = request.get('n') or 1
+        content = self.llm(
+            messages=request['messages'],
+            model=request.get('model'),
+            temperature=request.get('temperature') or 0.0,
+            max_tokens=request.get('max_tokens') or 500,
+            stop_strs=request.get('stop'),
+            n=n
+        )
+        contents = [content] if n == 1 else content
+        prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in request['messages'])
+        completion_tokens = sum(len(c.split()) for c in contents)
+        return {
+            'id': f'chatcmpl-mock-{time.time_ns()}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model') or self.llm.model,
+            'choices': [
+                {'index': i, 'message': {'role': 'assistant', 'content': c}, 'finish_reason': 'stop'}
+                for i, c in enumerate(contents)
+            ],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        }
+
+    def embeddings(self, request: dict) -> dict:
+        texts = request['input'] if isinstance(request['input'], list) else [request['input']]
+        vectors = self.llm.get_embedding_model().embed_documents(texts)
+        return {
+            'object': 'list',
+            'model': request.get('model'),
+            'data': [{'object': 'embedding', 'index': i, 'embedding': v} for i, v in enumerate(vectors)]
+        }
+
+    def _store_file(self, content: bytes, purpose: str, filename: str = 'batch.jsonl') -> dict:
+        file_id = f'file-{uuid.uuid4().hex}'
+        file = {
+            'id': file_id,
+            'object': 'file',
+            'bytes': len(content),
+            'created_at': int(time.time()),
+            'filename': filename,
+            'purpose': purpose,
+            'status': 'processed'
+        }
+        self.files[file_id] = dict(file, content=content)
+        return file
+
+    def create_file(self, content: bytes, purpose: str) -> dict:
+        return self._store_file(content, purpose)
+
+    def create_batch(self, request: dict) -> dict:
+        batch_id = f'batch_{uuid.uuid4().hex}'
+        batch = {
+            'id': batch_id,
+            'object': 'batch',
+            'endpoint': request['endpoint'],
+            'input_file_id': request['input_file_id'],
+            'completion_window': request['completion_window'],
+            'status': 'in_progress',
+            'created_at': int(time.time()),
+            'output_file_id': None,
+            'error_file_id': None,
+            'request_counts': {'total': 0, 'completed': 0, 'failed': 0}
+        }
+        with self._batch_lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._process_batch, args=(batch_id,), daemon=True).start()
+        return batch
+
+    def cancel_batch(self, batch_id: str) -> Optional[dict]:
+        with self._batch_lock:
+            batch = self.batches.get(batch_id)
+            if batch is not None and batch['status'] == 'in_progress':
+                batch['status'] = 'cancelled'
+        return batch
+
+    def _process_batch(self, batch_id: str):
+        time.sleep(self.batch_delay)
+        batch = self.batches[batch_id]
+        lines = self.files[batch['input_file_id']]['content'].decode('utf-8').splitlines()
+        outputs, errors = [], []
+        for line in filter(str.strip, lines):
+            request = json.loads(line)
+            try:
+                body = self.chat_completion(request['body'])
+                outputs.append({
+                    'id': f'batch_req_{uuid.uuid4().hex}',
+                    'custom_id': request['custom_id'],
+                    'response': {'status_code': 200, 'body': body},
+                    'error': None
+                })
+            except Exception as e:
+                errors.append({
+                    'id': f'batch_req_{uuid.uuid4().hex}',
+                    'custom_id': request['custom_id'],
+                    'response': {'status_code': 500, 'body': {'error': {'message': str(e)}}},
+                    'error': None
+                })
+        with self._batch_lock:
+            if batch['status'] != 'in_progress':
+                return
+            if outputs:
+                content = '\n'.join(json.dumps(o) for o in outputs).encode('utf-8')
+                batch['output_file_id'] = self._store_file(content, 'batch_output', 'output.jsonl')['id']
+            if errors:
+                content = '\n'.join(json.dumps(e) for e in errors).encode('utf-8')
+                batch['error_file_id'] = self._store_file(content, 'batch_output', 'errors.jsonl')['id']
+            batch['request_counts'] = {'total': len(outputs) + len(errors), 'completed': len(outputs), 'failed': len(errors)}
+            batch['status'] = 'completed'
+
+    def start(self) -> 'MockAPIServer':
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
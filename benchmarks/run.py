@@ -0,0 +1,116 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+from typing import Any, Dict
+from .synthetic_data import generate_dataset, dataset_paths
+from .mock_llm import MockLLM
+from . import scenarios
+
+logger = logging.getLogger("websocietysimulator")
+
+SCENARIOS = ['interaction_tool', 'cache_interaction_tool', 'run_simulation', 'evaluators']
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.regenerate or not os.path.exists(os.path.join(args.data_dir, 'review.json')):
+        paths = generate_dataset(
+            args.data_dir,
+            num_reviews=args.reviews,
+            zipf_a=args.zipf_a,
+            num_tasks=args.tasks,
+            seed=args.seed
+        )
+    else:
+        paths = dataset_paths(args.data_dir)
+
+    results: Dict[str, Any] = {}
+    selected = args.scenarios or SCENARIOS
+
+    if 'interaction_tool' in selected:
+        logger.info("Benchmarking InteractionTool")
+        results['interaction_tool'] = scenarios.bench_interaction_tool(args.data_dir, num_lookups=args.lookups, seed=args.seed)
+    if 'cache_interaction_tool' in selected:
+        logger.info("Benchmarking CacheInteractionTool")
+        results['cache_interaction_tool'] = scenarios.bench_cache_interaction_tool(args.data_dir, num_lookups=args.lookups, seed=args.seed)
+
+    simulator = None
+    if 'run_simulation' in selected or ('evaluators' in selected and args.simulation_evaluator):
+        from websocietysimulator import Simulator
+        simulator = Simulator(data_dir=args.data_dir, device=args.device, cache=args.cache)
+        if args.local_llm:
+            from websocietysimulator.llm import LocalLLM
+            simulator.set_llm(LocalLLM(model=args.local_llm))
+        else:
+            simulator.set_llm(MockLLM(latency=args.llm_latency, jitter=args.llm_jitter, failure_rate=args.llm_failure_rate, seed=args.seed))
+
+    if 'run_simulation' in selected:
+        logger.info("Benchmarking run_simulation")
+        results['run_simulation'] = {
+            'simulation': scenarios.bench_run_simulation(
+                simulator, scenarios.BenchmarkSimulationAgent,
+                paths['simulation_task_dir'], paths['simulation_groundtruth_dir'], args.workers
+            ),
+            'recommendation': scenarios.bench_run_simulation(
+                simulator, scenarios.BenchmarkRecommendationAgent,
+                paths['recommendation_task_dir'], paths['recommendation_groundtruth_dir'], args.workers
+            ),
+        }
+    if 'evaluators' in selected:
+        logger.info("Benchmarking evaluators")
+        results['evaluators'] = {'recommendation': scenarios.bench_recommendation_evaluator(seed=args.seed)}
+        if args.simulation_evaluator:
+            results['evaluators']['simulation'] = scenarios.bench_simulation_evaluator(simulator.simulation_evaluator, seed=args.seed)
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': dict(vars(args)),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic-scale benchmarks for the websocietysimulator pipeline')
+    parser.add_argument('--data-dir', default='./benchmark_data', help='Where the synthetic dataset is generated')
+    parser.add_argument('--reviews', type=int, default=10_000, help='Number of synthetic reviews (10k to 50M)')
+    parser.add_argument('--zipf-a', type=float, default=1.1, help='Zipf exponent of item popularity')
+    parser.add_argument('--tasks', type=int, default=100, help='Number of tasks per track')
+    parser.add_argument('--regenerate', action='store_true', help='Regenerate the dataset even if it exists')
+    parser.add_argument('--lookups', type=int, default=10_000, help='Number of timed interaction tool lookups')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16, 32], help='max_workers values for run_simulation')
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='Median mock LLM latency in seconds')
+    parser.add_argument('--llm-jitter', type=float, default=0.5, help='Sigma of the log-normal mock LLM latency')
+    parser.add_argument('--llm-failure-rate', type=float, default=0.0, help='Probability of an injected mock LLM failure')
+    parser.add_argument('--local-llm', help='Serve a local model (name, path or .gguf file) with LocalLLM instead of the mock LLM')
+    parser.add_argument('--cache', action='store_true', help='Use CacheInteractionTool inside the Simulator')
+    parser.add_argument('--device', default='cpu', help='Device of the SimulationEvaluator')
+    parser.add_argument('--simulation-evaluator', action='store_true', help='Also benchmark SimulationEvaluator (loads models)')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, help='Subset of scenarios to run')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file the results are written to')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    logger.info(f"Benchmark results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
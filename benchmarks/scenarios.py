@@ -0,0 +1,167 @@
+import ast
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from websocietysimulator.agent import SimulationAgent, RecommendationAgent
+from websocietysimulator.tools import InteractionTool, CacheInteractionTool, RecommendationEvaluator
+from .synthetic_data import synthetic_text
+
+logger = logging.getLogger("websocietysimulator")
+
+
+class BenchmarkSimulationAgent(SimulationAgent):
+    """Fixed workflow: fetch user, item and reviews, then make one LLM call."""
+
+    def workflow(self):
+        user = self.interaction_tool.get_user(user_id=self.task['user_id'])
+        item = self.interaction_tool.get_item(item_id=self.task['item_id'])
+        reviews = self.interaction_tool.get_reviews(item_id=self.task['item_id'])[:20]
+        result = self.llm(messages=[{"role": "user", "content": f"{user}\n{item}\n{reviews}\nWrite a review."}])
+        stars_line = [line for line in result.split('\n') if 'stars:' in line][0]
+        review_line = [line for line in result.split('\n') if 'review:' in line][0]
+        return {
+            'stars': float(stars_line.split(':')[1].strip()),
+            'review': review_line.split(':', 1)[1].strip()
+        }
+
+
+class BenchmarkRecommendationAgent(RecommendationAgent):
+    """Fixed workflow: fetch user history and candidates, then make one ranking LLM call."""
+
+    def workflow(self):
+        history = self.interaction_tool.get_reviews(user_id=self.task['user_id'])[:20]
+        items = [self.interaction_tool.get_item(item_id=item_id) for item_id in self.task['candidate_list']]
+        result = self.llm(messages=[{"role": "user", "content": f"{history}\n{items}\nRank {self.task['candidate_list']}"}])
+        return ast.literal_eval(re.search(r"\[.*\]", result, re.DOTALL).group())
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples, dtype=np.float64)
+    return {
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99)),
+    }
+
+
+def _read_ids(data_dir: str, filename: str, key: str) -> List[str]:
+    with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+        return [json.loads(line)[key] for line in f]
+
+
+def _sample_ids(data_dir: str, num_lookups: int, seed: int):
+    rng = random.Random(seed)
+    user_ids = rng.choices(_read_ids(data_dir, 'user.json', 'user_id'), k=num_lookups)
+    item_ids = rng.choices(_read_ids(data_dir, 'item.json', 'item_id'), k=num_lookups)
+    return user_ids, item_ids
+
+
+def _time_lookups(tool, user_ids: List[str], item_ids: List[str]) -> Dict[str, Any]:
+    results = {}
+    for name, call in (
+        ('get_user', lambda i: tool.get_user(user_id=user_ids[i])),
+        ('get_item', lambda i: tool.get_item(item_id=item_ids[i])),
+        ('get_reviews_by_item', lambda i: tool.get_reviews(item_id=item_ids[i])),
+        ('get_reviews_by_user', lambda i: tool.get_reviews(user_id=user_ids[i])),
+    ):
+        latencies = []
+        for i in range(len(user_ids)):
+            start = time.perf_counter()
+            call(i)
+            latencies.append(time.perf_counter() - start)
+        results[name] = {'calls_per_second': len(latencies) / sum(latencies), 'latency_seconds': _percentiles(latencies)}
+    return results
+
+
+def bench_interaction_tool(data_dir: str, num_lookups: int = 10_000, seed: int = 0) -> Dict[str, Any]:
+    """Time InteractionTool construction and its lookups."""
+    start = time.perf_counter()
+    tool = InteractionTool(data_dir)
+    load_seconds = time.perf_counter() - start
+    user_ids, item_ids = _sample_ids(data_dir, num_lookups, seed)
+    return {
+        'load_seconds': load_seconds,
+        'reviews': len(tool.review_data),
+        'reviews_per_second': len(tool.review_data) / load_seconds,
+        'lookups': _time_lookups(tool, user_ids, item_ids),
+    }
+
+
+def bench_cache_interaction_tool(data_dir: str, num_lookups: int = 10_000, seed: int = 0) -> Dict[str, Any]:
+    """Time a cold CacheInteractionTool build (LMDB cache is rebuilt) and its lookups."""
+    shutil.rmtree(os.path.join(data_dir, 'lmdb_cache'), ignore_errors=True)
+    start = time.perf_counter()
+    cold_tool = CacheInteractionTool(data_dir)
+    build_seconds = time.perf_counter() - start
+    # LMDB refuses to open an environment twice in one process
+    _close_cache_tool(cold_tool)
+
+    start = time.perf_counter()
+    tool = CacheInteractionTool(data_dir)
+    reopen_seconds = time.perf_counter() - start
+
+    user_ids, item_ids = _sample_ids(data_dir, num_lookups, seed)
+    try:
+        lookups = _time_lookups(tool, user_ids, item_ids)
+    finally:
+        _close_cache_tool(tool)
+    return {
+        'build_seconds': build_seconds,
+        'reopen_seconds': reopen_seconds,
+        'lookups': lookups,
+    }
+
+
+def _close_cache_tool(tool: CacheInteractionTool):
+    tool.user_env.close()
+    tool.item_env.close()
+    tool.review_env.close()
+
+
+def bench_run_simulation(simulator, agent_class, task_dir: str, groundtruth_dir: str, workers: List[int], number_of_tasks: Optional[int] = None) -> Dict[str, Any]:
+    """Time Simulator.run_simulation with threading at several max_workers values."""
+    simulator.set_task_and_groundtruth(task_dir=task_dir, groundtruth_dir=groundtruth_dir)
+    simulator.set_agent(agent_class)
+    results = {}
+    for max_workers in workers:
+        start = time.perf_counter()
+        outputs = simulator.run_simulation(number_of_tasks=number_of_tasks, enable_threading=True, max_workers=max_workers)
+        elapsed = time.perf_counter() - start
+        completed = sum(1 for output in outputs if output is not None and 'output' in output)
+        results[str(max_workers)] = {
+            'seconds': elapsed,
+            'tasks': len(outputs),
+            'completed': completed,
+            'tasks_per_second': len(outputs) / elapsed,
+        }
+    return results
+
+
+def bench_recommendation_evaluator(num_scenarios: int = 100_000, num_candidates: int = 20, seed: int = 0) -> Dict[str, Any]:
+    """Time RecommendationEvaluator.calculate_hr_at_n on random predictions."""
+    rng = random.Random(seed)
+    predictions = [[f'I{rng.randrange(10 ** 6)}' for _ in range(num_candidates)] for _ in range(num_scenarios)]
+    ground_truth = [rng.choice(prediction) for prediction in predictions]
+    evaluator = RecommendationEvaluator()
+    start = time.perf_counter()
+    evaluator.calculate_hr_at_n(ground_truth=ground_truth, predictions=predictions)
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'scenarios_per_second': num_scenarios / elapsed}
+
+
+def bench_simulation_evaluator(evaluator, num_scenarios: int = 200, seed: int = 0) -> Dict[str, Any]:
+    """Time SimulationEvaluator.calculate_metrics on synthetic reviews."""
+    rng = np.random.default_rng(seed)
+    simulated = [{'stars': float(rng.integers(1, 6)), 'review': synthetic_text(rng)} for _ in range(num_scenarios)]
+    real = [{'stars': float(rng.integers(1, 6)), 'review': synthetic_text(rng)} for _ in range(num_scenarios)]
+    start = time.perf_counter()
+    evaluator.calculate_metrics(simulated_data=simulated, real_data=real)
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'scenarios_per_second': num_scenarios / elapsed}
@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger("websocietysimulator")
+
+VOCABULARY = (
+    "great good bad terrible amazing okay price quality service fast slow shipping product "
+    "book story character staff friendly rude clean dirty love hate recommend again never "
+    "always value cheap expensive durable broken works perfectly easy hard setup battery "
+    "sound screen plot ending author pages illustrations kids gift family delicious bland"
+).split()
+
+
+def zipf_probabilities(n: int, a: float) -> np.ndarray:
+    """Probability of each rank under a truncated Zipf distribution with exponent a."""
+    weights = 1.0 / np.power(np.arange(1, n + 1, dtype=np.float64), a)
+    return weights / weights.sum()
+
+
+def synthetic_text(rng: np.random.Generator, min_words: int = 20, max_words: int = 60) -> str:
+    words = rng.choice(len(VOCABULARY), size=int(rng.integers(min_words, max_words)))
+    return ' '.join(VOCABULARY[w] for w in words).capitalize() + '.'
+
+
+def _write_json(path: str, data: Dict):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def dataset_paths(data_dir: str) -> Dict[str, str]:
+    """Paths of the data directory and the task/groundtruth directories of a generated dataset."""
+    return {
+        'data_dir': data_dir,
+        'simulation_task_dir': os.path.join(data_dir, 'track1', 'tasks'),
+        'simulation_groundtruth_dir': os.path.join(data_dir, 'track1', 'groundtruth'),
+        'recommendation_task_dir': os.path.join(data_dir, 'track2', 'tasks'),
+        'recommendation_groundtruth_dir': os.path.join(data_dir, 'track2', 'groundtruth'),
+    }
+
+
+def generate_dataset(
+    output_dir: str,
+    num_reviews: int = 10_000,
+    num_users: Optional[int] = None,
+    num_items: Optional[int] = None,
+    zipf_a: float = 1.1,
+    num_tasks: int = 100,
+    num_candidates: int = 20,
+    seed: int = 42,
+    chunk_size: int = 1_000_000
+) -> Dict[str, str]:
+    """
+    Write a synthetic dataset in the layout expected by InteractionTool and Simulator
+
+    The output directory receives user.json, item.json and review.json (one JSON object per line),
+    plus track1/{tasks,groundtruth} for user behavior simulation and track2/{tasks,groundtruth}
+    for recommendation. Item popularity follows a Zipf distribution so a few items own most reviews.
+    Reviews are generated and written in chunks, so 50M reviews never have to fit in memory.
+
+    Args:
+        output_dir: Directory the dataset is written to
+        num_reviews: Number of reviews to generate
+        num_users: Number of users, defaults to num_reviews // 10
+        num_items: Number of items, defaults to num_reviews // 20
+        zipf_a: Zipf exponent of item popularity
+        num_tasks: Number of tasks generated for each track
+        num_candidates: Size of the candidate list of recommendation tasks
+        seed: Random seed
+        chunk_size: Number of reviews generated per chunk
+
+    Returns:
+        Dict[str, str]: Paths of the data directory and the task/groundtruth directories
+    """
+    rng = np.random.default_rng(seed)
+    num_users = num_users or max(100, num_reviews // 10)
+    num_items = num_items or max(num_candidates, num_reviews // 20)
+    num_tasks = min(num_tasks, num_reviews)
+    os.makedirs(output_dir, exist_ok=True)
+
+    logger.info(f"Generating {num_users} users, {num_items} items and {num_reviews} reviews in {output_dir}")
+    with open(os.path.join(output_dir, 'user.json'), 'w', encoding='utf-8') as f:
+        for u in range(num_users):
+            f.write(json.dumps({'user_id': f'U{u:09d}', 'name': f'user {u}', 'source': 'synthetic'}) + '\n')
+
+    with open(os.path.join(output_dir, 'item.json'), 'w', encoding='utf-8') as f:
+        for i in range(num_items):
+            f.write(json.dumps({
+                'item_id': f'I{i:09d}',
+                'name': f'item {i}',
+                'stars': round(float(rng.uniform(1, 5)), 1),
+                'description': synthetic_text(rng, 10, 30),
+                'source': 'synthetic',
+                'type': 'product'
+            }) + '\n')
+
+    item_probabilities = zipf_probabilities(num_items, zipf_a)
+    # Reviews that become simulation tasks (and whose users become recommendation tasks)
+    task_rows = set(rng.choice(num_reviews, size=num_tasks, replace=False).tolist())
+    task_reviews: List[Dict] = []
+
+    with open(os.path.join(output_dir, 'review.json'), 'w', encoding='utf-8') as f:
+        for start in range(0, num_reviews, chunk_size):
+            size = min(chunk_size, num_reviews - start)
+            items = rng.choice(num_items, size=size, p=item_probabilities)
+            users = rng.integers(0, num_users, size=size)
+            stars = rng.integers(1, 6, size=size)
+            lines = []
+            for offset in range(size):
+                row = start + offset
+                review = {
+                    'review_id': f'R{row:010d}',
+                    'user_id': f'U{users[offset]:09d}',
+                    'item_id': f'I{items[offset]:09d}',
+                    'stars': float(stars[offset]),
+                    'text': synthetic_text(rng),
+                    'source': 'synthetic',
+                    'type': 'product'
+                }
+                if row in task_rows:
+                    task_reviews.append(review)
+                lines.append(json.dumps(review))
+            f.write('\n'.join(lines) + '\n')
+            logger.info(f"Wrote {start + size}/{num_reviews} reviews")
+
+    paths = dataset_paths(output_dir)
+    for path in paths.values():
+        os.makedirs(path, exist_ok=True)
+
+    for index, review in enumerate(task_reviews):
+        _write_json(os.path.join(paths['simulation_task_dir'], f'task_{index}.json'), {
+            'type': 'user_behavior_simulation',
+            'user_id': review['user_id'],
+            'item_id': review['item_id']
+        })
+        _write_json(os.path.join(paths['simulation_groundtruth_dir'], f'groundtruth_{index}.json'), {
+            'stars': review['stars'],
+            'review': review['text']
+        })
+
+        others = rng.choice(num_items - 1, size=num_candidates - 1, replace=False)
+        target = int(review['item_id'][1:])
+        candidates = [f'I{(o + 1 + target) % num_items:09d}' for o in others] + [review['item_id']]
+        rng.shuffle(candidates)
+        _write_json(os.path.join(paths['recommendation_task_dir'], f'task_{index}.json'), {
+            'type': 'recommendation',
+            'user_id': review['user_id'],
+            'candidate_category': 'product',
+            'candidate_list': candidates,
+            'loc': [-1, -1]
+        })
+        _write_json(os.path.join(paths['recommendation_groundtruth_dir'], f'groundtruth_{index}.json'), {
+            'ground truth': review['item_id']
+        })
+
+    logger.info(f"Generated {len(task_reviews)} tasks per track")
+    return paths
@@ -0,0 +1,87 @@
+import argparse
+import json
+import logging
+import time
+from typing import Any, Dict, List
+import numpy as np
+from websocietysimulator.agent.modules.vector_store import HNSWVectorStore, NumpyVectorStore
+from .mock_llm import MockEmbeddings
+
+logger = logging.getLogger("websocietysimulator")
+
+
+def clustered_vectors(rng: np.random.Generator, count: int, dim: int, clusters: int = 1000) -> np.ndarray:
+    """Unit vectors scattered around random centers, closer to real embeddings than uniform noise."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size=count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _search(store, queries: np.ndarray, k: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    results = [store.similarity_search_with_score_by_vector(query, k=k) for query in queries]
+    elapsed = time.perf_counter() - start
+    return {
+        'ids': [[int(document.page_content) for document, _ in result] for result in results],
+        'qps': len(queries) / elapsed
+    }
+
+
+def _recall(found: List[List[int]], exact: List[List[int]], k: int) -> float:
+    return sum(len(set(f) & set(e)) for f, e in zip(found, exact)) / (k * len(exact))
+
+
+def run_vector_search(sizes: List[int], dim: int = 384, num_queries: int = 1000, k: int = 10, efs: List[int] = (16, 64, 256), seed: int = 0) -> Dict[str, Any]:
+    """
+    Compare exact search in NumpyVectorStore with HNSWVectorStore at several ef values:
+    build time, queries per second and recall@k against the exact results.
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = MockEmbeddings(dim=dim)
+    results = {}
+    for size in sizes:
+        logger.info(f"Vector search benchmark with {size} vectors")
+        vectors = clustered_vectors(rng, size, dim)
+        queries = clustered_vectors(rng, num_queries, dim)
+        texts = [str(i) for i in range(size)]
+
+        exact_store = NumpyVectorStore(embeddings)
+        start = time.perf_counter()
+        exact_store.add_vectors(vectors, texts)
+        exact_build = time.perf_counter() - start
+        exact = _search(exact_store, queries, k)
+        del exact_store
+
+        hnsw_store = HNSWVectorStore(embeddings, initial_capacity=size)
+        start = time.perf_counter()
+        hnsw_store.add_vectors(vectors, texts)
+        hnsw_build = time.perf_counter() - start
+        size_results = {
+            'exact': {'build_seconds': exact_build, 'qps': exact['qps'], f'recall@{k}': 1.0},
+            'hnsw': {'build_seconds': hnsw_build}
+        }
+        for ef in efs:
+            hnsw_store.ef = ef
+            found = _search(hnsw_store, queries, k)
+            size_results['hnsw'][f'ef_{ef}'] = {'qps': found['qps'], f'recall@{k}': _recall(found['ids'], exact['ids'], k)}
+        results[str(size)] = size_results
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall and QPS of the HNSW memory store against exact search')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--ef', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--output', default='vector_search_results.json')
+    args = parser.parse_args()
+    results = run_vector_search(args.sizes, dim=args.dim, num_queries=args.queries, k=args.k, efs=args.ef)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+    logger.info(f"Vector search results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
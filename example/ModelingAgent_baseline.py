@@ -1,7 +1,7 @@
 from websocietysimulator import Simulator
 from websocietysimulator.agent import SimulationAgent
 import json 
-from websocietysimulator.llm import LLMBase, InfinigenceLLM
+from websocietysimulator.llm import LLMBase, InfinigenceLLM, fields_complete
 from websocietysimulator.agent.modules.planning_modules import PlanningBase 
 from websocietysimulator.agent.modules.reasoning_modules import ReasoningBase
 from websocietysimulator.agent.modules.memory_modules import MemoryDILU
@@ -46,10 +46,12 @@ class ReasoningBaseline(ReasoningBase):
         prompt = prompt.format(task_description=task_description)
         
         messages = [{"role": "user", "content": prompt}]
-        reasoning_result = self.llm(
+        # Only the stars and review lines are used, stop streaming once both are complete
+        reasoning_result = self.llm.stream_call(
             messages=messages,
             temperature=0.0,
-            max_tokens=1000
+            max_tokens=1000,
+            stop_when=fields_complete('stars', 'review')
         )
         
         return reasoning_result
@@ -80,9 +82,7 @@ class MySimulationAgent(SimulationAgent):
                 elif 'business' in sub_task['description']:
                     business = str(self.interaction_tool.get_item(item_id=self.task['item_id']))
             reviews_item = self.interaction_tool.get_reviews(item_id=self.task['item_id'])
-            for review in reviews_item:
-                review_text = review['text']
-                self.memory(f'review: {review_text}')
+            self.memory.add_memories([review['text'] for review in reviews_item])
             reviews_user = self.interaction_tool.get_reviews(user_id=self.task['user_id'])
             review_similar = self.memory(f'{reviews_user[0]["text"]}')
             task_description = f'''
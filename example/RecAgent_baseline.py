@@ -1,8 +1,7 @@
 import json
 from websocietysimulator import Simulator
 from websocietysimulator.agent import RecommendationAgent
-import tiktoken
-from websocietysimulator.llm import LLMBase, InfinigenceLLM
+from websocietysimulator.llm import LLMBase, InfinigenceLLM, truncate_tokens, balanced_list_literal
 from websocietysimulator.agent.modules.planning_modules import PlanningBase
 from websocietysimulator.agent.modules.reasoning_modules import ReasoningBase
 import re
@@ -10,14 +9,6 @@ import logging
 import time
 logging.basicConfig(level=logging.INFO)
 
-def num_tokens_from_string(string: str) -> int:
-    encoding = tiktoken.get_encoding("cl100k_base")
-    try:
-        a = len(encoding.encode(string))
-    except:
-        print(encoding.encode(string))
-    return a
-
 class RecPlanning(PlanningBase):
     """Inherits from PlanningBase"""
     
@@ -69,10 +60,12 @@ class RecReasoning(ReasoningBase):
         prompt = prompt.format(task_description=task_description)
         
         messages = [{"role": "user", "content": prompt}]
-        reasoning_result = self.llm(
+        # Only the ranked list is used, stop streaming once it is complete
+        reasoning_result = self.llm.stream_call(
             messages=messages,
             temperature=0.1,
-            max_tokens=1000
+            max_tokens=1000,
+            stop_when=balanced_list_literal
         )
         
         return reasoning_result
@@ -109,11 +102,7 @@ class MyRecommendationAgent(RecommendationAgent):
         for sub_task in plan:
             
             if 'user' in sub_task['description']:
-                user = str(self.interaction_tool.get_user(user_id=self.task['user_id']))
-                input_tokens = num_tokens_from_string(user)
-                if input_tokens > 12000:
-                    encoding = tiktoken.get_encoding("cl100k_base")
-                    user = encoding.decode(encoding.encode(user)[:12000])
+                user = truncate_tokens(str(self.interaction_tool.get_user(user_id=self.task['user_id'])), 12000)
 
             elif 'item' in sub_task['description']:
                 for n_bus in range(len(self.task['candidate_list'])):
@@ -123,11 +112,7 @@ class MyRecommendationAgent(RecommendationAgent):
                     item_list.append(filtered_item)
                 # print(item)
             elif 'review' in sub_task['description']:
-                history_review = str(self.interaction_tool.get_reviews(user_id=self.task['user_id']))
-                input_tokens = num_tokens_from_string(history_review)
-                if input_tokens > 12000:
-                    encoding = tiktoken.get_encoding("cl100k_base")
-                    history_review = encoding.decode(encoding.encode(history_review)[:12000])
+                history_review = truncate_tokens(str(self.interaction_tool.get_reviews(user_id=self.task['user_id'])), 12000)
             else:
                 pass
         task_description = f'''
@@ -0,0 +1,121 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from benchmarks.mock_llm import MockLLM
+from websocietysimulator.llm.batch import BatchLLM, in_batch_job
+
+
+class EchoBatchClient:
+    """Answers every request of a batch with its last message, records the submitted batches."""
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, requests):
+        self.batches.append(requests)
+        return {
+            custom_id: {'choices': [{'index': 0, 'message': {'content': f"echo {body['messages'][-1]['content']}"}}]}
+            for custom_id, body in requests.items()
+        }
+
+
+def ask(llm, text):
+    return llm(messages=[{'role': 'user', 'content': text}])
+
+
+def run_with_timeout(batch_llm, jobs, timeout=10, **kwargs):
+    """BatchLLM.run in a thread, so a stuck round fails the test instead of hanging it."""
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.setdefault('results', batch_llm.run(jobs, **kwargs)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "BatchLLM.run did not finish"
+    return outcome['results']
+
+
+@pytest.fixture
+def client():
+    return EchoBatchClient()
+
+
+@pytest.fixture
+def batch_llm(client):
+    return BatchLLM(MockLLM(), client)
+
+
+def test_chained_calls_take_one_round_each(batch_llm, client):
+    def job(i):
+        return lambda: ask(batch_llm, ask(batch_llm, f'job {i}'))
+
+    results = run_with_timeout(batch_llm, [job(i) for i in range(5)])
+
+    assert [result for result, _ in results] == [f'echo echo job {i}' for i in range(5)]
+    assert len(client.batches) == 2
+    assert [len(batch) for batch in client.batches] == [5, 5]
+
+
+def test_identical_requests_share_a_batch_line(batch_llm, client):
+    results = run_with_timeout(batch_llm, [lambda: ask(batch_llm, 'same')] * 3)
+
+    assert [result for result, _ in results] == ['echo same'] * 3
+    assert batch_llm.requests_submitted == 1
+
+
+def test_job_errors_are_returned(batch_llm):
+    def failing():
+        ask(batch_llm, 'before')
+        raise ValueError('boom')
+
+    results = run_with_timeout(batch_llm, [failing, lambda: ask(batch_llm, 'ok')])
+
+    assert isinstance(results[0][1], ValueError)
+    assert results[1] == ('echo ok', None)
+
+
+@pytest.mark.parametrize('copy_context', [True, False])
+def test_concurrent_calls_inside_a_job_do_not_block_the_round(batch_llm, copy_context):
+    def job():
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            if copy_context:
+                futures = [executor.submit(contextvars.copy_context().run, ask, batch_llm, f'part {i}') for i in range(3)]
+            else:
+                futures = [executor.submit(ask, batch_llm, f'part {i}') for i in range(3)]
+            return [future.result() for future in futures]
+
+    results = run_with_timeout(batch_llm, [job, lambda: ask(batch_llm, 'single')])
+
+    assert results[0] == ([f'echo part {i}' for i in range(3)], None)
+    assert results[1] == ('echo single', None)
+
+
+def test_max_workers_limits_jobs_in_flight(batch_llm, client):
+    results = run_with_timeout(batch_llm, [lambda i=i: ask(batch_llm, f'job {i}') for i in range(5)], max_workers=2)
+
+    assert [result for result, _ in results] == [f'echo job {i}' for i in range(5)]
+    assert all(len(batch) <= 2 for batch in client.batches)
+
+
+def test_in_batch_job(batch_llm):
+    results = run_with_timeout(batch_llm, [in_batch_job])
+
+    assert results[0] == (True, None)
+    assert not in_batch_job()
+
+
+def test_call_outside_run_raises(batch_llm):
+    with pytest.raises(RuntimeError):
+        ask(batch_llm, 'outside')
+
+
+def test_jobs_categorizing_the_same_tool_pool_do_not_block_the_round(batch_llm, monkeypatch):
+    from websocietysimulator.agent.modules.tooluse_modules import ToolUseAnyTool
+    monkeypatch.setattr(ToolUseAnyTool, '_categories', {})
+    monkeypatch.setattr(ToolUseAnyTool, '_key_locks', {})
+    tooluse = ToolUseAnyTool(batch_llm, cache_dir=None)
+
+    results = run_with_timeout(batch_llm, [lambda: tooluse.categories('travel')] * 2)
+
+    assert results[0][1] is None and results[0][0]
+    assert results[1] == results[0]
+    assert tooluse.categories('travel') == results[0][0]
@@ -0,0 +1,71 @@
+import threading
+import time
+import pytest
+from websocietysimulator.llm.coalescing import SingleFlight
+
+
+def shared_call(single_flight, callers, result):
+    """Run one slow call that callers - 1 other threads join while it is in flight."""
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return result
+
+    outcomes = [None] * callers
+    def caller(i):
+        outcomes[i] = single_flight.do('key', fn)
+
+    threads = [threading.Thread(target=caller, args=(0,))]
+    threads[0].start()
+    while not calls:
+        time.sleep(0.001)
+    for i in range(1, callers):
+        threads.append(threading.Thread(target=caller, args=(i,)))
+        threads[-1].start()
+    while single_flight.stats.coalesced < callers - 1:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return outcomes, calls
+
+
+def test_concurrent_callers_share_one_call():
+    single_flight = SingleFlight()
+    outcomes, calls = shared_call(single_flight, 4, {'content': 'answer'})
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True]
+    assert all(result == {'content': 'answer'} for result, _ in outcomes)
+
+
+def test_shared_results_are_deep_copies():
+    result = {'message': {'content': 'answer'}, 'usage': {'prompt_tokens': 3}}
+    outcomes, _ = shared_call(SingleFlight(), 3, result)
+
+    results = [result for result, _ in outcomes]
+    results[0]['message']['content'] = 'changed'
+    results[1]['usage']['prompt_tokens'] = 0
+
+    assert results[2] == {'message': {'content': 'answer'}, 'usage': {'prompt_tokens': 3}}
+    assert all(r is not result and r['message'] is not result['message'] for r in results)
+
+
+def test_unshared_result_is_returned_as_is():
+    result = {'content': 'answer'}
+    assert SingleFlight().do('key', lambda: result) == (result, False)
+    assert SingleFlight().do('key', lambda: result)[0] is result
+
+
+def test_failed_call_is_not_kept_in_flight():
+    single_flight = SingleFlight()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        single_flight.do('key', fail)
+    assert single_flight.do('key', lambda: 'ok') == ('ok', False)
@@ -0,0 +1,72 @@
+import threading
+import numpy as np
+from benchmarks.mock_llm import MockEmbeddings
+from websocietysimulator.llm.embedding_cache import CachedEmbeddings, EmbeddingStore
+
+
+def test_store_reopen_returns_the_same_vectors(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    assert store.put_many(['a', 'b', 'a'], np.array([[1, 2], [3, 4], [5, 6]])) == 2
+    assert store.put_many(['c'], np.array([[1, 2, 3]])) == 1
+    assert store.put_many(['b'], np.array([[0, 0]])) == 0
+
+    reopened = EmbeddingStore(str(tmp_path))
+    vectors = reopened.get_many(['a', 'b', 'c', 'missing'])
+    assert len(reopened) == 3
+    assert sorted(vectors) == ['a', 'b', 'c']
+    # The last vector of a key repeated within a call is kept
+    assert vectors['a'].tolist() == [5, 6] and vectors['b'].tolist() == [3, 4]
+    assert vectors['c'].tolist() == [1, 2, 3]
+
+
+def test_store_remaps_vectors_appended_by_another_instance(tmp_path):
+    first = EmbeddingStore(str(tmp_path))
+    second = EmbeddingStore(str(tmp_path))
+    first.put_many(['a'], np.array([[1.0, 0.0]]))
+    assert second.get_many(['a'])['a'].tolist() == [1.0, 0.0]
+
+    first.put_many(['b'], np.array([[0.0, 1.0]]))
+    assert second.get_many(['b'])['b'].tolist() == [0.0, 1.0]
+
+
+def test_partial_row_of_an_interrupted_append_is_overwritten(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put_many(['a'], np.array([[1.0, 2.0]]))
+    with open(tmp_path / 'vectors_2.f32', 'ab') as f:
+        f.write(b'\x00\x00')
+
+    reopened = EmbeddingStore(str(tmp_path))
+    reopened.put_many(['b'], np.array([[3.0, 4.0]]))
+    assert reopened.get_many(['b'])['b'].tolist() == [3.0, 4.0]
+    assert (tmp_path / 'vectors_2.f32').stat().st_size == 2 * 2 * 4
+
+
+def test_concurrent_appends_do_not_overlap(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+
+    def put(worker):
+        for i in range(20):
+            store.put_many([f'{worker}-{i}'], np.full((1, 4), worker * 100 + i))
+
+    threads = [threading.Thread(target=put, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    vectors = EmbeddingStore(str(tmp_path)).get_many([f'{w}-{i}' for w in range(4) for i in range(20)])
+    assert len(vectors) == 80
+    assert all(vectors[f'{w}-{i}'].tolist() == [w * 100 + i] * 4 for w in range(4) for i in range(20))
+
+
+def test_cached_embeddings_survive_a_restart(tmp_path):
+    embeddings = MockEmbeddings(dim=8)
+    cached = CachedEmbeddings(embeddings, path=str(tmp_path))
+    expected = cached.embed_documents(['x', 'y'])
+    query = cached.embed_query('x')
+
+    restarted = CachedEmbeddings(MockEmbeddings(dim=8), path=str(tmp_path))
+    assert np.allclose(restarted.embed_documents(['y', 'x', 'y']), [expected[1], expected[0], expected[1]])
+    assert np.allclose(restarted.embed_query('x'), query)
+    assert restarted.embeddings.calls == 0
+    assert restarted.stats.hits == 4 and restarted.stats.misses == 0
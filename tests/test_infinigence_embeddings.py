@@ -0,0 +1,22 @@
+import threading
+from websocietysimulator.llm.infinigence_embeddings import InfinigenceEmbeddings
+from websocietysimulator.llm.retry_policy import get_task_deadline, task_deadline
+
+
+def test_sub_batches_keep_order_and_task_deadline(monkeypatch):
+    embeddings = InfinigenceEmbeddings('key', max_batch_size=2, max_concurrency=3)
+    deadlines = []
+    lock = threading.Lock()
+
+    def fake_embed(texts):
+        with lock:
+            deadlines.append(get_task_deadline())
+        return [[float(text)] for text in texts]
+
+    monkeypatch.setattr(embeddings, '_embed', fake_embed)
+    with task_deadline(60):
+        deadline = get_task_deadline()
+        vectors = embeddings.embed_documents([str(i) for i in range(7)])
+
+    assert vectors == [[float(i)] for i in range(7)]
+    assert deadlines == [deadline] * 4
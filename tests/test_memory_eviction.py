@@ -0,0 +1,88 @@
+import pytest
+from benchmarks.mock_llm import MockLLM
+from websocietysimulator.agent.modules.memory_eviction import EvictionQueue
+from websocietysimulator.agent.modules.memory_modules import MemoryDILU
+
+
+def drain(queue):
+    order = []
+    while (memory_id := queue.pop()) is not None:
+        order.append(memory_id)
+    return order
+
+
+def test_lru_evicts_least_recently_used():
+    queue = EvictionQueue('lru')
+    for now, memory_id in enumerate(['a', 'b', 'c']):
+        queue.insert(memory_id, now=now)
+    queue.access('a', now=3)
+
+    assert drain(queue) == ['b', 'c', 'a']
+
+
+def test_importance_evicts_lowest_importance_then_oldest():
+    queue = EvictionQueue('importance')
+    queue.insert('a', importance=5, now=0)
+    queue.insert('b', importance=2, now=1)
+    queue.insert('c', importance=5, now=2)
+    queue.set_importance('b', 9)
+
+    assert drain(queue) == ['a', 'c', 'b']
+
+
+def test_time_decay_trades_importance_against_age():
+    queue = EvictionQueue('time_decay', half_life=10)
+    queue.insert('old_important', importance=8, now=0)
+    queue.insert('new_unimportant', importance=2, now=15)
+    queue.insert('new_important', importance=8, now=15)
+
+    # 8 * 0.5 ** 1.5 ~ 2.8 outranks 2 for the rest of time
+    assert drain(queue) == ['new_unimportant', 'old_important', 'new_important']
+
+
+def test_stale_heap_entries_are_skipped_and_compacted():
+    queue = EvictionQueue('lru')
+    queue.insert('a', now=0)
+    queue.insert('b', now=1)
+    for now in range(2, 500):
+        queue.access('a', now=now)
+    queue.remove('b')
+
+    assert len(queue._heap) < 100
+    assert drain(queue) == ['a']
+    assert queue.pop() is None
+
+
+def test_unknown_policy_raises():
+    with pytest.raises(ValueError):
+        EvictionQueue('fifo')
+
+
+def test_memory_capacity_evicts_on_insert():
+    memory = MemoryDILU(MockLLM(), capacity=3)
+    memory.add_memories(['first', 'second', 'third'])
+    memory._search('first', k=1)
+    memory.add_memories(['fourth', 'fifth'])
+
+    stats = memory.get_stats()
+    remaining = sorted(document.page_content for document, _ in memory.scenario_memory.similarity_search_with_score('first', k=10))
+    assert stats['size'] == 3 and stats['evictions'] == 2
+    assert remaining == ['fifth', 'first', 'fourth']
+
+
+def test_hnsw_eviction_does_not_save_on_every_insert(tmp_path, monkeypatch):
+    pytest.importorskip('hnswlib')
+    from websocietysimulator.agent.modules.vector_store import HNSWVectorStore
+
+    llm = MockLLM()
+    store = HNSWVectorStore(llm.get_embedding_model(), persist_directory=str(tmp_path), save_every=10)
+    saves = []
+    original_persist = store.persist
+    monkeypatch.setattr(store, 'persist', lambda: (saves.append(len(store)), original_persist()))
+    memory = MemoryDILU(llm, vector_store=store, capacity=5)
+    for i in range(20):
+        memory.add_memories([f'memory {i}'])
+
+    # 20 inserts and 15 evictions
+    assert len(store) == 5
+    assert len(saves) == 3
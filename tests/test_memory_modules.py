@@ -0,0 +1,84 @@
+import contextvars
+import threading
+import pytest
+from benchmarks.mock_llm import MockLLM
+from websocietysimulator.agent.modules.memory_modules import MemoryGenerative, MemoryVoyager
+from websocietysimulator.llm.batch import BatchLLM
+from websocietysimulator.llm.routing import current_call_tag
+from test_batch import EchoBatchClient, run_with_timeout
+
+caller = contextvars.ContextVar('caller', default=None)
+
+
+class TaggingLLM(MockLLM):
+    """MockLLM remembering the caller and call tag of each call."""
+
+    def __init__(self, response=None):
+        super().__init__()
+        self.response = response
+        self.tags = []
+        self._tags_lock = threading.Lock()
+
+    def __call__(self, messages, **kwargs):
+        with self._tags_lock:
+            self.tags.append((caller.get(), current_call_tag()))
+        answer = super().__call__(messages, **kwargs)
+        return self.response if self.response is not None else answer
+
+
+def test_voyager_add_memories_inside_batch_job():
+    batch_llm = BatchLLM(MockLLM(), EchoBatchClient())
+    memory = MemoryVoyager(batch_llm)
+
+    results = run_with_timeout(batch_llm, [lambda: memory.add_memories(['r1', 'r2', 'r3'])])
+
+    assert results[0][1] is None
+    assert memory.memory_count() == 3
+
+
+def test_voyager_concurrent_summaries_keep_the_call_context():
+    llm = TaggingLLM()
+    memory = MemoryVoyager(llm)
+
+    token = caller.set('agent')
+    try:
+        memory.add_memories(['r1', 'r2', 'r3'])
+    finally:
+        caller.reset(token)
+
+    assert memory.memory_count() == 3
+    assert llm.tags == [('agent', None)] * 3
+
+
+def test_generative_scoring_fallback_inside_batch_job():
+    batch_llm = BatchLLM(MockLLM(), EchoBatchClient())
+    memory = MemoryGenerative(batch_llm)
+
+    results = run_with_timeout(batch_llm, [lambda: memory.score_memories(['first case', 'second case'], 'batch task')])
+
+    # The echoed prompts contain no 'Case i Score:' lines, so each memory is scored on its own
+    assert results[0][1] is None
+    assert len(results[0][0]) == 2
+
+
+def test_generative_concurrent_scoring_keeps_the_call_context():
+    llm = TaggingLLM(response='no scores here')
+    memory = MemoryGenerative(llm)
+
+    token = caller.set('agent')
+    try:
+        scores = memory.score_memories(['a case', 'another case', 'a third case'], 'context task')
+    finally:
+        caller.reset(token)
+
+    assert scores == [0, 0, 0]
+    assert llm.tags[0] == ('agent', 'memory_batch_scoring')
+    assert llm.tags[1:] == [('agent', 'memory_scoring')] * 3
+
+
+def test_voyager_rejects_precomputed_vectors():
+    memory = MemoryVoyager(MockLLM())
+
+    with pytest.raises(ValueError):
+        memory.add_memories(['r1'], vectors=[[0.0] * 64], vectors_model='mock-embedding-64')
+    assert memory.memory_count() == 0
@@ -0,0 +1,137 @@
+import threading
+import httpx
+import pytest
+from benchmarks.mock_llm import MockLLM
+from websocietysimulator.llm import rate_limiter as rate_limiter_module, retry_policy
+from websocietysimulator.llm.rate_limiter import RateLimitedLLM, RateLimiter
+from websocietysimulator.llm.retry_policy import RetryPolicy
+
+
+class FakeClock:
+    """Stands in for the time module, sleeping advances the clock at once."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # Like a real sleep, always let some time pass, a rounding-sized wait would not move the clock
+        self.now += max(seconds, 1e-6)
+
+
+class UsageLLM(MockLLM):
+    """MockLLM reporting a fixed token usage, or failing."""
+
+    def __init__(self, prompt_tokens=10, completion_tokens=5, fail=False):
+        super().__init__()
+        self.usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+        self.fail = fail
+        self._usage_local = threading.local()
+
+    def __call__(self, messages, **kwargs):
+        if self.fail:
+            raise RuntimeError('backend down')
+        self._usage_local.usage = self.usage
+        return super().__call__(messages, **kwargs)
+
+
+class RetryingLLM(UsageLLM):
+    """UsageLLM whose RetryPolicy retries the given number of 429 responses."""
+
+    def __init__(self, rate_limited):
+        super().__init__()
+        self.rate_limited = rate_limited
+        self.retry_policy = RetryPolicy(max_attempts=rate_limited + 1)
+
+    def _attempt(self, messages, **kwargs):
+        if self.rate_limited:
+            self.rate_limited -= 1
+            request = httpx.Request('POST', 'http://backend/v1/chat/completions')
+            raise httpx.HTTPStatusError('429', request=request, response=httpx.Response(429, request=request))
+        return super().__call__(messages, **kwargs)
+
+    def __call__(self, messages, **kwargs):
+        return self.retry_policy.call(self._attempt, messages, **kwargs)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter_module, 'time', clock)
+    return clock
+
+
+def test_request_budget_spaces_out_calls(clock):
+    limiter = RateLimiter(requests_per_minute=60)
+
+    waits = [limiter.acquire() for _ in range(62)]
+
+    # The full bucket serves a burst of 60, then one request per second
+    assert waits[:60] == [0.0] * 60
+    assert waits[60:] == pytest.approx([1.0, 1.0])
+
+
+def test_token_budget_and_oversized_requests(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+
+    assert limiter.acquire(500) == 0.0
+    assert limiter.acquire(200) == pytest.approx(10.0)
+    # Larger than the whole budget, so it only waits for a full bucket
+    clock.now += 60
+    assert limiter.acquire(1000) == 0.0
+    assert limiter.acquire(1) == pytest.approx(40.1)
+
+
+def test_reconcile_refunds_and_charges(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+    limiter.acquire(500)
+    limiter.reconcile(500, 100)
+    assert limiter.acquire(500) == 0.0
+
+    limiter.reconcile(500, 800)
+    # The bucket is 300 tokens in debt, 100 more need 40 seconds of refill
+    assert limiter.acquire(100) == pytest.approx(40.0)
+
+
+def test_sqlite_state_is_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / 'limits' / 'bucket.sqlite')
+    first = RateLimiter(requests_per_minute=2, path=path)
+    second = RateLimiter(requests_per_minute=2, path=path)
+
+    assert first.acquire() == 0.0
+    assert second.acquire() == 0.0
+    assert first.acquire() == pytest.approx(30.0)
+
+
+def test_rate_limited_llm_reconciles_reported_usage(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    llm = RateLimitedLLM(UsageLLM(), limiter, token_estimator=lambda messages: 100)
+
+    llm([{'role': 'user', 'content': 'hi'}], max_tokens=400)
+    # 500 reserved, 15 used
+    assert limiter.acquire(985) == 0.0
+    assert llm.waited_seconds == 0.0
+
+
+def test_rate_limited_llm_refunds_tokens_of_failed_calls(clock):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=1000)
+    llm = RateLimitedLLM(UsageLLM(fail=True), limiter, token_estimator=lambda messages: 100)
+
+    with pytest.raises(RuntimeError):
+        llm([{'role': 'user', 'content': 'hi'}], max_tokens=400)
+    assert limiter.acquire(1000) == 0.0
+
+
+def test_retries_of_the_wrapped_llm_take_new_reservations(clock, monkeypatch):
+    monkeypatch.setattr(retry_policy.time, 'sleep', lambda seconds: None)
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=1000)
+    llm = RateLimitedLLM(RetryingLLM(rate_limited=2), limiter, token_estimator=lambda messages: 100)
+
+    llm([{'role': 'user', 'content': 'hi'}], max_tokens=400)
+
+    # Three attempts drew three requests from a bucket of two, the last one waited 30 seconds
+    assert llm.waited_seconds == pytest.approx(30.0)
+    # Failed attempts are refunded, the successful one is reconciled to the 15 tokens it used
+    assert limiter._state.transact(lambda state: state['tokens']) == pytest.approx(985)
@@ -0,0 +1,113 @@
+import asyncio
+import httpx
+import pytest
+from websocietysimulator.llm import retry_policy
+from websocietysimulator.llm.retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy, task_deadline
+
+
+def http_error(status, headers=None):
+    request = httpx.Request('POST', 'http://backend/v1/chat/completions')
+    return httpx.HTTPStatusError(f'{status}', request=request, response=httpx.Response(status, headers=headers, request=request))
+
+
+class Backend:
+    """Callable raising the queued errors, then returning 'ok'."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(retry_policy.time, 'sleep', delays.append)
+    return delays
+
+
+def test_transient_errors_are_retried(sleeps):
+    backend = Backend(http_error(503), http_error(429, {'retry-after': '2'}))
+
+    assert RetryPolicy(max_attempts=3, base_delay=0.1).call(backend) == 'ok'
+    assert backend.calls == 3
+    assert sleeps[1] == 2.0
+
+
+def test_fatal_errors_are_raised_at_once(sleeps):
+    backend = Backend(http_error(400))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        RetryPolicy().call(backend)
+    assert backend.calls == 1
+    assert sleeps == []
+
+
+def test_no_retry_past_the_task_deadline(sleeps):
+    backend = Backend(http_error(429, {'retry-after': '60'}))
+
+    with task_deadline(1), pytest.raises(httpx.HTTPStatusError):
+        RetryPolicy().call(backend)
+    assert sleeps == []
+
+
+def test_fatal_error_does_not_close_an_open_circuit(sleeps):
+    breaker = CircuitBreaker('backend', failure_threshold=2, reset_timeout=0)
+    policy = RetryPolicy(max_attempts=2, circuit_breaker=breaker)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        policy.call(Backend(http_error(503), http_error(503)))
+    assert breaker.opened_at is not None
+
+    # The half-open trial ends with a 400, the circuit stays open but allows the next trial
+    with pytest.raises(httpx.HTTPStatusError):
+        policy.call(Backend(http_error(400)))
+    assert breaker.opened_at is not None and breaker.failures == 2
+
+    assert policy.call(Backend()) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_open_circuit_fails_fast():
+    breaker = CircuitBreaker('backend', failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    backend = Backend()
+
+    with pytest.raises(CircuitOpenError):
+        RetryPolicy(max_attempts=1, circuit_breaker=breaker).call(backend)
+    assert backend.calls == 0
+
+
+def test_cancelled_trial_releases_the_circuit():
+    breaker = CircuitBreaker('backend', failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    policy = RetryPolicy(max_attempts=1, circuit_breaker=breaker)
+
+    async def hang():
+        await asyncio.sleep(60)
+
+    async def ok():
+        return 'ok'
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(policy.acall(hang), 0.01)
+        return await policy.acall(ok)
+
+    assert asyncio.run(main()) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_interrupted_trial_releases_the_circuit():
+    breaker = CircuitBreaker('backend', failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    policy = RetryPolicy(max_attempts=1, circuit_breaker=breaker)
+
+    with pytest.raises(KeyboardInterrupt):
+        policy.call(Backend(KeyboardInterrupt()))
+    assert policy.call(Backend()) == 'ok'
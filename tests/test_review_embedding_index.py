@@ -0,0 +1,65 @@
+import json
+import numpy as np
+import pytest
+from benchmarks import generate_dataset
+from benchmarks.mock_llm import MockEmbeddings, MockLLM
+from websocietysimulator.agent.modules.memory_modules import MemoryDILU
+from websocietysimulator.tools.review_embedding_index import ReviewEmbeddingIndex
+
+
+@pytest.fixture(scope='module')
+def data_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data')
+    generate_dataset(str(path), num_reviews=300, num_users=30, num_items=20, num_tasks=2)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def reviews(data_dir):
+    with open(f'{data_dir}/review.json', encoding='utf-8') as file:
+        return {review['review_id']: review for review in map(json.loads, file)}
+
+
+@pytest.fixture(scope='module')
+def index(data_dir, tmp_path_factory):
+    return ReviewEmbeddingIndex.build(data_dir, MockEmbeddings(), index_dir=str(tmp_path_factory.mktemp('index')), batch_size=7)
+
+
+def test_item_vectors_match_the_review_texts(index, reviews):
+    embeddings = MockEmbeddings()
+    item_id = next(iter(reviews.values()))['item_id']
+    review_ids, vectors = index.item_vectors(item_id)
+
+    assert sorted(review_ids) == sorted(rid for rid, review in reviews.items() if review['item_id'] == item_id)
+    expected = np.asarray(embeddings.embed_documents([reviews[rid]['text'] for rid in review_ids]), dtype=np.float32)
+    np.testing.assert_allclose(vectors, expected, atol=1e-6)
+    np.testing.assert_allclose(index.get_vector(review_ids[0]), expected[0], atol=1e-6)
+
+
+def test_similar_reviews_finds_the_query_review(index, reviews):
+    review = next(iter(reviews.values()))
+
+    best_id, similarity = index.similar_reviews(review['item_id'], review['text'], k=3)[0]
+    assert best_id == review['review_id']
+    assert similarity == pytest.approx(1.0, abs=1e-5)
+
+
+def test_load_checks_the_query_model(index, data_dir):
+    assert ReviewEmbeddingIndex.load(data_dir, MockEmbeddings(), index_dir=index.index_dir).model == 'mock-embedding-64'
+    with pytest.raises(ValueError):
+        ReviewEmbeddingIndex.load(data_dir, MockEmbeddings(dim=32), index_dir=index.index_dir)
+
+
+def test_memory_accepts_vectors_of_its_own_model_only(index, reviews):
+    item_id = next(iter(reviews.values()))['item_id']
+    review_ids, vectors = index.item_vectors(item_id)
+    texts = [reviews[rid]['text'] for rid in review_ids]
+
+    memory = MemoryDILU(MockLLM())
+    memory.add_memories(texts, vectors=vectors, vectors_model=index.model)
+    assert memory.memory_count() == len(texts)
+
+    with pytest.raises(ValueError):
+        MemoryDILU(MockLLM(embedding_dim=32)).add_memories(texts, vectors=vectors, vectors_model=index.model)
+    with pytest.raises(ValueError):
+        MemoryDILU(MockLLM()).add_memories(texts, vectors=vectors)
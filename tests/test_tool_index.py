@@ -0,0 +1,56 @@
+import pytest
+from benchmarks.mock_llm import MockEmbeddings
+from websocietysimulator.agent.modules.tool_index import ToolIndex, parse_tools
+
+POOL = {
+    'travel': "[1] find_flights: Find flights between two cities. Returns a list.\n"
+              "[2] book_hotel: Book a hotel room in a city. Needs dates.\n"
+              "[3] get_weather: Get the weather forecast of a city.",
+}
+
+
+class CountingEmbeddings(MockEmbeddings):
+    def __init__(self, dim=64):
+        super().__init__(dim=dim)
+        self.documents = 0
+
+    def embed_documents(self, texts):
+        self.documents += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture(autouse=True)
+def fresh_process_memo(monkeypatch):
+    monkeypatch.setattr(ToolIndex, '_loaded', {})
+
+
+def test_parse_tools():
+    tools = parse_tools(POOL['travel'])
+    assert [tool['name'] for tool in tools] == ['find_flights', 'book_hotel', 'get_weather']
+    assert tools[1]['summary'] == 'Book a hotel room in a city.'
+
+
+def test_search_ranks_the_matching_tool_first():
+    index = ToolIndex.get(MockEmbeddings(), cache_dir=None, pool=POOL)
+    assert index.search('travel', 'Get the weather forecast of a city.', k=2)[0].startswith('[3] get_weather')
+
+
+def test_indexes_of_different_models_are_cached_side_by_side(tmp_path, monkeypatch):
+    small, large = CountingEmbeddings(dim=32), CountingEmbeddings(dim=64)
+    ToolIndex.get(small, cache_dir=str(tmp_path), pool=POOL)
+    ToolIndex.get(large, cache_dir=str(tmp_path), pool=POOL)
+    assert len(list(tmp_path.glob('*.npz'))) == 2
+
+    # A new process loads both from disk without embedding the tools again
+    monkeypatch.setattr(ToolIndex, '_loaded', {})
+    small, large = CountingEmbeddings(dim=32), CountingEmbeddings(dim=64)
+    assert ToolIndex.get(small, cache_dir=str(tmp_path), pool=POOL).vectors['travel'].shape == (3, 32)
+    assert ToolIndex.get(large, cache_dir=str(tmp_path), pool=POOL).vectors['travel'].shape == (3, 64)
+    assert small.documents == large.documents == 0
+
+
+def test_unwritable_cache_dir_still_builds(tmp_path):
+    blocked = tmp_path / 'file'
+    blocked.write_text('not a directory')
+    index = ToolIndex.get(MockEmbeddings(), cache_dir=str(blocked / 'tool_index'), pool=POOL)
+    assert len(index.search('travel', 'book a room', k=3)) == 3
@@ -0,0 +1,101 @@
+import threading
+from typing import Optional
+from websocietysimulator.agent.modules.tool_registry import ActionParser, ToolRegistry
+
+
+def test_parser_handles_markers_split_across_chunks():
+    parser = ActionParser()
+    text = "Thought: look up\nAction: get_reviews, user_id='u1' End Action and Action: get_item, 'i, 2' End Action"
+    calls = []
+    for i in range(0, len(text), 3):
+        calls.extend(parser.feed(text[i:i + 3]))
+
+    assert [call.name for call in calls] == ['get_reviews', 'get_item']
+    assert calls[0].kwargs == {'user_id': "'u1'"}
+    assert calls[1].args == ["'i, 2'"]
+    assert parser.feed(' End Action') == []
+
+
+def test_arguments_are_converted_by_annotation():
+    registry = ToolRegistry()
+
+    @registry.register
+    def add(a: int, b: float, flag: bool = False, note: Optional[str] = None, extra=None):
+        """Add two numbers."""
+        return a, b, flag, note, extra
+
+    results = registry.run("Action: add, 1, 2.5, flag=yes, note='x, y', extra=[1, 2] End Action")
+    assert results[0].result == (1, 2.5, True, 'x, y', [1, 2])
+    assert 'Invalid arguments' in registry.run('Action: add, x, 1 End Action')[0].error
+    assert 'Unknown tool' in registry.run('Action: missing End Action')[0].error
+
+
+def test_independent_actions_run_concurrently():
+    registry = ToolRegistry(max_workers=3)
+    barrier = threading.Barrier(3, timeout=5)
+
+    @registry.register
+    def wait(name: str):
+        barrier.wait()
+        return name
+
+    results = registry.run(''.join(f'Action: wait, {name} End Action' for name in 'abc'))
+    assert [result.result for result in results] == ['a', 'b', 'c']
+
+
+def test_memoized_results_are_copies():
+    registry = ToolRegistry()
+    calls = []
+
+    @registry.register(pure=True)
+    def get_reviews(user_id: str):
+        calls.append(user_id)
+        return [{'user_id': user_id}]
+
+    first, second = registry.run('Action: get_reviews, u1 End Action Action: get_reviews, u1 End Action')
+    first.result.append('mutated')
+    second.result[0]['user_id'] = 'mutated'
+    third = registry.run('Action: get_reviews, u1 End Action')[0]
+
+    assert calls == ['u1']
+    assert second.cached and third.cached
+    assert third.result == [{'user_id': 'u1'}]
+    assert registry.get_stats()['get_reviews']['cache_hits'] == 2
+
+
+def test_memo_evicts_least_recently_used():
+    registry = ToolRegistry(cache_size=2)
+    calls = []
+
+    @registry.register(pure=True)
+    def square(x: int):
+        calls.append(x)
+        return x * x
+
+    for x in [1, 2, 1, 3, 1, 2]:
+        registry.run(f'Action: square, {x} End Action')
+
+    # 3 evicts 2, which was used less recently than 1
+    assert calls == [1, 2, 3, 2]
+    assert len(registry._cache) == 2
+
+
+def test_interaction_lookups_are_not_memoized_and_threads_end_with_the_batch():
+    class Lookups:
+        def get_user(self, user_id: str):
+            return {'user_id': user_id}
+
+        def get_item(self, item_id: str):
+            return {'item_id': item_id}
+
+        def get_reviews(self, user_id: Optional[str] = None):
+            return [{'user_id': user_id}]
+
+    registry = ToolRegistry.from_interaction_tool(Lookups())
+    results = registry.run('Action: get_user, u1 End Action Action: get_reviews, user_id=u1 End Action')
+    registry.run('Action: get_user, u1 End Action')
+
+    assert results[0].result == {'user_id': 'u1'} and results[1].result == [{'user_id': 'u1'}]
+    assert registry.get_stats()['get_user']['cache_hits'] == 0
+    assert not registry._cache
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith('tool-registry')]
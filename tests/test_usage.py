@@ -0,0 +1,99 @@
+import logging
+import threading
+import pytest
+from benchmarks import dataset_paths, generate_dataset
+from benchmarks.mock_llm import MockLLM
+from benchmarks.scenarios import BenchmarkRecommendationAgent
+from websocietysimulator.llm import tokenizer
+from websocietysimulator.llm.usage import TokenBudgetExceeded, UsageScope, check_token_budget, record_usage, track_usage
+
+
+class BudgetedLLM(MockLLM):
+    """MockLLM checking the token budget and reporting a fixed usage per call."""
+
+    def __call__(self, messages, max_tokens=500, n=1, **kwargs):
+        check_token_budget(messages, max_tokens, n)
+        answer = super().__call__(messages, max_tokens=max_tokens, n=n, **kwargs)
+        record_usage(2000, 1000)
+        return answer
+
+
+@pytest.fixture
+def offline_tokenizer(monkeypatch):
+    def unavailable(encoding_name):
+        raise ConnectionError('no network')
+    monkeypatch.setattr(tokenizer, 'get_encoding', unavailable)
+    monkeypatch.setattr(tokenizer, '_unavailable_encodings', set())
+
+
+def test_estimates_fall_back_without_encoding(offline_tokenizer):
+    assert tokenizer.estimate_tokens('x' * 40) == 10
+    assert tokenizer.estimate_message_tokens([{'role': 'user', 'content': 'x' * 40}]) == 14
+    with pytest.raises(ConnectionError):
+        tokenizer.count_tokens('exact counts still need the encoding')
+
+
+def test_budget_check_works_offline(offline_tokenizer):
+    scope = UsageScope('task', budget=100)
+    with track_usage(scope):
+        check_token_budget([{'role': 'user', 'content': 'x' * 40}], max_tokens=50)
+        with pytest.raises(TokenBudgetExceeded):
+            check_token_budget([{'role': 'user', 'content': 'x' * 400}], max_tokens=50)
+    assert scope.exhausted
+
+
+@pytest.fixture
+def simulator(tmp_path, monkeypatch):
+    import websocietysimulator.simulator as simulator_module
+    # The text metrics load models, recommendation tasks only need the hit rate
+    monkeypatch.setattr(simulator_module, 'SimulationEvaluator', lambda device: None)
+    generate_dataset(str(tmp_path), num_reviews=500, num_users=50, num_items=30, num_tasks=6)
+    paths = dataset_paths(str(tmp_path))
+    simulator = simulator_module.Simulator(data_dir=str(tmp_path))
+    simulator.set_task_and_groundtruth(task_dir=paths['recommendation_task_dir'], groundtruth_dir=paths['recommendation_groundtruth_dir'])
+    simulator.set_agent(BenchmarkRecommendationAgent)
+    simulator.set_llm(BudgetedLLM())
+    return simulator
+
+
+@pytest.mark.parametrize('enable_threading', [False, True])
+def test_budget_skipped_tasks_are_scored_as_failed(simulator, offline_tokenizer, enable_threading):
+    outputs = simulator.run_simulation(enable_threading=enable_threading, max_workers=1, run_token_budget=7000)
+
+    skipped = [output for output in outputs if output is not None and output.get('budget_skipped')]
+    assert len(outputs) == 6
+    assert len(skipped) == 4
+    results = simulator.evaluate()
+    assert results['data_info']['evaluated_count'] == 6
+    assert results['data_info']['budget_skipped_count'] == 4
+    assert results['usage']['total_tokens'] == 6000
+
+
+def test_task_budget_stops_the_task(simulator, offline_tokenizer):
+    outputs = simulator.run_simulation(task_token_budget=10)
+
+    assert all(output['budget_skipped'] for output in outputs)
+    results = simulator.evaluate()
+    assert results['data_info']['budget_skipped_count'] == 6
+    assert results['metrics']['total_scenarios'] == 6
+    assert results['metrics']['average_hit_rate'] == 0
+
+
+def test_offline_warning_is_logged_once(monkeypatch, caplog):
+    barrier = threading.Barrier(4, timeout=5)
+
+    def unavailable(encoding_name):
+        # Every thread misses the encoding before any of them records it as unavailable
+        barrier.wait()
+        raise ConnectionError('no network')
+    monkeypatch.setattr(tokenizer, 'get_encoding', unavailable)
+    monkeypatch.setattr(tokenizer, '_unavailable_encodings', set())
+
+    with caplog.at_level(logging.WARNING, logger='websocietysimulator'):
+        threads = [threading.Thread(target=tokenizer.estimate_tokens, args=('text',)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len([record for record in caplog.records if 'unavailable' in record.getMessage()]) == 1
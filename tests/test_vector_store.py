@@ -0,0 +1,87 @@
+import json
+import numpy as np
+import pytest
+from benchmarks.mock_llm import MockEmbeddings
+from websocietysimulator.agent.modules.vector_store import NumpyVectorStore, top_k
+
+
+def test_top_k_orders_best_first():
+    assert top_k(np.array([0.1, 0.9, 0.5, 0.7]), 3).tolist() == [1, 3, 2]
+
+
+def test_numpy_store_search_and_delete():
+    store = NumpyVectorStore(MockEmbeddings(), initial_capacity=2)
+    ids = store.add_texts(['alpha', 'beta', 'gamma', 'delta'])
+
+    assert store.similarity_search('gamma', k=1)[0].page_content == 'gamma'
+    assert store.delete([ids[0], ids[2]])
+    assert len(store) == 2
+    assert [document.page_content for document in store.get_by_ids(ids)] == ['beta', 'delta']
+    assert store.similarity_search('delta', k=1)[0].page_content == 'delta'
+
+
+def test_hnsw_store_reloads_last_complete_save(tmp_path, monkeypatch):
+    pytest.importorskip('hnswlib')
+    from websocietysimulator.agent.modules.vector_store import HNSWVectorStore
+
+    embeddings = MockEmbeddings()
+    store = HNSWVectorStore(embeddings, persist_directory=str(tmp_path), save_every=0)
+    store.add_texts(['alpha', 'beta'])
+    store.persist()
+
+    # A save failing after the index file was written must not affect the saved set
+    store.add_texts(['gamma'])
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+    monkeypatch.setattr(json, 'dump', fail)
+    with pytest.raises(OSError):
+        store.persist()
+    monkeypatch.undo()
+
+    reloaded = HNSWVectorStore(embeddings, persist_directory=str(tmp_path))
+    assert sorted(document.page_content for document, _ in reloaded.similarity_search_with_score('alpha', k=5)) == ['alpha', 'beta']
+
+    store.persist()
+    reloaded = HNSWVectorStore(embeddings, persist_directory=str(tmp_path))
+    assert len(reloaded) == 3
+    assert reloaded.similarity_search('gamma', k=1)[0].page_content == 'gamma'
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['documents-1.jsonl', 'index-2.bin', 'meta.json']
+
+
+def test_hnsw_saves_append_inserts_and_deletes(tmp_path):
+    pytest.importorskip('hnswlib')
+    from websocietysimulator.agent.modules.vector_store import HNSWVectorStore
+
+    embeddings = MockEmbeddings()
+    store = HNSWVectorStore(embeddings, persist_directory=str(tmp_path), save_every=0)
+    ids = store.add_texts(['alpha', 'beta', 'gamma'])
+    store.persist()
+    log = (tmp_path / 'documents-1.jsonl').read_bytes()
+
+    store.delete([ids[1]])
+    store.add_texts(['delta'], ids=[ids[0]])
+    store.persist()
+
+    # The second save appended a delete, and a delete and insert for the replaced id
+    appended = (tmp_path / 'documents-1.jsonl').read_bytes()
+    assert appended.startswith(log)
+    assert len(appended[len(log):].splitlines()) == 3
+    reloaded = HNSWVectorStore(embeddings, persist_directory=str(tmp_path))
+    assert sorted(document.page_content for document in reloaded.get_by_ids(ids)) == ['delta', 'gamma']
+    assert reloaded.similarity_search('delta', k=1)[0].id == ids[0]
+
+
+def test_hnsw_log_is_compacted_once_mostly_deletes(tmp_path):
+    pytest.importorskip('hnswlib')
+    from websocietysimulator.agent.modules.vector_store import HNSWVectorStore
+
+    embeddings = MockEmbeddings()
+    store = HNSWVectorStore(embeddings, persist_directory=str(tmp_path), save_every=0)
+    ids = store.add_texts([f'memory {i}' for i in range(600)])
+    store.persist()
+    store.delete(ids[:590])
+    store.persist()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['documents-2.jsonl', 'index-2.bin', 'meta.json']
+    assert len((tmp_path / 'documents-2.jsonl').read_bytes().splitlines()) == 10
+    assert len(HNSWVectorStore(embeddings, persist_directory=str(tmp_path))) == 10
@@ -3,9 +3,12 @@ from .planning_modules import PlanningBase, PlanningDEPS, PlanningHUGGINGGPT, Pl
 from .reasoning_modules import ReasoningBase, ReasoningCOT, ReasoningCOTSC, ReasoningDILU, ReasoningIO, ReasoningSelfRefine, ReasoningStepBack, ReasoningTOT
 from .tooluse_modules import ToolUseBase, ToolUseAnyTool, ToolUseIO, ToolUseToolBench, ToolUseToolBenchFormer, ToolUseToolFormer
 from .tooluse_pool import tooluse_pool
+from .tool_registry import ActionParser, ToolCall, ToolRegistry, ToolResult
+from .vector_store import HNSWVectorStore, InProcessVectorStore, NumpyVectorStore
 
 __all__ = ['MemoryBase', 'MemoryDILU', 'MemoryGenerative', 'MemoryTP', 'MemoryVoyager',
            'PlanningBase', 'PlanningDEPS', 'PlanningHUGGINGGPT', 'PlanningIO', 'PlanningOPENAGI', 'PlanningTD', 'PlanningVoyager',
            'ReasoningBase', 'ReasoningCOT', 'ReasoningCOTSC', 'ReasoningDILU', 'ReasoningIO', 'ReasoningSelfRefine', 'ReasoningStepBack', 'ReasoningTOT',
            'ToolUseBase', 'ToolUseAnyTool', 'ToolUseIO', 'ToolUseToolBench', 'ToolUseToolBenchFormer', 'ToolUseToolFormer',
-           'tooluse_pool']
\ No newline at end of file
+           'tooluse_pool', 'ActionParser', 'ToolCall', 'ToolRegistry', 'ToolResult',
+           'HNSWVectorStore', 'InProcessVectorStore', 'NumpyVectorStore']
\ No newline at end of file
@@ -0,0 +1,133 @@
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+EVICTION_POLICIES = ('lru', 'importance', 'time_decay')
+
+
+@dataclass
+class MemoryStats:
+    inserts: int = 0
+    evictions: int = 0
+    retrievals: int = 0
+    hits: int = 0
+    total_hit_age: float = 0.0
+    max_hit_age: float = 0.0
+
+    @property
+    def mean_hit_age(self) -> float:
+        return self.total_hit_age / self.hits if self.hits else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'inserts': self.inserts,
+            'evictions': self.evictions,
+            'retrievals': self.retrievals,
+            'hits': self.hits,
+            'mean_hit_age': self.mean_hit_age,
+            'max_hit_age': self.max_hit_age
+        }
+
+
+@dataclass
+class _MemoryState:
+    inserted_at: float
+    last_access: float
+    importance: float
+
+
+class EvictionQueue:
+    def __init__(self, policy: str = 'lru', half_life: float = 3600.0, default_importance: float = 5.0):
+        """
+        Order stored memories by how evictable they are
+
+        Priorities live in a min-heap with lazy invalidation. An access or new importance pushes
+        a fresh entry and leaves the old one in place. pop() skips the stale entries, so every
+        operation is amortized O(log n).
+
+        Policies:
+            lru: evict the memory retrieved (or inserted) least recently
+            importance: evict the lowest importance score, least recently used first among equals
+            time_decay: evict the lowest importance * 0.5 ** (age since last access / half_life),
+                the retrieval score of generative agents. Its log is log(importance) + t * ln 2 / half_life
+                minus a term shared by all memories, so the order of the stored keys never changes.
+
+        Args:
+            policy: One of 'lru', 'importance', 'time_decay'
+            half_life: Seconds after which the time-decayed score of an unused memory halves
+            default_importance: Importance of memories that were never scored
+        """
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy}, use one of {', '.join(EVICTION_POLICIES)}")
+        self.policy = policy
+        self.decay_rate = math.log(2) / half_life
+        self.default_importance = default_importance
+        self._states: Dict[str, _MemoryState] = {}
+        self._heap: List[Tuple[Any, int, str]] = []
+        # Sequence number of the live heap entry of each memory
+        self._live: Dict[str, int] = {}
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self._states
+
+    def _priority(self, state: _MemoryState):
+        if self.policy == 'lru':
+            return state.last_access
+        if self.policy == 'importance':
+            return (state.importance, state.last_access)
+        return math.log(max(state.importance, 1e-9)) + self.decay_rate * state.last_access
+
+    def _push(self, memory_id: str):
+        sequence = next(self._sequence)
+        self._live[memory_id] = sequence
+        heapq.heappush(self._heap, (self._priority(self._states[memory_id]), sequence, memory_id))
+        # Drop stale entries once they outnumber the live ones
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self._heap = [entry for entry in self._heap if self._live.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
+
+    def insert(self, memory_id: str, importance: Optional[float] = None, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self._states[memory_id] = _MemoryState(now, now, self.default_importance if importance is None else importance)
+        self._push(memory_id)
+
+    def access(self, memory_id: str, now: Optional[float] = None) -> Optional[float]:
+        """
+        Mark a memory as retrieved
+
+        Returns:
+            Optional[float]: Seconds since the memory was inserted, None for unknown memories
+        """
+        state = self._states.get(memory_id)
+        if state is None:
+            return None
+        now = time.monotonic() if now is None else now
+        state.last_access = now
+        self._push(memory_id)
+        return now - state.inserted_at
+
+    def set_importance(self, memory_id: str, importance: float):
+        state = self._states.get(memory_id)
+        if state is not None and state.importance != importance:
+            state.importance = importance
+            self._push(memory_id)
+
+    def remove(self, memory_id: str):
+        self._states.pop(memory_id, None)
+        self._live.pop(memory_id, None)
+
+    def pop(self) -> Optional[str]:
+        """Remove and return the most evictable memory, None when empty."""
+        while self._heap:
+            _, sequence, memory_id = heapq.heappop(self._heap)
+            if self._live.get(memory_id) == sequence:
+                self.remove(memory_id)
+                return memory_id
+        return None
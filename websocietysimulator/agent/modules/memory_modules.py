@@ -1,28 +1,56 @@
+import contextvars
 import os
 import re
-from langchain_chroma import Chroma
-from langchain.docstore.document import Document
-import shutil
+import threading
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from langchain.docstore.document import Document
+from ...llm.batch import in_batch_job
+from ...llm.routing import call_tag
+from ...llm.utils import embedding_model_name, request_key
+from langchain_core.vectorstores import VectorStore
+from .memory_eviction import EvictionQueue, MemoryStats
+from .vector_store import InProcessVectorStore, NumpyVectorStore
 
 class MemoryBase:
-    def __init__(self, memory_type: str, llm) -> None:
+    def __init__(self, memory_type: str, llm, persist_directory: Optional[str] = None, vector_store: Optional[VectorStore] = None, capacity: Optional[int] = None, eviction: str = 'lru') -> None:
         """
         Initialize the memory base class
         
         Args:
             memory_type: Type of memory
             llm: LLM instance used to generate memory-related text
+            persist_directory: Optional directory to keep the memories in a persistent Chroma
+                collection, by default they are held in memory and dropped with the agent
+            vector_store: Optional store to use instead, e.g. an HNSWVectorStore for large memories
+            capacity: Optional maximum number of memories added through this instance, the most
+                evictable ones are deleted on insert
+            eviction: Eviction policy, 'lru', 'importance' or 'time_decay', see EvictionQueue
         """
         self.llm = llm
         self.embedding = self.llm.get_embedding_model()
-        db_path = os.path.join('./db', memory_type, f'{str(uuid.uuid4())}')
-        if os.path.exists(db_path):
-            shutil.rmtree(db_path)
-        self.scenario_memory = Chroma(
-            embedding_function=self.embedding,
-            persist_directory=db_path
-        )
+        self.capacity = capacity
+        self.eviction = EvictionQueue(eviction)
+        self.stats = MemoryStats()
+        self._memory_lock = threading.Lock()
+        if vector_store is not None:
+            self.scenario_memory = vector_store
+        elif persist_directory:
+            from langchain_chroma import Chroma
+            self.scenario_memory = Chroma(
+                embedding_function=self.embedding,
+                persist_directory=os.path.join(persist_directory, memory_type)
+            )
+        else:
+            self.scenario_memory = NumpyVectorStore(self.embedding)
+
+    def memory_count(self) -> int:
+        """Number of stored memories."""
+        if isinstance(self.scenario_memory, InProcessVectorStore):
+            return len(self.scenario_memory)
+        return self.scenario_memory._collection.count()
 
     def __call__(self, current_situation: str = ''):
         if 'review:' in current_situation:
@@ -36,21 +64,112 @@ class MemoryBase:
     def addMemory(self, current_situation: str):
         raise NotImplementedError("This method should be implemented by subclasses.")
 
+    def add_memories(self, current_situations: List[str], vectors: Optional[Sequence[Sequence[float]]] = None, vectors_model: Optional[str] = None):
+        """
+        Add many memories at once, e.g. all reviews of an item
+
+        The texts are embedded in batched requests and inserted into the store in one operation,
+        instead of one embedding request and one write per memory.
+
+        Args:
+            current_situations: Memory texts, without the 'review:' prefix used by __call__
+            vectors: Optional precomputed embeddings of the texts, e.g. from ReviewEmbeddingIndex.item_vectors,
+                the texts are then not embedded again
+            vectors_model: Embedding model of the vectors, e.g. ReviewEmbeddingIndex.model, required
+                with vectors and checked against the model of this memory
+        """
+        if not current_situations:
+            return
+        if vectors is not None:
+            self._check_vectors_model(vectors_model)
+        self._store_documents(self._memory_documents(current_situations), vectors)
+
+    def _check_vectors_model(self, vectors_model: Optional[str]):
+        # Vectors of another model would be compared with queries embedded by this memory's model
+        model = embedding_model_name(self.embedding)
+        if vectors_model != model:
+            raise ValueError(f"Precomputed vectors of {vectors_model} cannot be added to a memory embedding with {model}")
+
+    def _store_documents(self, documents: List[Document], vectors: Optional[Sequence[Sequence[float]]] = None) -> List[str]:
+        """Insert documents into the store, then evict down to the capacity."""
+        if vectors is None:
+            ids = self.scenario_memory.add_documents(documents)
+        elif isinstance(self.scenario_memory, InProcessVectorStore):
+            ids = self.scenario_memory.add_vectors(
+                vectors,
+                [document.page_content for document in documents],
+                [document.metadata for document in documents]
+            )
+        else:
+            ids = [str(uuid.uuid4()) for _ in documents]
+            self.scenario_memory._collection.add(
+                ids=ids,
+                embeddings=[list(map(float, vector)) for vector in vectors],
+                metadatas=[document.metadata for document in documents],
+                documents=[document.page_content for document in documents]
+            )
+
+        with self._memory_lock:
+            for memory_id in ids:
+                self.eviction.insert(memory_id)
+            self.stats.inserts += len(ids)
+            evicted = []
+            while self.capacity is not None and len(self.eviction) > self.capacity:
+                evicted.append(self.eviction.pop())
+            self.stats.evictions += len(evicted)
+        if evicted:
+            self.scenario_memory.delete(evicted)
+        return ids
+
+    def _search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        """Similarity search that records the retrieved memories for eviction and stats."""
+        similarity_results = self.scenario_memory.similarity_search_with_score(query, k=k)
+        with self._memory_lock:
+            self.stats.retrievals += 1
+            for document, _ in similarity_results:
+                age = self.eviction.access(document.id) if document.id else None
+                if age is not None:
+                    self.stats.hits += 1
+                    self.stats.total_hit_age += age
+                    self.stats.max_hit_age = max(self.stats.max_hit_age, age)
+        return similarity_results
+
+    def set_importance(self, memory_id: str, importance: float):
+        """Importance score of a memory, used by the 'importance' and 'time_decay' eviction policies."""
+        with self._memory_lock:
+            self.eviction.set_importance(memory_id, importance)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Insert, eviction and retrieval counts, and the age in seconds of the retrieved memories."""
+        with self._memory_lock:
+            return dict(self.stats.to_dict(), size=len(self.eviction), capacity=self.capacity)
+
+    def _memory_document(self, current_situation: str) -> Document:
+        return Document(
+            page_content=current_situation,
+            metadata={
+                "task_name": current_situation,
+                "task_trajectory": current_situation
+            }
+        )
+
+    def _memory_documents(self, current_situations: List[str]) -> List[Document]:
+        return [self._memory_document(current_situation) for current_situation in current_situations]
+
 class MemoryDILU(MemoryBase):
-    def __init__(self, llm):
-        super().__init__(memory_type='dilu', llm=llm)
+    def __init__(self, llm, persist_directory: Optional[str] = None, vector_store: Optional[VectorStore] = None, capacity: Optional[int] = None, eviction: str = 'lru'):
+        super().__init__(memory_type='dilu', llm=llm, persist_directory=persist_directory, vector_store=vector_store, capacity=capacity, eviction=eviction)
 
     def retriveMemory(self, query_scenario: str):
         # Extract task name from query scenario
         task_name = query_scenario
         
         # Return empty string if memory is empty
-        if self.scenario_memory._collection.count() == 0:
+        if self.memory_count() == 0:
             return ''
             
         # Find most similar memory
-        similarity_results = self.scenario_memory.similarity_search_with_score(
-            task_name, k=1)
+        similarity_results = self._search(task_name, k=1)
             
         # Extract task trajectories from results
         task_trajectories = [
@@ -74,34 +193,97 @@ class MemoryDILU(MemoryBase):
         )
         
         # Add to memory store
-        self.scenario_memory.add_documents([memory_doc])
+        self._store_documents([memory_doc])
 
 class MemoryGenerative(MemoryBase):
-    def __init__(self, llm):
-        super().__init__(memory_type='generative', llm=llm)
+    # Relevance scores by (model, query, memory), shared by all instances of the process
+    _score_cache: "OrderedDict[str, int]" = OrderedDict()
+    _score_cache_lock = threading.Lock()
+    score_cache_size = 10000
+
+    def __init__(self, llm, persist_directory: Optional[str] = None, vector_store: Optional[VectorStore] = None, capacity: Optional[int] = None, eviction: str = 'lru'):
+        super().__init__(memory_type='generative', llm=llm, persist_directory=persist_directory, vector_store=vector_store, capacity=capacity, eviction=eviction)
 
     def retriveMemory(self, query_scenario: str):
         # Extract task name from query
         task_name = query_scenario
         
         # Return empty if no memories exist
-        if self.scenario_memory._collection.count() == 0:
+        if self.memory_count() == 0:
             return ''
             
         # Get top 3 similar memories
-        similarity_results = self.scenario_memory.similarity_search_with_score(
-            task_name, k=3)
-            
-        fewshot_results = []
-        importance_scores = []
+        similarity_results = self._search(task_name, k=3)
 
         # Score each memory's relevance
-        for result in similarity_results:
-            trajectory = result[0].metadata['task_trajectory']
-            fewshot_results.append(trajectory)
-            
-            # Generate prompt to evaluate importance
-            prompt = f'''You will be given a successful case where you successfully complete the task. Then you will be given an ongoing task. Do not summarize these two cases, but rather evaluate how relevant and helpful the successful case is for the ongoing task, on a scale of 1-10.
+        trajectories = [result[0].metadata['task_trajectory'] for result in similarity_results]
+        importance_scores = self.score_memories(trajectories, query_scenario)
+        for (document, _), score in zip(similarity_results, importance_scores):
+            if document.id:
+                self.set_importance(document.id, score)
+
+        # Return trajectory with highest importance score
+        max_score_idx = importance_scores.index(max(importance_scores))
+        return similarity_results[max_score_idx][0].metadata['task_trajectory']
+
+    def score_memories(self, trajectories: List[str], query_scenario: str) -> List[int]:
+        """
+        Relevance scores (1-10) of memories for the ongoing task
+
+        Cached scores are reused. The others are rated together in one prompt, falling back to
+        one concurrent call per memory when the combined answer cannot be parsed.
+
+        Args:
+            trajectories: Memories to score
+            query_scenario: Ongoing task
+
+        Returns:
+            List[int]: Score of each memory, 0 when the LLM gave none
+        """
+        model = getattr(self.llm, 'model', None)
+        keys = [request_key({'model': model, 'query': query_scenario, 'memory': trajectory}) for trajectory in trajectories]
+        scores: List[Optional[int]] = []
+        with self._score_cache_lock:
+            for key in keys:
+                scores.append(self._score_cache.get(key))
+                if key in self._score_cache:
+                    self._score_cache.move_to_end(key)
+
+        missing = list(dict.fromkeys(trajectory for trajectory, score in zip(trajectories, scores) if score is None))
+        if missing:
+            new_scores = self._score_together(missing, query_scenario) if len(missing) > 1 else None
+            if new_scores is None:
+                new_scores = self._score_concurrently(missing, query_scenario)
+            computed = dict(zip(missing, new_scores))
+            with self._score_cache_lock:
+                for i, (key, trajectory) in enumerate(zip(keys, trajectories)):
+                    if scores[i] is None:
+                        scores[i] = computed[trajectory]
+                        self._score_cache[key] = scores[i]
+                while len(self._score_cache) > self.score_cache_size:
+                    self._score_cache.popitem(last=False)
+        return scores
+
+    def _score_together(self, trajectories: List[str], query_scenario: str) -> Optional[List[int]]:
+        cases = '\n'.join(f'Success Case {i}:\n{trajectory}' for i, trajectory in enumerate(trajectories, 1))
+        output_format = '\n'.join(f'Case {i} Score: ' for i in range(1, len(trajectories) + 1))
+        prompt = f'''You will be given {len(trajectories)} successful cases where you successfully complete the task. Then you will be given an ongoing task. Do not summarize these cases, but rather evaluate how relevant and helpful each successful case is for the ongoing task, on a scale of 1-10.
+{cases}
+Ongoing task:
+{query_scenario}
+Your output format should be one line per case:
+{output_format}'''
+
+        with call_tag('memory_batch_scoring'):
+            response = self.llm(messages=[{"role": "user", "content": prompt}], temperature=0.1)
+        found = {int(case): int(score) for case, score in re.findall(r'Case\s*(\d+)\s*Score:\s*(\d+)', response)}
+        if any(i not in found for i in range(1, len(trajectories) + 1)):
+            return None
+        return [found[i] for i in range(1, len(trajectories) + 1)]
+
+    def _score_one(self, trajectory: str, query_scenario: str) -> int:
+        # Generate prompt to evaluate importance
+        prompt = f'''You will be given a successful case where you successfully complete the task. Then you will be given an ongoing task. Do not summarize these two cases, but rather evaluate how relevant and helpful the successful case is for the ongoing task, on a scale of 1-10.
 Success Case:
 {trajectory}
 Ongoing task:
@@ -109,14 +291,22 @@ Ongoing task:
 Your output format should be:
 Score: '''
 
-            # Get importance score
+        # Get importance score
+        with call_tag('memory_scoring'):
             response = self.llm(messages=[{"role": "user", "content": prompt}], temperature=0.1, stop_strs=['\n'])
-            score = int(re.search(r'\d+', response).group()) if re.search(r'\d+', response) else 0
-            importance_scores.append(score)
+        return int(re.search(r'\d+', response).group()) if re.search(r'\d+', response) else 0
 
-        # Return trajectory with highest importance score
-        max_score_idx = importance_scores.index(max(importance_scores))
-        return similarity_results[max_score_idx][0].metadata['task_trajectory']
+    def _score_concurrently(self, trajectories: List[str], query_scenario: str) -> List[int]:
+        # Inside a batch job every call waits for the next round anyway, so threads add nothing
+        if len(trajectories) == 1 or in_batch_job():
+            return [self._score_one(trajectory, query_scenario) for trajectory in trajectories]
+        # Each call runs in a copy of the caller's context so task deadlines and usage scopes still apply
+        with ThreadPoolExecutor(max_workers=len(trajectories)) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._score_one, trajectory, query_scenario)
+                for trajectory in trajectories
+            ]
+            return [future.result() for future in futures]
     
     def addMemory(self, current_situation: str):
         # Extract task description
@@ -132,23 +322,22 @@ Score: '''
         )
         
         # Add to memory store
-        self.scenario_memory.add_documents([memory_doc])
+        self._store_documents([memory_doc])
 
 class MemoryTP(MemoryBase):
-    def __init__(self, llm):
-        super().__init__(memory_type='tp', llm=llm)
+    def __init__(self, llm, persist_directory: Optional[str] = None, vector_store: Optional[VectorStore] = None, capacity: Optional[int] = None, eviction: str = 'lru'):
+        super().__init__(memory_type='tp', llm=llm, persist_directory=persist_directory, vector_store=vector_store, capacity=capacity, eviction=eviction)
 
     def retriveMemory(self, query_scenario: str):
         # Extract task name from scenario
         task_name = query_scenario
         
         # Return empty if no memories exist
-        if self.scenario_memory._collection.count() == 0:
+        if self.memory_count() == 0:
             return ''
             
         # Find most similar memory
-        similarity_results = self.scenario_memory.similarity_search_with_score(
-            task_name, k=1)
+        similarity_results = self._search(task_name, k=1)
             
         # Generate plans based on similar experiences
         experience_plans = []
@@ -180,22 +369,32 @@ Plan:
         )
         
         # Add to memory store
-        self.scenario_memory.add_documents([memory_doc])
+        self._store_documents([memory_doc])
 
 class MemoryVoyager(MemoryBase):
-    def __init__(self, llm):
-        super().__init__(memory_type='voyager', llm=llm)
+    def __init__(self, llm, persist_directory: Optional[str] = None, vector_store: Optional[VectorStore] = None, capacity: Optional[int] = None, eviction: str = 'lru', max_workers: int = 8):
+        """
+        Args:
+            llm: LLM instance used to summarize trajectories
+            persist_directory: Optional directory of a persistent Chroma collection
+            vector_store: Optional store to use instead
+            capacity: Optional maximum number of memories
+            eviction: Eviction policy, 'lru', 'importance' or 'time_decay'
+            max_workers: Concurrent summary requests in add_memories
+        """
+        super().__init__(memory_type='voyager', llm=llm, persist_directory=persist_directory, vector_store=vector_store, capacity=capacity, eviction=eviction)
+        self.max_workers = max_workers
 
     def retriveMemory(self, query_scenario: str):
         # Extract task name from query
         task_name = query_scenario
         
         # Return empty if no memories exist
-        if self.scenario_memory._collection.count() == 0:
+        if self.memory_count() == 0:
             return ''
             
         # Find most similar memories
-        similarity_results = self.scenario_memory.similarity_search_with_score(task_name, k=1)
+        similarity_results = self._search(task_name, k=1)
         
         # Extract trajectories from results
         memory_trajectories = [result[0].metadata['task_trajectory'] 
@@ -203,7 +402,7 @@ class MemoryVoyager(MemoryBase):
                              
         return '\n'.join(memory_trajectories)
 
-    def addMemory(self, current_situation: str):
+    def _memory_document(self, current_situation: str) -> Document:
         # Prompt template for summarizing trajectory
         voyager_prompt = '''You are a helpful assistant that writes a description of the task resolution trajectory.
 
@@ -222,14 +421,33 @@ Please fill in this part yourself
         trajectory_summary = self.llm(messages=[{"role": "user", "content": prompt}], temperature=0.1)
         
         # Create document with metadata
-        doc = Document(
+        return Document(
             page_content=trajectory_summary,
             metadata={
                 "task_description": trajectory_summary,
                 "task_trajectory": current_situation
             }
         )
-        
-        # Add to memory store
-        self.scenario_memory.add_documents([doc])
 
+    def add_memories(self, current_situations: List[str], vectors: Optional[Sequence[Sequence[float]]] = None, vectors_model: Optional[str] = None):
+        # Precomputed vectors embed the raw texts, but the summaries stored here are what is searched
+        if vectors is not None:
+            raise ValueError("MemoryVoyager embeds the summaries of the memories, precomputed vectors of the texts cannot be used")
+        super().add_memories(current_situations)
+
+    def _memory_documents(self, current_situations: List[str]) -> List[Document]:
+        # Inside a batch job every call waits for the next round anyway, so threads add nothing
+        if len(current_situations) == 1 or self.max_workers <= 1 or in_batch_job():
+            return super()._memory_documents(current_situations)
+        # Summaries are generated concurrently, each in a copy of the caller's context so task
+        # deadlines and usage scopes still apply
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(current_situations))) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._memory_document, current_situation)
+                for current_situation in current_situations
+            ]
+            return [future.result() for future in futures]
+
+    def addMemory(self, current_situation: str):
+        # Add to memory store
+        self._store_documents([self._memory_document(current_situation)])
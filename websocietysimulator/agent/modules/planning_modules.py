@@ -1,5 +1,6 @@
 import re
 import ast
+from ...llm.routing import call_tag
 
 class PlanningBase():
     def __init__(self, llm):
@@ -20,10 +21,11 @@ class PlanningBase():
         
         # Use the new LLM call method
         messages = [{"role": "user", "content": prompt}]
-        string = self.llm(
-            messages=messages,
-            temperature=0.1
-        )
+        with call_tag('planning'):
+            string = self.llm(
+                messages=messages,
+                temperature=0.1
+            )
         
         dict_strings = re.findall(r"\{[^{}]*\}", string)
         dicts = [ast.literal_eval(ds) for ds in dict_strings]
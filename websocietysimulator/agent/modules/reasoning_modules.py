@@ -1,5 +1,6 @@
 from collections import Counter
 import re
+from ...llm.routing import call_tag
 
 class ReasoningBase:
     def __init__(self, profile_type_prompt, memory, llm):
@@ -102,11 +103,12 @@ Here is the task:
         messages = [{"role": "user", "content": prompt}]
         for i, y in enumerate(reasoning_results, 1):
             prompt += f'Answer {i}:\n{y}\n'
-        vote_outputs = self.llm(
-            messages=messages,
-            temperature=0.7,
-            n=5
-        )
+        with call_tag('tot_voting'):
+            vote_outputs = self.llm(
+                messages=messages,
+                temperature=0.7,
+                n=5
+            )
         vote_results = [0] * len(reasoning_results)
         for vote_output in vote_outputs:
             pattern = r".*best answer is .*(\d+).*"
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+from ...llm.utils import embedding_model_name, request_key
+from .tooluse_pool import tooluse_pool
+from .vector_store import normalize, top_k
+
+logger = logging.getLogger("websocietysimulator")
+
+DEFAULT_CACHE_DIR = './db/tool_index'
+
+API_PATTERN = re.compile(r"\[(\d+)\] ([^:]+): (.+?)(?=\[\d+\]|\Z)", re.DOTALL)
+
+
+def parse_tools(tools: str) -> List[Dict[str, str]]:
+    """Tools of a pool text with their name, full description and the first sentence that is embedded."""
+    return [
+        {
+            'name': api_name.strip(),
+            'description': f"[{api_id}] {api_name}: {api_description.strip()}",
+            'summary': api_description.split('.')[0].strip() + '.'
+        }
+        for api_id, api_name, api_description in API_PATTERN.findall(tools)
+    ]
+
+
+def pool_hash(pool: Dict[str, str], model: str) -> str:
+    """Content hash of the tool pools and the embedding model an index is valid for."""
+    return request_key({'model': model, 'pools': pool})
+
+
+def index_path(cache_dir: str, model: str, content_hash: str) -> str:
+    """File of the index of a model and pool content, so indexes of different models coexist."""
+    return os.path.join(cache_dir, f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', model)}-{content_hash[:16]}.npz")
+
+
+class ToolIndex:
+    _loaded: Dict[str, "ToolIndex"] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, embeddings: Any, content_hash: str, names: Dict[str, np.ndarray], descriptions: Dict[str, np.ndarray], vectors: Dict[str, np.ndarray]):
+        """
+        Prebuilt tool retrieval index: normalized embeddings of the tool descriptions of every pool
+
+        Use ToolIndex.get, which embeds the pools on first use and caches the index on disk, one
+        file per embedding model and pool content.
+
+        Args:
+            embeddings: Embeddings used for the queries
+            content_hash: pool_hash of the pools and model the vectors were computed for
+            names: Tool names by pool
+            descriptions: Full tool descriptions by pool
+            vectors: Normalized float32 vectors by pool, one row per tool
+        """
+        self.embeddings = embeddings
+        self.content_hash = content_hash
+        self.names = names
+        self.descriptions = descriptions
+        self.vectors = vectors
+
+    @classmethod
+    def get(cls, embeddings: Any, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, pool: Optional[Dict[str, str]] = None) -> "ToolIndex":
+        """
+        Index for the current tool pools, memoized for the process
+
+        Args:
+            embeddings: Embeddings of the queries, each model has its own index
+            cache_dir: Optional directory the index files are kept in, None keeps them in memory only
+            pool: Tool pools, defaults to tooluse_pool
+
+        Returns:
+            ToolIndex: Index whose vectors match the pools and model
+        """
+        pool = pool if pool is not None else tooluse_pool
+        model = embedding_model_name(embeddings)
+        content_hash = pool_hash(pool, model)
+        with cls._lock:
+            index = cls._loaded.get(content_hash)
+            if index is None:
+                path = index_path(cache_dir, model, content_hash) if cache_dir else None
+                index = cls.load(path, embeddings) if path else None
+                if index is None or index.content_hash != content_hash:
+                    logger.info(f"Building tool index for {model}")
+                    index = cls.build(embeddings, pool)
+                    if path:
+                        index.save(path)
+                cls._loaded[content_hash] = index
+        if index.embeddings is not embeddings:
+            index = cls(embeddings, index.content_hash, index.names, index.descriptions, index.vectors)
+        return index
+
+    @classmethod
+    def build(cls, embeddings: Any, pool: Optional[Dict[str, str]] = None) -> "ToolIndex":
+        """Embed the first sentence of every tool description of every pool."""
+        pool = pool if pool is not None else tooluse_pool
+        names, descriptions, vectors = {}, {}, {}
+        for name, tools in pool.items():
+            parsed = parse_tools(tools)
+            embedded = np.asarray(embeddings.embed_documents([tool['summary'] for tool in parsed]), dtype=np.float32)
+            names[name] = np.array([tool['name'] for tool in parsed])
+            descriptions[name] = np.array([tool['description'] for tool in parsed])
+            vectors[name] = normalize(embedded)
+        return cls(embeddings, pool_hash(pool, embedding_model_name(embeddings)), names, descriptions, vectors)
+
+    @classmethod
+    def load(cls, path: str, embeddings: Any = None) -> Optional["ToolIndex"]:
+        """Read an index written by save, None if there is none."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(
+                embeddings,
+                meta['content_hash'],
+                {name: data[f'{name}/names'] for name in meta['pools']},
+                {name: data[f'{name}/descriptions'] for name in meta['pools']},
+                {name: data[f'{name}/vectors'] for name in meta['pools']}
+            )
+
+    def save(self, path: str):
+        arrays = {'meta': np.array(json.dumps({'content_hash': self.content_hash, 'pools': list(self.vectors)}))}
+        for name in self.vectors:
+            arrays[f'{name}/names'] = self.names[name]
+            arrays[f'{name}/descriptions'] = self.descriptions[name]
+            arrays[f'{name}/vectors'] = self.vectors[name]
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # An unwritable cache directory still works, the index is rebuilt by each process
+            logger.warning(f"Could not write tool index to {path}: {e}")
+
+    def search(self, pool_name: str, query: str, k: int = 4) -> List[str]:
+        """
+        Full descriptions of the k tools of a pool closest to a query
+
+        Only the query is embedded, the tools are ranked with one matrix-vector product.
+        """
+        vectors = self.vectors[pool_name]
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        scores = vectors @ query_vector
+        return [str(self.descriptions[pool_name][i]) for i in top_k(scores, k)]
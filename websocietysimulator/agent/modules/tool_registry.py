@@ -0,0 +1,346 @@
+import ast
+import contextvars
+import copy
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, get_args, get_origin
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+ACTION_START = 'Action:'
+ACTION_END = 'End Action'
+
+
+@dataclass
+class ToolCall:
+    name: str
+    args: List[str] = field(default_factory=list)
+    kwargs: Dict[str, str] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        parts = [self.name] + self.args + [f'{key}={value}' for key, value in self.kwargs.items()]
+        return ', '.join(parts)
+
+
+@dataclass
+class ToolResult:
+    call: ToolCall
+    result: Any = None
+    error: Optional[str] = None
+    latency: float = 0.0
+    cached: bool = False
+
+
+@dataclass
+class ToolStats:
+    calls: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        executed = self.calls - self.cache_hits
+        return self.total_latency / executed if executed else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'cache_hits': self.cache_hits,
+            'total_latency': self.total_latency,
+            'mean_latency': self.mean_latency,
+            'max_latency': self.max_latency
+        }
+
+
+@dataclass
+class _Tool:
+    name: str
+    func: Callable[..., Any]
+    signature: inspect.Signature
+    description: str
+    pure: bool
+
+
+def _split_args(text: str) -> List[str]:
+    """Split on commas outside quotes and brackets."""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth = max(0, depth - 1)
+        elif char == ',' and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return [part for part in parts if part]
+
+
+def parse_action(body: str) -> Optional[ToolCall]:
+    """Tool call of the text between 'Action:' and 'End Action', e.g. 'find_flights, A, B, user_id=42'."""
+    parts = _split_args(body.strip().strip('<>'))
+    if not parts:
+        return None
+    call = ToolCall(name=parts[0])
+    for part in parts[1:]:
+        key, sep, value = part.partition('=')
+        if sep and key.strip().isidentifier():
+            call.kwargs[key.strip()] = value.strip()
+        else:
+            call.args.append(part)
+    return call
+
+
+class ActionParser:
+    def __init__(self):
+        """
+        Incremental parser of 'Action: ... End Action' blocks
+
+        Text can be fed as it streams in. Each complete block is returned once, and only the
+        unconsumed tail is kept and searched again.
+        """
+        self._buffer = ''
+
+    def feed(self, text: str) -> List[ToolCall]:
+        """Add text and return the tool calls of the blocks it completed."""
+        self._buffer += text
+        calls = []
+        while True:
+            start = self._buffer.find(ACTION_START)
+            if start < 0:
+                # Keep what could be the beginning of a split 'Action:' marker
+                self._buffer = self._buffer[-(len(ACTION_START) - 1):]
+                break
+            end = self._buffer.find(ACTION_END, start + len(ACTION_START))
+            if end < 0:
+                self._buffer = self._buffer[start:]
+                break
+            call = parse_action(self._buffer[start + len(ACTION_START):end])
+            if call is not None:
+                calls.append(call)
+            self._buffer = self._buffer[end + len(ACTION_END):]
+        return calls
+
+    @staticmethod
+    def parse(text: str) -> List[ToolCall]:
+        """All tool calls of a complete text."""
+        return ActionParser().feed(text)
+
+
+def _convert(value: str, annotation: Any) -> Any:
+    # Optional[X] converts like X
+    if get_origin(annotation) is Union:
+        types = [arg for arg in get_args(annotation) if arg is not type(None)]
+        annotation = types[0] if len(types) == 1 else inspect.Parameter.empty
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"':
+        value = value[1:-1]
+        return value if annotation in (inspect.Parameter.empty, str) else _convert(value, annotation)
+    if annotation is bool:
+        return value.lower() in ('true', '1', 'yes')
+    if annotation in (int, float):
+        return annotation(value)
+    if annotation is str:
+        return value
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+class ToolRegistry:
+    def __init__(self, max_workers: int = 8, cache_size: int = 1024):
+        """
+        Python callables that agents invoke with 'Action: name, args End Action' text
+
+        Arguments are converted according to the annotations of the registered signature. Actions
+        of one batch are independent and run concurrently on threads that only live for the batch.
+        Results of tools registered as pure are memoized in an LRU cache, and every caller gets its
+        own deep copy, so mutating a result does not change what later calls receive.
+
+        Args:
+            max_workers: Maximum number of threads running the actions of a batch
+            cache_size: Maximum number of memoized results, 0 disables memoization
+        """
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._tools: Dict[str, _Tool] = {}
+        self._stats: Dict[str, ToolStats] = {}
+        self._cache: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._in_flight: Dict[Tuple, Future] = {}
+        # Reentrant, the done callback of a call that already finished runs inside _submit
+        self._lock = threading.RLock()
+
+    def register(self, func: Optional[Callable[..., Any]] = None, *, name: Optional[str] = None, description: Optional[str] = None, pure: bool = False):
+        """
+        Register a callable, directly or as a decorator
+
+        Args:
+            func: Callable to register
+            name: Tool name used in actions, defaults to the function name
+            description: Tool description, defaults to the first line of the docstring
+            pure: Whether equal arguments always give equal results, so results can be memoized.
+                Only worth it for expensive tools, memoized results are deep-copied for every caller.
+        """
+        def decorator(f: Callable[..., Any]) -> Callable[..., Any]:
+            tool_name = name or f.__name__
+            doc = (inspect.getdoc(f) or '').strip().split('\n')[0]
+            with self._lock:
+                self._tools[tool_name] = _Tool(tool_name, f, inspect.signature(f), description or doc, pure)
+                self._stats.setdefault(tool_name, ToolStats())
+            return f
+        return decorator(func) if func is not None else decorator
+
+    @classmethod
+    def from_interaction_tool(cls, interaction_tool, max_workers: int = 8, cache_size: int = 1024) -> "ToolRegistry":
+        """Registry with the read-only lookups of an InteractionTool or CacheInteractionTool."""
+        registry = cls(max_workers=max_workers, cache_size=cache_size)
+        # In-memory lookups, cheaper than memoizing and copying their results
+        registry.register(interaction_tool.get_user)
+        registry.register(interaction_tool.get_item)
+        registry.register(interaction_tool.get_reviews)
+        return registry
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def describe(self) -> str:
+        """Tool pool text in the format of tooluse_pool, for the tool-use prompts."""
+        lines = []
+        for i, tool in enumerate(self._tools.values(), 1):
+            params = [p for p in tool.signature.parameters.values() if p.kind not in (p.VAR_KEYWORD,)]
+            example = ', '.join([tool.name] + [f'<{p.name}>' for p in params])
+            lines.append(
+                f"[{i}] {tool.name}: {tool.description}\n"
+                f"Format example: 'Action: {example} End Action'\n"
+                f"    Signature: {tool.name}{tool.signature}"
+            )
+        return '\n'.join(lines)
+
+    def _bind(self, tool: _Tool, call: ToolCall) -> inspect.BoundArguments:
+        params = list(tool.signature.parameters.values())
+        positional = [p for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+        var_positional = next((p for p in params if p.kind == p.VAR_POSITIONAL), None)
+        args, kwargs = [], {}
+        for i, value in enumerate(call.args):
+            param = positional[i] if i < len(positional) else var_positional
+            args.append(_convert(value, param.annotation if param else inspect.Parameter.empty))
+        for key, value in call.kwargs.items():
+            param = tool.signature.parameters.get(key)
+            kwargs[key] = _convert(value, param.annotation if param else inspect.Parameter.empty)
+        bound = tool.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return bound
+
+    def _run(self, tool: _Tool, bound: inspect.BoundArguments) -> Tuple[Any, float]:
+        start = time.perf_counter()
+        result = tool.func(*bound.args, **bound.kwargs)
+        return result, time.perf_counter() - start
+
+    def _submit(self, call: ToolCall, executor: ThreadPoolExecutor) -> Tuple[Optional[Future], ToolResult]:
+        """Start a call, or resolve it at once from the memo or with an error."""
+        result = ToolResult(call=call)
+        tool = self._tools.get(call.name)
+        if tool is None:
+            result.error = f"Unknown tool {call.name}, available tools: {', '.join(self._tools)}"
+            return None, result
+        try:
+            bound = self._bind(tool, call)
+        except (TypeError, ValueError) as e:
+            result.error = f"Invalid arguments for {call.name}: {e}"
+            return None, result
+
+        key = (tool.name, repr(bound.args), repr(sorted(bound.kwargs.items()))) if tool.pure and self.cache_size > 0 else None
+        with self._lock:
+            if key is not None and key in self._cache:
+                self._cache.move_to_end(key)
+                result.result = copy.deepcopy(self._cache[key])
+                result.cached = True
+                return None, result
+            # Identical pure calls in flight share one execution
+            if key is not None and key in self._in_flight:
+                result.cached = True
+                return self._in_flight[key], result
+            future = executor.submit(contextvars.copy_context().run, self._run, tool, bound)
+            if key is not None:
+                self._in_flight[key] = future
+                future.add_done_callback(lambda f, key=key: self._memoize(key, f))
+        return future, result
+
+    def _memoize(self, key: Tuple, future: Future):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if future.exception() is None:
+                # Callers only ever get copies, so the memo can keep the original
+                self._cache[key] = future.result()[0]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+    def _shared(self, call: ToolCall) -> bool:
+        return self._tools[call.name].pure and self.cache_size > 0
+
+    def execute(self, calls: List[ToolCall]) -> List[ToolResult]:
+        """
+        Run independent tool calls concurrently
+
+        Errors are returned in the results instead of raised, so they can be fed back to the LLM.
+
+        Returns:
+            List[ToolResult]: One result per call, in the order of the calls
+        """
+        if not calls:
+            return []
+        results = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(calls)), thread_name_prefix='tool-registry') as executor:
+            submitted = [self._submit(call, executor) for call in calls]
+            for future, result in submitted:
+                if future is not None:
+                    try:
+                        value, latency = future.result()
+                        # The value of a pure call is shared with the memo and identical calls
+                        result.result = copy.deepcopy(value) if self._shared(result.call) else value
+                        if not result.cached:
+                            result.latency = latency
+                    except Exception as e:
+                        result.error = f"{type(e).__name__}: {e}"
+                results.append(result)
+
+        with self._lock:
+            for result in results:
+                stats = self._stats.setdefault(result.call.name, ToolStats())
+                stats.calls += 1
+                stats.errors += result.error is not None
+                stats.cache_hits += result.cached
+                stats.total_latency += result.latency
+                stats.max_latency = max(stats.max_latency, result.latency)
+        return results
+
+    def run(self, text: str) -> List[ToolResult]:
+        """Parse every action block of an LLM output and execute them."""
+        return self.execute(ActionParser.parse(text))
+
+    @staticmethod
+    def format_results(results: List[ToolResult]) -> str:
+        """Feedback text for the next tool-use prompt."""
+        return '\n'.join(
+            f"Action: {result.call} End Action\n" + (f"Error: {result.error}" if result.error else f"Observation: {result.result}")
+            for result in results
+        )
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Calls, errors, memo hits and execution latency by tool."""
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
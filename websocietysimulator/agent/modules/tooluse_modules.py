@@ -1,9 +1,13 @@
 import os
 import re
 import ast
-from langchain_chroma import Chroma
-from langchain.docstore.document import Document
+import json
+import threading
+from typing import Dict, List, Optional
+from .tool_index import ToolIndex
 from .tooluse_pool import tooluse_pool
+from ...llm.batch import in_batch_job
+from ...llm.utils import request_key
 
 class ToolUseBase():
     def __init__(self, llm):
@@ -41,28 +45,94 @@ class ToolUseIO(ToolUseBase):
         return string
 
 class ToolUseAnyTool(ToolUseBase):
-    def __init__(self, llm):
+    # Categories by hash of model and pool text, shared by all instances of the process
+    _categories: Dict[str, List[dict]] = {}
+    _categories_lock = threading.Lock()
+    _key_locks: Dict[str, threading.Lock] = {}
+
+    def __init__(self, llm, cache_dir: Optional[str] = './db/tool_categories'):
+        """
+        Args:
+            llm: LLM instance used to categorize the tools and select them
+            cache_dir: Optional directory the categorizations are persisted to, None keeps them in memory only
+        """
         super().__init__(llm=llm)
-        self.dicts = {}
+        self.cache_dir = cache_dir
         self.tool_description = {}
         for name, tools in tooluse_pool.items():
             pattern = r'\[\d+\] (\w+): (.+?)(?=\[\d+\]|\Z)'
             matches = re.findall(pattern, tools, re.DOTALL)
             self.tool_description[name] = {key: value.strip() for key, value in matches}
-            category_prompt = f'''{self.tool_description[name]}
+
+    def categories(self, name: str) -> List[dict]:
+        """
+        Tool categories of a pool, generated by the LLM on first use
+
+        The result only depends on the pool text and the model, so it is memoized for the process
+        and persisted under cache_dir, keyed by a hash of both.
+        """
+        key = request_key({'model': getattr(self.llm, 'model', None), 'pool': tooluse_pool[name]})
+        with self._categories_lock:
+            if key in self._categories:
+                return self._categories[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # A batch job waiting on the lock would never be counted as waiting by BatchLLM, so its round
+        # would not be released while the lock holder waits for it. Jobs may categorize twice instead.
+        if in_batch_job():
+            return self._load_or_categorize(key, name)
+        # One thread categorizes a pool, the others wait for its result
+        with key_lock:
+            with self._categories_lock:
+                if key in self._categories:
+                    return self._categories[key]
+            return self._load_or_categorize(key, name)
+
+    def _load_or_categorize(self, key: str, name: str) -> List[dict]:
+        dicts = self._load_categories(key)
+        if dicts is None:
+            dicts = self._categorize(name)
+            if dicts:
+                self._save_categories(key, dicts)
+        if dicts:
+            with self._categories_lock:
+                dicts = self._categories.setdefault(key, dicts)
+        return dicts
+
+    def _categorize(self, name: str) -> List[dict]:
+        category_prompt = f'''{self.tool_description[name]}
     You have a series of tools, you need to divide them into several categories, such as data calculation, trip booking and so on.
     All tools should be included in categories.
     your output format must be as follows:
     category 1 : {{'category name': 'category description', 'tool list': ['tool 1 name', 'tool 2 name']}}
     category 2 : {{'category name': 'category description', 'tool list': ['tool 1 name', 'tool 2 name']}}
     '''
-            messages = [{"role": "user", "content": category_prompt}]
-            string = self.llm(messages=messages, temperature=0.1)
-            dict_strings = re.findall(r"\{[^{}]*\}", string)
-            self.dicts[name] = [ast.literal_eval(ds) for ds in dict_strings]
+        messages = [{"role": "user", "content": category_prompt}]
+        string = self.llm(messages=messages, temperature=0.1)
+        dict_strings = re.findall(r"\{[^{}]*\}", string)
+        return [ast.literal_eval(ds) for ds in dict_strings]
+
+    def _load_categories(self, key: str) -> Optional[List[dict]]:
+        if not self.cache_dir:
+            return None
+        path = os.path.join(self.cache_dir, f'{key}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def _save_categories(self, key: str, dicts: List[dict]):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, f'{key}.json')
+        # Written to a temporary file first so concurrent processes never read a partial file
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(dicts, file)
+        os.replace(tmp_path, path)
 
     def __call__(self, task_description, tool_instruction, feedback_of_previous_tools):
-        prompt = f'''{self.dicts[task_description]}
+        prompt = f'''{self.categories(task_description)}
 You need to select the appropriate tool category from the list of available tools according to the task description to complete the task: 
 {tool_instruction}
 You can only invoke one category at a time.
@@ -77,7 +147,7 @@ Category name:
         
         # Matching and retrieving tools
         matched_tools = {}
-        for d in self.dicts[task_description]:
+        for d in self.categories(task_description):
             if d.get('category name').lower().strip() == category_name.lower().strip():
                 matched_tools = {tool: self.tool_description[task_description][tool] for tool in d['tool list']}
                 break
@@ -87,71 +157,35 @@ Category name:
         return self.llm(messages=messages, temperature=0.1)
 
 class ToolUseToolBench(ToolUseBase):
-    def __init__(self, llm):
+    def __init__(self, llm, cache_dir: Optional[str] = './db/tool_index'):
+        """
+        Args:
+            llm: LLM instance used to select the tools
+            cache_dir: Optional directory the tool index is cached in, None keeps it in memory only
+        """
         super().__init__(llm=llm)
-        self.scenario_memory = {}
-        
-        for name, tools in tooluse_pool.items():
-            db_path = os.path.join('./db', f'api_pool{name}/') 
-            self.scenario_memory[name] = Chroma(
-                embedding_function=self.embedding,
-                persist_directory=db_path
-            )
-            
-            api_pattern = re.compile(r"\[(\d+)\] ([^:]+): (.+?)(?=\[\d+\]|\Z)", re.DOTALL)
-            api_matches = api_pattern.findall(tools)
-            documents = [
-                Document(
-                    page_content=api_description.split('.')[0].strip() + '.',
-                    metadata={
-                        "name": api_name.strip(),
-                        "description": f"[{api_id}] {api_name}: {api_description.strip()}"
-                    }
-                )
-                for api_id, api_name, api_description in api_matches
-            ]
-            
-            if self.scenario_memory[name]._collection.count() == 0:
-                self.scenario_memory[name].add_documents(documents)
+        # Tool descriptions are embedded once per embedding model, see ToolIndex.get
+        self.tool_index = ToolIndex.get(self.embedding, cache_dir=cache_dir)
 
     def __call__(self, task_description, tool_instruction, feedback_of_previous_tools):
-        similarity_results = self.scenario_memory[task_description].similarity_search_with_score(tool_instruction, k=4)
-        tool_pool = [result[0].metadata['description'] for result in similarity_results]
+        tool_pool = self.tool_index.search(task_description, tool_instruction, k=4)
         prompt = self.format_prompt(tool_pool, task_description, tool_instruction, feedback_of_previous_tools)
         messages = [{"role": "user", "content": prompt}]
         return self.llm(messages=messages, temperature=0.1)
 
 class ToolUseToolBenchFormer(ToolUseBase):
-    def __init__(self, llm):
+    def __init__(self, llm, cache_dir: Optional[str] = './db/tool_index'):
+        """
+        Args:
+            llm: LLM instance used to select the tools
+            cache_dir: Optional directory the tool index is cached in, None keeps it in memory only
+        """
         super().__init__(llm=llm)
-        self.scenario_memory = {}
-        
-        for name, tools in tooluse_pool.items():
-            db_path = os.path.join('./db', f'api_pool{name}/') 
-            self.scenario_memory[name] = Chroma(
-                embedding_function=self.embedding,
-                persist_directory=db_path
-            )
-            
-            api_pattern = re.compile(r"\[(\d+)\] ([^:]+): (.+?)(?=\[\d+\]|\Z)", re.DOTALL)
-            api_matches = api_pattern.findall(tools)
-            documents = [
-                Document(
-                    page_content=api_description.split('.')[0].strip() + '.',
-                    metadata={
-                        "name": api_name.strip(),
-                        "description": f"[{api_id}] {api_name}: {api_description.strip()}"
-                    }
-                )
-                for api_id, api_name, api_description in api_matches
-            ]
-            
-            if self.scenario_memory[name]._collection.count() == 0:
-                self.scenario_memory[name].add_documents(documents)
+        # Tool descriptions are embedded once per embedding model, see ToolIndex.get
+        self.tool_index = ToolIndex.get(self.embedding, cache_dir=cache_dir)
 
     def __call__(self, task_description, tool_instruction, feedback_of_previous_tools):
-        similarity_results = self.scenario_memory[task_description].similarity_search_with_score(tool_instruction, k=4)
-        tool_pool = [result[0].metadata['description'] for result in similarity_results]
+        tool_pool = self.tool_index.search(task_description, tool_instruction, k=4)
         
         prompt = self.format_prompt(tool_pool, task_description, tool_instruction, feedback_of_previous_tools)
         
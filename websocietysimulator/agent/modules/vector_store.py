@@ -0,0 +1,402 @@
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize the last axis, zero vectors stay zero."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without sorting the whole array."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class InProcessVectorStore(VectorStore):
+    """Shared LangChain plumbing of the vector stores held by the agent process itself."""
+
+    embedding: Embeddings
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def add_vectors(self, vectors: Sequence[Sequence[float]], texts: Sequence[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        """
+        Add texts whose vectors are already computed
+
+        Returns:
+            List[str]: Ids of the added documents
+        """
+        raise NotImplementedError
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """
+        Nearest documents to a vector
+
+        Returns:
+            List[Tuple[Document, float]]: Documents with their cosine distance, closest first
+        """
+        raise NotImplementedError
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(self.embedding.embed_documents(texts), texts, metadatas, ids)
+
+    async def aadd_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(await self.embedding.aembed_documents(texts), texts, metadatas, ids)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k=k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k=k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k=k)]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any):
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+class NumpyVectorStore(InProcessVectorStore):
+    def __init__(self, embedding: Embeddings, initial_capacity: int = 64):
+        """
+        In-process vector store: one contiguous float32 matrix searched with a single matrix product
+
+        Vectors are L2-normalized on insert, so the dot product with the normalized query is the
+        cosine similarity. Nothing is written to disk, the store lives as long as the agent.
+
+        Args:
+            embedding: Embeddings used for the texts and queries
+            initial_capacity: Rows allocated up front, the matrix doubles when full
+        """
+        self.embedding = embedding
+        self._initial_capacity = initial_capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self._documents: List[Document] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _append(self, vectors: np.ndarray):
+        if self._matrix is None:
+            self._matrix = np.empty((max(self._initial_capacity, len(vectors)), vectors.shape[1]), dtype=np.float32)
+        elif self._size + len(vectors) > len(self._matrix):
+            grown = np.empty((max(2 * len(self._matrix), self._size + len(vectors)), self._matrix.shape[1]), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        self._matrix[self._size:self._size + len(vectors)] = vectors
+        self._size += len(vectors)
+
+    def add_vectors(self, vectors: Sequence[Sequence[float]], texts: Sequence[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        if len(texts) == 0:
+            return []
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [Document(page_content=text, metadata=metadata, id=id_) for text, metadata, id_ in zip(texts, metadatas, ids)]
+        with self._lock:
+            # Re-added ids replace their previous entry
+            self._delete([id_ for id_ in ids if id_ in self._rows])
+            for offset, id_ in enumerate(ids):
+                self._rows[id_] = self._size + offset
+            self._append(vectors)
+            self._documents.extend(documents)
+        return ids
+
+    def _delete(self, ids: List[str]) -> bool:
+        rows = sorted({self._rows.pop(id_) for id_ in ids if id_ in self._rows}, reverse=True)
+        # Move the last row into each hole, highest holes first so a moved row is never deleted later
+        for row in rows:
+            last = self._size - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._documents[row] = self._documents[last]
+                self._rows[self._documents[row].id] = row
+            self._documents.pop()
+            self._size -= 1
+        return bool(rows)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            return self._delete(list(ids))
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            return [self._documents[self._rows[id_]] for id_ in ids if id_ in self._rows]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        query = normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            if self._size == 0:
+                return []
+            similarities = self._matrix[:self._size] @ query
+            indices = top_k(similarities, k)
+            return [(self._documents[i], float(1.0 - similarities[i])) for i in indices]
+
+
+class HNSWVectorStore(InProcessVectorStore):
+    def __init__(
+        self,
+        embedding: Embeddings,
+        persist_directory: Optional[str] = None,
+        M: int = 16,
+        ef_construction: int = 200,
+        ef: int = 64,
+        initial_capacity: int = 1024,
+        save_every: int = 1000,
+        num_threads: int = 1
+    ):
+        """
+        Approximate nearest neighbor store on an HNSW graph, for memories too large for exact search
+
+        Inserts are incremental, deleted entries are marked and their slots reused by later inserts.
+        With a persist_directory the index and documents are loaded from it if present and saved
+        back every save_every inserts and deletes, and on persist(). Documents are saved to an
+        append-only JSONL log of inserts and deletes, so a save only writes what changed since the
+        previous one.
+
+        Args:
+            embedding: Embeddings used for the texts and queries
+            persist_directory: Optional directory the index is loaded from and saved to
+            M: Graph degree, higher gives better recall for more memory
+            ef_construction: Candidate list size while inserting, higher gives a better graph but slower inserts
+            ef: Candidate list size while searching, the recall/latency trade-off, can be changed later
+            initial_capacity: Elements allocated up front, the index doubles when full
+            save_every: Inserts and deletes between automatic saves when persisting, 0 saves only on persist()
+            num_threads: Threads hnswlib uses for batch inserts and queries
+        """
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("HNSWVectorStore requires hnswlib: pip install chroma-hnswlib") from e
+        self._hnswlib = hnswlib
+        self.embedding = embedding
+        self.persist_directory = persist_directory
+        self.M = M
+        self.ef_construction = ef_construction
+        self._ef = ef
+        self._initial_capacity = initial_capacity
+        self.save_every = save_every
+        self.num_threads = num_threads
+        self._index = None
+        self._documents: Dict[int, Document] = {}
+        self._labels: Dict[str, int] = {}
+        self._next_label = 0
+        self._unsaved = 0
+        # Saves write a new generation of files, meta.json names the current one
+        self._generation = 0
+        self._files: Optional[Dict[str, str]] = None
+        # Document log records not saved yet, and the saved size and record count of the log
+        self._log: List[dict] = []
+        self._log_size: Optional[int] = None
+        self._log_records = 0
+        self._lock = threading.RLock()
+        if persist_directory and os.path.exists(os.path.join(persist_directory, 'meta.json')):
+            self._load()
+
+    @property
+    def ef(self) -> int:
+        return self._ef
+
+    @ef.setter
+    def ef(self, value: int):
+        with self._lock:
+            self._ef = value
+            if self._index is not None:
+                self._index.set_ef(value)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _create_index(self, dim: int, capacity: int):
+        self._index = self._hnswlib.Index(space='cosine', dim=dim)
+        self._index.init_index(max_elements=capacity, ef_construction=self.ef_construction, M=self.M, allow_replace_deleted=True)
+        self._index.set_ef(self._ef)
+        self._index.set_num_threads(self.num_threads)
+
+    def add_vectors(self, vectors: Sequence[Sequence[float]], texts: Sequence[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        if len(texts) == 0:
+            return []
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            # Re-added ids replace their previous entry
+            self.delete([id_ for id_ in ids if id_ in self._labels], save=False)
+            if self._index is None:
+                self._create_index(vectors.shape[1], max(self._initial_capacity, len(vectors)))
+            needed = self._index.get_current_count() + len(vectors)
+            if needed > self._index.get_max_elements():
+                self._index.resize_index(max(2 * self._index.get_max_elements(), needed))
+            labels = np.arange(self._next_label, self._next_label + len(vectors))
+            self._next_label += len(vectors)
+            self._index.add_items(vectors, labels, replace_deleted=True)
+            for label, text, metadata, id_ in zip(labels.tolist(), texts, metadatas, ids):
+                self._documents[label] = Document(page_content=text, metadata=metadata, id=id_)
+                self._labels[id_] = label
+                if self.persist_directory:
+                    self._log.append({'label': label, 'id': id_, 'page_content': text, 'metadata': metadata})
+            self._unsaved += len(vectors)
+            if self.persist_directory and self.save_every and self._unsaved >= self.save_every:
+                self.persist()
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, save: bool = True, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            labels = [self._labels.pop(id_) for id_ in ids if id_ in self._labels]
+            for label in labels:
+                self._index.mark_deleted(label)
+                del self._documents[label]
+                if self.persist_directory:
+                    self._log.append({'deleted': label})
+            # Deletes count towards save_every like inserts, so evicting on every insert stays cheap
+            self._unsaved += len(labels)
+            if save and self.persist_directory and self.save_every and self._unsaved >= self.save_every:
+                self.persist()
+        return bool(labels)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            return [self._documents[self._labels[id_]] for id_ in ids if id_ in self._labels]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        with self._lock:
+            k = min(k, len(self._documents))
+            if k == 0:
+                return []
+            # The candidate list must hold at least k entries
+            self._index.set_ef(max(self._ef, k))
+            labels, distances = self._index.knn_query(np.asarray(embedding, dtype=np.float32), k=k)
+            return [(self._documents[label], float(distance)) for label, distance in zip(labels[0].tolist(), distances[0].tolist())]
+
+    def _write_documents(self, generation: int) -> Tuple[str, int, int]:
+        """Save the document log, returning its file name, size in bytes and number of records."""
+        name = (self._files or {}).get('documents', '')
+        records = self._log_records + len(self._log)
+        # Rewrite the live documents once deletes and replacements make up most of the log
+        if self._log_size is None or not name.endswith('.jsonl') or records > 2 * len(self._documents) + 1000:
+            name = f'documents-{generation}.jsonl'
+            entries = [
+                {'label': label, 'id': document.id, 'page_content': document.page_content, 'metadata': document.metadata}
+                for label, document in self._documents.items()
+            ]
+            mode, offset, records = 'wb', 0, len(entries)
+        else:
+            entries = self._log
+            # Bytes past the saved size are left by an interrupted save and overwritten
+            mode, offset = 'r+b', self._log_size
+        with open(os.path.join(self.persist_directory, name), mode) as file:
+            file.seek(offset)
+            file.truncate()
+            file.write(''.join(json.dumps(entry) + '\n' for entry in entries).encode('utf-8'))
+            size = file.tell()
+        return name, size, records
+
+    def persist(self):
+        """
+        Save the index and documents to the persist directory
+
+        Every save writes a new index file and appends the inserts and deletes since the previous
+        save to the document log, then atomically replaces meta.json, which names the files to load
+        and the saved size of the log. A save interrupted at any point leaves the previous set intact.
+        The log is rewritten with the live documents only once it is mostly deletes.
+        """
+        if not self.persist_directory:
+            raise ValueError("HNSWVectorStore was created without a persist_directory")
+        with self._lock:
+            if self._index is None:
+                return
+            os.makedirs(self.persist_directory, exist_ok=True)
+            generation = self._generation + 1
+            # hnswlib can only save the whole index
+            files = {'index': f'index-{generation}.bin'}
+            self._index.save_index(os.path.join(self.persist_directory, files['index']))
+            files['documents'], log_size, log_records = self._write_documents(generation)
+            meta_path = os.path.join(self.persist_directory, 'meta.json')
+            with open(f'{meta_path}.tmp', 'w', encoding='utf-8') as file:
+                json.dump({
+                    'dim': self._index.dim, 'next_label': self._next_label, 'generation': generation,
+                    'files': files, 'documents_size': log_size
+                }, file)
+            os.replace(f'{meta_path}.tmp', meta_path)
+            # Files of the previous generation that are no longer referenced
+            for name in set((self._files or {}).values()) - set(files.values()):
+                try:
+                    os.remove(os.path.join(self.persist_directory, name))
+                except FileNotFoundError:
+                    pass
+            self._generation = generation
+            self._files = files
+            self._log = []
+            self._log_size = log_size
+            self._log_records = log_records
+            self._unsaved = 0
+
+    def _load(self):
+        with open(os.path.join(self.persist_directory, 'meta.json'), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        files = meta.get('files', {'index': 'index.bin', 'documents': 'documents.json'})
+        self._index = self._hnswlib.Index(space='cosine', dim=meta['dim'])
+        self._index.load_index(os.path.join(self.persist_directory, files['index']), allow_replace_deleted=True)
+        self._index.set_ef(self._ef)
+        self._index.set_num_threads(self.num_threads)
+        documents_path = os.path.join(self.persist_directory, files['documents'])
+        if files['documents'].endswith('.jsonl'):
+            # Only the saved size, records appended by an interrupted save are ignored
+            with open(documents_path, 'rb') as file:
+                entries = [json.loads(line) for line in file.read(meta['documents_size']).decode('utf-8').splitlines()]
+            self._log_size = meta['documents_size']
+            self._log_records = len(entries)
+        else:
+            # Documents saved as one JSON list, rewritten as a log by the next save
+            with open(documents_path, 'r', encoding='utf-8') as file:
+                entries = json.load(file)
+        for entry in entries:
+            if 'deleted' in entry:
+                document = self._documents.pop(entry['deleted'])
+                if self._labels.get(document.id) == entry['deleted']:
+                    del self._labels[document.id]
+            else:
+                self._documents[entry['label']] = Document(page_content=entry['page_content'], metadata=entry['metadata'], id=entry['id'])
+                self._labels[entry['id']] = entry['label']
+        self._next_label = meta['next_label']
+        self._generation = meta.get('generation', 0)
+        self._files = files
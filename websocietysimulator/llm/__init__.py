@@ -1,3 +1,30 @@
-from .llm import LLMBase, InfinigenceLLM, OpenAILLM
+from .llm import LLMBase, LLMWrapper, InfinigenceLLM, OpenAILLM
+from .cache import CachedLLM, LLMResponseCache, CacheStats
+from .coalescing import CoalescingLLM, CoalescingEmbeddings, CoalescingStats, SingleFlight
+from .rate_limiter import RateLimiter, RateLimitedLLM
+from .retry_policy import RetryPolicy, CircuitBreaker, CircuitOpenError, task_deadline
+from .batch import BatchLLM, OpenAIBatchClient, BatchRequestError, in_batch_job
+from .usage import TokenUsage, UsageScope, TokenBudgetExceeded, track_usage
+from .tokenizer import count_tokens, truncate_tokens
+from .stop_conditions import balanced_list_literal, fields_complete
+from .hedging import HedgedLLM, HedgingStats
+from .local_llm import LocalLLM
+from .local_embeddings import LocalEmbeddings
+from .routing import CascadeLLM, TierStats, call_tag
+from .embedding_cache import CachedEmbeddings, EmbeddingStore
+from .recording import RecordingLLM, ReplayLLM, RecordingEmbeddings, ReplayEmbeddings, ReplayMissError
 
-__all__ = ['LLMBase', 'InfinigenceLLM', 'OpenAILLM']
\ No newline at end of file
+__all__ = ['LLMBase', 'LLMWrapper', 'InfinigenceLLM', 'OpenAILLM',
+           'CachedLLM', 'LLMResponseCache', 'CacheStats',
+           'CoalescingLLM', 'CoalescingEmbeddings', 'CoalescingStats', 'SingleFlight',
+           'RateLimiter', 'RateLimitedLLM',
+           'RetryPolicy', 'CircuitBreaker', 'CircuitOpenError', 'task_deadline',
+           'BatchLLM', 'OpenAIBatchClient', 'BatchRequestError', 'in_batch_job',
+           'TokenUsage', 'UsageScope', 'TokenBudgetExceeded', 'track_usage',
+           'count_tokens', 'truncate_tokens',
+           'balanced_list_literal', 'fields_complete',
+           'HedgedLLM', 'HedgingStats',
+           'LocalLLM', 'LocalEmbeddings',
+           'CascadeLLM', 'TierStats', 'call_tag',
+           'CachedEmbeddings', 'EmbeddingStore',
+           'RecordingLLM', 'ReplayLLM', 'RecordingEmbeddings', 'ReplayEmbeddings', 'ReplayMissError']
@@ -0,0 +1,249 @@
+import contextvars
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+from openai import OpenAI
+from .llm import LLMBase, LLMWrapper
+from .http import get_http_client
+from .usage import check_token_budget
+from .utils import request_key
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+FINAL_BATCH_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+# Index of the BatchLLM.run job the current context belongs to
+_current_job: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar('batch_job', default=None)
+
+
+def in_batch_job() -> bool:
+    """
+    Whether the caller runs inside a BatchLLM.run job
+
+    Concurrent LLM calls gain nothing there: every call waits for the next batch round anyway,
+    so callers fanning out to threads can make their calls sequentially instead.
+    """
+    return _current_job.get() is not None
+
+
+class BatchRequestError(RuntimeError):
+    """A request of a batch (or the whole batch) did not produce a response."""
+
+
+class OpenAIBatchClient:
+    def __init__(self, api_key: str, base_url: Optional[str] = None, completion_window: str = '24h', poll_interval: float = 30.0, max_wait: Optional[float] = None):
+        """
+        Submit chat completion requests through an OpenAI-compatible batch endpoint
+
+        Args:
+            api_key: API key
+            base_url: Optional API endpoint, defaults to the OpenAI API
+            completion_window: Completion window requested for every batch
+            poll_interval: Seconds between two status polls
+            max_wait: Optional seconds after which an unfinished batch is cancelled
+        """
+        self.client = OpenAI(api_key=api_key, base_url=base_url, http_client=get_http_client())
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+
+    def run(self, requests: Dict[str, Dict[str, Any]]) -> Dict[str, Union[Dict[str, Any], BatchRequestError]]:
+        """
+        Submit requests as one batch file and block until the batch is finished
+
+        Args:
+            requests: Request bodies by custom_id
+
+        Returns:
+            Dict[str, Union[Dict[str, Any], BatchRequestError]]: Response body, or the error, by custom_id
+        """
+        lines = [
+            json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': BATCH_ENDPOINT, 'body': body}, ensure_ascii=False)
+            for custom_id, body in requests.items()
+        ]
+        input_file = self.client.files.create(file=('batch.jsonl', '\n'.join(lines).encode('utf-8')), purpose='batch')
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(lines)} requests")
+        batch = self.wait(batch.id)
+
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get('response') or {}
+                if response.get('status_code') == 200:
+                    results[record['custom_id']] = response['body']
+                else:
+                    error = record.get('error') or response.get('body')
+                    results[record['custom_id']] = BatchRequestError(f"Batch request {record['custom_id']} failed: {error}")
+        for custom_id in requests:
+            if custom_id not in results:
+                results[custom_id] = BatchRequestError(f"Batch {batch.id} ({batch.status}) returned no result for {custom_id}")
+        return results
+
+    def wait(self, batch_id: str):
+        """Poll a batch until it reaches a final status."""
+        start_time = time.time()
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in FINAL_BATCH_STATUSES:
+                break
+            if self.max_wait is not None and time.time() - start_time > self.max_wait:
+                self.client.batches.cancel(batch_id)
+                raise BatchRequestError(f"Batch {batch_id} did not finish within {self.max_wait}s and was cancelled")
+            time.sleep(self.poll_interval)
+        if batch.status == 'failed':
+            raise BatchRequestError(f"Batch {batch_id} failed: {batch.errors}")
+        if batch.status != 'completed':
+            logger.warning(f"Batch {batch_id} finished with status {batch.status}, missing requests will fail")
+        logger.info(f"Batch {batch_id} finished in {time.time() - start_time:.1f}s")
+        return batch
+
+
+def _content_from_body(body: Dict[str, Any], n: int) -> Union[str, List[str]]:
+    contents = [choice['message']['content'] for choice in sorted(body['choices'], key=lambda c: c.get('index', 0))]
+    return contents[0] if n == 1 else contents
+
+
+class BatchLLM(LLMWrapper):
+    def __init__(self, llm: LLMBase, batch_client: OpenAIBatchClient, max_batch_size: int = 50000):
+        """
+        Defer LLM calls and answer them through batch submissions
+
+        Jobs started with run() execute in their own threads. Every call blocks on a deferred
+        future; once every running job is blocked, all pending requests are submitted as one
+        batch (one per model), and the jobs resume with the results. A job whose workflow is a
+        fixed chain of k calls therefore completes after k batches. Calls from threads a job
+        starts itself count against the job when they run in a copy of its context. A round is
+        released as soon as every running job has a queued call, so calls of a job that are still
+        being prepared in other threads go to the next round (see in_batch_job).
+        Embedding calls are served by the wrapped LLM without batching.
+
+        Args:
+            llm: LLM providing the default model and the embedding model
+            batch_client: Client submitting the batches
+            max_batch_size: Maximum number of requests in one batch file
+        """
+        super().__init__(llm)
+        self.batch_client = batch_client
+        self.max_batch_size = max_batch_size
+        self.batches_submitted = 0
+        self.requests_submitted = 0
+        self._cond = threading.Condition()
+        self._queue: Dict[str, Tuple[Dict[str, Any], List[Future]]] = {}
+        self._running = 0
+        # Jobs with a call in the queue, calls from untracked threads count as their own job
+        self._waiting: Set[Any] = set()
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        check_token_budget(messages, max_tokens, n)
+        body = {
+            'model': model or self.model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'n': n,
+        }
+        if stop_strs:
+            body['stop'] = stop_strs
+        future = Future()
+        with self._cond:
+            if self._running == 0:
+                raise RuntimeError("BatchLLM can only be called from jobs started with BatchLLM.run()")
+            key = request_key(body)
+            # Identical requests of the same round share one batch line
+            if key in self._queue:
+                self._queue[key][1].append(future)
+            else:
+                self._queue[key] = (body, [future])
+            job = _current_job.get()
+            self._waiting.add(job if job is not None else future)
+            self._cond.notify_all()
+        response = future.result()
+        self._record_usage(SimpleNamespace(**response['usage']) if response.get('usage') else None)
+        return _content_from_body(response, n)
+
+    def run(self, jobs: List[Callable[[], Any]], max_workers: Optional[int] = None) -> List[Tuple[Any, Optional[BaseException]]]:
+        """
+        Run jobs until all of them are finished, batching the LLM calls they make
+
+        Args:
+            jobs: Callables making their LLM calls through this instance
+            max_workers: Maximum number of jobs in flight, defaults to all of them
+
+        Returns:
+            List[Tuple[Any, Optional[BaseException]]]: (result, exception) of every job, in order
+        """
+        results: List[Tuple[Any, Optional[BaseException]]] = [(None, None)] * len(jobs)
+        max_workers = max(1, max_workers or len(jobs))
+
+        def worker(index: int, job: Callable[[], Any]):
+            _current_job.set(index)
+            try:
+                results[index] = (job(), None)
+            except BaseException as e:
+                results[index] = (None, e)
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._cond.notify_all()
+
+        next_job = 0
+        while True:
+            with self._cond:
+                # The round is complete when every running job waits on a queued request
+                self._cond.wait_for(lambda: len(self._waiting) >= self._running)
+                if next_job < len(jobs) and self._running < max_workers:
+                    while next_job < len(jobs) and self._running < max_workers:
+                        self._running += 1
+                        threading.Thread(target=worker, args=(next_job, jobs[next_job]), daemon=True).start()
+                        next_job += 1
+                    continue
+                if not self._queue:
+                    break
+                queue, self._queue = self._queue, {}
+                self._waiting = set()
+            self._submit(queue)
+        return results
+
+    def _submit(self, queue: Dict[str, Tuple[Dict[str, Any], List[Future]]]):
+        chunks: List[List[Tuple[Dict[str, Any], List[Future]]]] = []
+        by_model: Dict[str, List[Tuple[Dict[str, Any], List[Future]]]] = {}
+        for body, futures in queue.values():
+            by_model.setdefault(body['model'], []).append((body, futures))
+        for entries in by_model.values():
+            for start in range(0, len(entries), self.max_batch_size):
+                chunks.append(entries[start:start + self.max_batch_size])
+
+        def run_chunk(chunk: List[Tuple[Dict[str, Any], List[Future]]]):
+            requests = {f'request-{i}': body for i, (body, _) in enumerate(chunk)}
+            try:
+                responses = self.batch_client.run(requests)
+            except Exception as e:
+                responses = {custom_id: e for custom_id in requests}
+            for i, (_, futures) in enumerate(chunk):
+                response = responses[f'request-{i}']
+                for future in futures:
+                    if isinstance(response, BaseException):
+                        future.set_exception(response)
+                    else:
+                        future.set_result(response)
+
+        with self._cond:
+            self.batches_submitted += len(chunks)
+            self.requests_submitted += len(queue)
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            list(executor.map(run_chunk, chunks))
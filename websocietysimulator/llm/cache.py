@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+from .llm import LLMBase, LLMWrapper
+from .utils import llm_request_payload, request_key
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate
+        }
+
+
+class LLMResponseCache:
+    def __init__(self, path: str = './db/llm_cache.sqlite', ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        """
+        SQLite-backed response store, safe to share between threads and processes
+
+        Args:
+            path: SQLite database file
+            ttl: Seconds after which an entry expires, None to keep entries forever
+            max_entries: Maximum number of entries, least recently used ones are evicted beyond it
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts_since_check = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads, keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached response for a key, or None on a miss or an expired entry."""
+        conn = self._connection()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if self.ttl is not None and now - row[1] > self.ttl:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Any) -> int:
+        """
+        Store a response
+
+        Returns:
+            int: Number of entries evicted to respect max_entries
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(response, ensure_ascii=False), now, now)
+        )
+        with self._lock:
+            self._puts_since_check += 1
+            # Counting rows costs a scan, so only check the size every few inserts
+            check = self.max_entries is not None and self._puts_since_check >= max(1, self.max_entries // 100)
+            if check:
+                self._puts_since_check = 0
+        return self._evict(conn) if check else 0
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        evicted = 0
+        if self.ttl is not None:
+            evicted += conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+        count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            # Evict down to 90% of the capacity so eviction is amortized over many inserts
+            excess = count - int(self.max_entries * 0.9)
+            evicted += conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            ).rowcount
+        if evicted:
+            logger.debug(f"LLM cache evicted {evicted} entries")
+        return evicted
+
+    def clear(self):
+        self._connection().execute("DELETE FROM responses")
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class CachedLLM(LLMWrapper):
+    def __init__(self, llm: LLMBase, cache: Union[str, LLMResponseCache] = './db/llm_cache.sqlite', ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        """
+        Opt-in persistent response cache for any LLM
+
+        Responses are keyed by a hash of model, messages, temperature, max_tokens, stop and n,
+        so reruns of a suite and repeated sub-calls are served without calling the API.
+
+        Args:
+            llm: LLM instance to cache
+            cache: SQLite database file or an existing LLMResponseCache to share between LLMs
+            ttl: Seconds after which an entry expires, ignored when an LLMResponseCache is given
+            max_entries: Maximum number of cached entries, ignored when an LLMResponseCache is given
+        """
+        super().__init__(llm)
+        self.cache = cache if isinstance(cache, LLMResponseCache) else LLMResponseCache(cache, ttl=ttl, max_entries=max_entries)
+        self.stats = CacheStats()
+        self._stats_lock = threading.Lock()
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        key = request_key(llm_request_payload(messages, model or self.model, temperature, max_tokens, stop_strs, n))
+        response = self.cache.get(key)
+        if response is not None:
+            with self._stats_lock:
+                self.stats.hits += 1
+            return response
+
+        response = self.llm(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop_strs=stop_strs,
+            n=n
+        )
+        evicted = self.cache.put(key, response)
+        with self._stats_lock:
+            self.stats.misses += 1
+            self.stats.stores += 1
+            self.stats.evictions += evicted
+        return response
+
+    def reset_stats(self):
+        """Start a new statistics window, e.g. at the beginning of a run."""
+        with self._stats_lock:
+            self.stats = CacheStats()
@@ -0,0 +1,139 @@
+import copy
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from langchain_core.embeddings import Embeddings
+from .llm import LLMBase, LLMWrapper
+from .utils import llm_request_payload, embedding_request_payload, embedding_model_name, request_key
+
+
+@dataclass
+class CoalescingStats:
+    calls: int = 0
+    coalesced: int = 0
+
+    @property
+    def coalesced_rate(self) -> float:
+        return self.coalesced / self.calls if self.calls > 0 else 0.0
+
+
+class SingleFlight:
+    """Makes concurrent calls with the same key share a single execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        # Number of callers waiting on each in-flight call
+        self._followers: Dict[str, int] = {}
+        self.stats = CoalescingStats()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn, or wait for the identical call already in flight
+
+        Every caller of a shared call gets its own deep copy of the result, so a caller mutating
+        it (or a nested message or usage object) cannot affect the others. A call nobody joined
+        returns its result as is.
+
+        Returns:
+            Tuple[Any, bool]: The result and whether it was shared from another caller
+        """
+        with self._lock:
+            self.stats.calls += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self._followers[key] = 0
+            else:
+                self._followers[key] += 1
+                self.stats.coalesced += 1
+
+        if not leader:
+            # The leader never hands out the shared object once a follower joined
+            return copy.deepcopy(future.result()), True
+
+        try:
+            result = fn()
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                followers = self._followers.pop(key)
+        return (copy.deepcopy(result) if followers else result), False
+
+
+class CoalescingEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings):
+        """
+        Share one outstanding request between concurrent identical embedding calls
+
+        Args:
+            embeddings: Embedding model that serves the requests
+        """
+        self.embeddings = embeddings
+        self.model = embedding_model_name(embeddings)
+        self.single_flight = SingleFlight()
+
+    @property
+    def stats(self) -> CoalescingStats:
+        return self.single_flight.stats
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        key = request_key(embedding_request_payload(self.model, texts))
+        result, _ = self.single_flight.do(key, lambda: self.embeddings.embed_documents(texts))
+        return result
+
+    def embed_query(self, text: str) -> List[float]:
+        key = request_key({'query': embedding_request_payload(self.model, [text])})
+        result, _ = self.single_flight.do(key, lambda: self.embeddings.embed_query(text))
+        return result
+
+
+class CoalescingLLM(LLMWrapper):
+    def __init__(self, llm: LLMBase, deterministic_only: bool = False):
+        """
+        Share one outstanding request between concurrent byte-identical LLM calls
+
+        When several worker threads issue the same prompt at the same moment, only the first
+        call reaches the API and every concurrent caller receives its result. Sampled calls are
+        coalesced too, so concurrent identical sampled calls receive the same completion,
+        set deterministic_only to restrict coalescing to temperature 0.
+
+        Args:
+            llm: LLM instance that serves the requests
+            deterministic_only: Only coalesce calls made with temperature 0
+        """
+        super().__init__(llm)
+        self.deterministic_only = deterministic_only
+        self.single_flight = SingleFlight()
+        self.embedding_model = CoalescingEmbeddings(llm.get_embedding_model())
+
+    @property
+    def stats(self) -> CoalescingStats:
+        return self.single_flight.stats
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        def call():
+            return self.llm(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop_strs=stop_strs,
+                n=n
+            )
+
+        if self.deterministic_only and temperature > 0:
+            return call()
+        key = request_key(llm_request_payload(messages, model or self.model, temperature, max_tokens, stop_strs, n))
+        result, _ = self.single_flight.do(key, call)
+        return result
+
+    def get_embedding_model(self):
+        return self.embedding_model
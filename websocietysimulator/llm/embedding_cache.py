@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from .cache import CacheStats
+from .utils import embedding_model_name, request_key
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+
+class EmbeddingStore:
+    def __init__(self, path: str = './db/embedding_cache'):
+        """
+        Content-addressed vector store: float32 matrices on disk plus an SQLite hash index
+
+        Vectors of each dimension are appended to their own raw float32 file (vectors_<dim>.f32)
+        and read back through a memory map. Appends hold the SQLite write lock, so threads and
+        processes sharing the directory never write the same rows.
+
+        Args:
+            path: Directory holding index.sqlite and the vector files
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.index_path = os.path.join(path, 'index.sqlite')
+        self._local = threading.local()
+        self._maps: Dict[int, np.memmap] = {}
+        self._maps_lock = threading.Lock()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, dim INTEGER NOT NULL, row INTEGER NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _matrix_path(self, dim: int) -> str:
+        return os.path.join(self.path, f'vectors_{dim}.f32')
+
+    def _matrix(self, dim: int, min_rows: int) -> np.memmap:
+        """Memory map of the vectors of a dimension, remapped when the file has grown past it."""
+        with self._maps_lock:
+            matrix = self._maps.get(dim)
+            if matrix is None or matrix.shape[0] < min_rows:
+                rows = os.path.getsize(self._matrix_path(dim)) // (dim * 4)
+                matrix = np.memmap(self._matrix_path(dim), dtype=np.float32, mode='r', shape=(rows, dim))
+                self._maps[dim] = matrix
+            return matrix
+
+    def _locate(self, conn: sqlite3.Connection, keys: Sequence[str]) -> List[Tuple[str, int, int]]:
+        locations = []
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay below SQLite's limit on bound parameters
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            locations += conn.execute(
+                f"SELECT key, dim, row FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+        return locations
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Vectors of the keys present in the store."""
+        return {
+            key: np.array(self._matrix(dim, row + 1)[row])
+            for key, dim, row in self._locate(self._connection(), keys)
+        }
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> int:
+        """
+        Append vectors for keys not stored yet
+
+        Returns:
+            int: Number of vectors written
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(keys) == 0:
+            return 0
+        dim = vectors.shape[1]
+        row_bytes = dim * 4
+        conn = self._connection()
+        # The write lock of the index serializes appends across threads and processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = {key for key, _, _ in self._locate(conn, keys)}
+            new = [i for i, key in enumerate(keys) if key not in existing]
+            # Drop duplicate keys within the call
+            new = list({keys[i]: i for i in new}.values())
+            if new:
+                matrix_path = self._matrix_path(dim)
+                exists = os.path.exists(matrix_path)
+                # A partial row left by an interrupted append is overwritten
+                start_row = os.path.getsize(matrix_path) // row_bytes if exists else 0
+                with open(matrix_path, 'r+b' if exists else 'wb') as f:
+                    f.seek(start_row * row_bytes)
+                    f.write(vectors[new].tobytes())
+                conn.executemany(
+                    "INSERT INTO vectors (key, dim, row) VALUES (?, ?, ?)",
+                    [(keys[i], dim, start_row + offset) for offset, i in enumerate(new)]
+                )
+            conn.execute("COMMIT")
+            return len(new)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, store: Optional[EmbeddingStore] = None, path: str = './db/embedding_cache', model: Optional[str] = None):
+        """
+        Persistent cache in front of any LangChain embeddings
+
+        Vectors are keyed by a hash of the model name and the text, so the same review or tool
+        description is embedded once across tasks, runs and processes.
+
+        Args:
+            embeddings: Embeddings to cache, e.g. InfinigenceEmbeddings or OpenAIEmbeddings
+            store: Optional EmbeddingStore to share between several cached embeddings
+            path: Directory of the store, ignored when a store is given
+            model: Model name used in the keys, detected from the embeddings by default
+        """
+        self.embeddings = embeddings
+        self.store = store or EmbeddingStore(path)
+        self.model = model or embedding_model_name(embeddings)
+        self.stats = CacheStats()
+        self._stats_lock = threading.Lock()
+
+    def _key(self, kind: str, text: str) -> str:
+        # Documents and queries are keyed apart since some models embed them differently
+        return request_key({'model': self.model, 'kind': kind, 'text': text})
+
+    def _lookup(self, kind: str, texts: List[str]):
+        keys = [self._key(kind, text) for text in texts]
+        found = self.store.get_many(keys)
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in found))
+        with self._stats_lock:
+            self.stats.hits += sum(1 for key in keys if key in found)
+            self.stats.misses += len(texts) - sum(1 for key in keys if key in found)
+        return keys, found, missing
+
+    def _store(self, kind: str, texts: List[str], vectors: List[List[float]], found: Dict[str, np.ndarray]):
+        keys = [self._key(kind, text) for text in texts]
+        stored = self.store.put_many(keys, np.asarray(vectors, dtype=np.float32))
+        with self._stats_lock:
+            self.stats.stores += stored
+        for key, vector in zip(keys, vectors):
+            found[key] = np.asarray(vector, dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents, only embedding the texts that are not cached"""
+        if not texts:
+            return []
+        keys, found, missing = self._lookup('document', texts)
+        if missing:
+            self._store('document', missing, self.embeddings.embed_documents(missing), found)
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        keys, found, missing = self._lookup('document', texts)
+        if missing:
+            self._store('document', missing, await self.embeddings.aembed_documents(missing), found)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query text, cached like documents"""
+        keys, found, missing = self._lookup('query', [text])
+        if missing:
+            self._store('query', missing, [self.embeddings.embed_query(text)], found)
+        return found[keys[0]].tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._lookup('query', [text])
+        if missing:
+            self._store('query', missing, [await self.embeddings.aembed_query(text)], found)
+        return found[keys[0]].tolist()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats = CacheStats()
@@ -0,0 +1,139 @@
+import contextvars
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+from .llm import LLMBase, LLMWrapper
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+
+@dataclass
+class HedgingStats:
+    calls: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    capped: int = 0
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedged / self.calls if self.calls else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'capped': self.capped,
+            'hedge_rate': self.hedge_rate
+        }
+
+
+class HedgedLLM(LLMWrapper):
+    def __init__(self, llm: LLMBase, backups: Optional[List[LLMBase]] = None, percentile: float = 95.0, window: int = 200, min_samples: int = 20, initial_delay: Optional[float] = None, max_hedge_rate: float = 0.1, max_workers: int = 64):
+        """
+        Send a duplicate of a slow call and return whichever answer arrives first
+
+        A call that has not returned after the given percentile of the recently observed latencies
+        is hedged, to the next backup backend if any, otherwise to the same LLM. The losing call is
+        not cancelled and still consumes tokens, so at most max_hedge_rate of all calls are hedged.
+
+        Args:
+            llm: Primary LLM
+            backups: Optional LLMs the hedges are sent to in turn, e.g. the other entries of the simulator's LLM list
+            percentile: Latency percentile after which a call is hedged
+            window: Number of recent latencies the percentile is computed over
+            min_samples: Latencies to observe before hedging, unless initial_delay is given
+            initial_delay: Optional hedge delay in seconds used until min_samples latencies are observed
+            max_hedge_rate: Maximum fraction of calls that are hedged
+            max_workers: Threads running the primary and hedged calls
+        """
+        super().__init__(llm)
+        self.backups = backups or []
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.max_hedge_rate = max_hedge_rate
+        self.stats = HedgingStats()
+        self._latencies = deque(maxlen=window)
+        self._backup_cycle = itertools.cycle(self.backups) if self.backups else None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedged-llm')
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which the current call is hedged, None while too few latencies are known."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return latencies[index]
+
+    def _timed_call(self, backend: LLMBase, kwargs: Dict[str, Any]):
+        start = time.perf_counter()
+        backend.reset_last_usage()
+        result = backend(**kwargs)
+        latency = time.perf_counter() - start
+        with self._lock:
+            self._latencies.append(latency)
+        return result, backend.get_last_usage()
+
+    def _submit(self, backend: LLMBase, kwargs: Dict[str, Any]) -> Future:
+        # Each call runs in a copy of the caller's context, so task deadlines and usage scopes apply to it
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._timed_call, backend, kwargs)
+
+    def _allow_hedge(self) -> bool:
+        with self._lock:
+            if self.stats.hedged + 1 > self.max_hedge_rate * self.stats.calls:
+                self.stats.capped += 1
+                return False
+            self.stats.hedged += 1
+            return True
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        kwargs = {
+            'messages': messages,
+            'model': model,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stop_strs': stop_strs,
+            'n': n
+        }
+        with self._lock:
+            self.stats.calls += 1
+        delay = self.hedge_delay()
+        primary = self._submit(self.llm, kwargs)
+        pending = {primary}
+        if delay is not None:
+            done, _ = wait(pending, timeout=delay)
+            if not done and self._allow_hedge():
+                with self._lock:
+                    backend = next(self._backup_cycle) if self._backup_cycle else self.llm
+                logger.debug(f"Hedging LLM call after {delay:.2f}s")
+                pending.add(self._submit(backend, kwargs))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                result, usage = future.result()
+                if future is not primary:
+                    with self._lock:
+                        self.stats.hedge_wins += 1
+                self._usage_local.usage = usage
+                return result
+        raise error
+
+    def get_last_usage(self) -> Optional[Dict[str, int]]:
+        return LLMBase.get_last_usage(self)
+
+    def reset_last_usage(self):
+        LLMBase.reset_last_usage(self)
@@ -0,0 +1,62 @@
+import asyncio
+import importlib.util
+import threading
+import weakref
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Shared connection pools: every LLM and embedding client of the process reuses the same
+# keep-alive connections instead of paying TCP+TLS setup on each call.
+POOL_SIZE = 64
+TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+_lock = threading.Lock()
+_session = None
+_http_client = None
+_async_http_clients = weakref.WeakKeyDictionary()
+
+
+def http2_available() -> bool:
+    """HTTP/2 in httpx needs the optional h2 package."""
+    return importlib.util.find_spec('h2') is not None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+
+
+def get_session() -> requests.Session:
+    """Process-wide requests session with a keep-alive pool sized for the simulator's worker threads."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide pooled httpx client, using HTTP/2 when available."""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(http2=http2_available(), limits=_limits(), timeout=TIMEOUT)
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Pooled httpx async client for the running event loop, using HTTP/2 when available.
+    Async connections are bound to their event loop, so one client is kept per loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_http_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(http2=http2_available(), limits=_limits(), timeout=TIMEOUT)
+            _async_http_clients[loop] = client
+        return client
@@ -1,56 +1,155 @@
-from typing import Any, List
-from langchain_core.embeddings import Embeddings
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+import httpx
 import requests
+from langchain_core.embeddings import Embeddings
 import logging
+from .http import get_session, get_async_http_client
+from .retry_policy import RetryPolicy, get_circuit_breaker
 
 logger = logging.getLogger("websocietysimulator")
 
 
+def _estimate_tokens(text: str) -> int:
+    # About 4 characters per token, only used to keep requests under the payload limit
+    return len(text) // 4 + 1
+
+
+def _ordered_embeddings(body: dict) -> List[List[float]]:
+    return [data["embedding"] for data in sorted(body["data"], key=lambda data: data.get("index", 0))]
+
+
 class InfinigenceEmbeddings(Embeddings):
     def __init__(
         self,
         api_key: str,
         model: str = "bge-m3",
-        infinity_api_url: str = "https://cloud.infini-ai.com/maas/v1"
+        infinity_api_url: str = "https://cloud.infini-ai.com/maas/v1",
+        retry_policy: Optional[RetryPolicy] = None,
+        max_batch_size: int = 32,
+        max_batch_tokens: int = 8192,
+        max_concurrency: int = 4
     ):
+        """
+        Embeddings served by the Infinigence AI API
+
+        Inputs are split into sub-batches of at most max_batch_size texts and max_batch_tokens
+        estimated tokens, sent concurrently and reassembled in input order. Every sub-batch is
+        retried on its own, so one failure does not re-embed the others.
+
+        Args:
+            api_key: Infinigence AI API key
+            model: Embedding model name, defaults to bge-m3
+            infinity_api_url: API endpoint
+            retry_policy: Optional retry policy, defaults to one with a circuit breaker for the endpoint
+            max_batch_size: Maximum number of texts per request
+            max_batch_tokens: Maximum estimated tokens per request, a longer single text is sent alone
+            max_concurrency: Maximum number of sub-batches in flight
+        """
         self.api_key = api_key
         self.model = model
         self.infinity_api_url = infinity_api_url
-        
-    @retry(
-        retry=retry_if_exception_type(Exception),
-        wait=wait_exponential(multiplier=1, min=10, max=60),  # 等待时间从10秒开始，指数增长，最长60秒
-        stop=stop_after_attempt(5)  # 最多重试5次
-    )
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max_concurrency
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=5,
+            circuit_breaker=get_circuit_breaker(f"{infinity_api_url}/embeddings")
+        )
+
+    def _sub_batches(self, texts: List[str]) -> List[List[str]]:
+        batches = []
+        current = []
+        current_tokens = 0
+        for text in texts:
+            tokens = _estimate_tokens(text)
+            if current and (len(current) >= self.max_batch_size or current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of documents into vectors"""
+        batches = self._sub_batches(texts)
+        if len(batches) <= 1:
+            return self.retry_policy.call(self._embed, texts) if texts else []
+        # Each sub-batch runs in a copy of the caller's context so the task deadline still applies
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self.retry_policy.call, self._embed, batch)
+                for batch in batches
+            ]
+            return [vector for future in futures for vector in future.result()]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents into vectors on the shared pooled async HTTP client"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self.retry_policy.acall(self._aembed, batch)
+
+        results = await asyncio.gather(*[embed_batch(batch) for batch in self._sub_batches(texts)])
+        return [vector for vectors in results for vector in vectors]
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            payload = {
-                "model": self.model,
-                "input": texts
-            }
+            response = get_session().post(
+                f"{self.infinity_api_url}/embeddings",
+                headers=self._headers(),
+                json=self._payload(texts)
+            )
             
-            response = requests.post(
+            if response.status_code == 200:
+                return _ordered_embeddings(response.json())
+            else:
+                # HTTPError keeps the response so the retry policy can read its status and Retry-After
+                raise requests.HTTPError(f"API call failed: {response.text}", response=response)
+        except Exception as e:
+            logger.warning(f"InfinigenceEmbeddings API call failed: {e}")
+            raise e
+
+    async def _aembed(self, texts: List[str]) -> List[List[float]]:
+        try:
+            response = await get_async_http_client().post(
                 f"{self.infinity_api_url}/embeddings",
-                headers=headers,
-                json=payload
+                headers=self._headers(),
+                json=self._payload(texts)
             )
             
             if response.status_code == 200:
-                return [data["embedding"] for data in response.json()["data"]]
+                return _ordered_embeddings(response.json())
             else:
-                raise ValueError(f"API call failed: {response.text}")
+                raise httpx.HTTPStatusError(f"API call failed: {response.text}", request=response.request, response=response)
         except Exception as e:
             logger.warning(f"InfinigenceEmbeddings API call failed: {e}")
             raise e
 
+    def _headers(self) -> dict:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+    def _payload(self, texts: List[str]) -> dict:
+        return {
+            "model": self.model,
+            "input": texts
+        }
+
     def embed_query(self, text: str) -> List[float]:
         """Embed a single query text into a vector"""
         embeddings = self.embed_documents([text])
-        return embeddings[0] 
\ No newline at end of file
+        return embeddings[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a single query text into a vector asynchronously"""
+        embeddings = await self.aembed_documents([text])
+        return embeddings[0]
\ No newline at end of file
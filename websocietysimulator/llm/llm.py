@@ -1,8 +1,16 @@
-from typing import Dict, List, Optional, Union
-from openai import OpenAI
+import asyncio
+import threading
+import weakref
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from openai import OpenAI, AsyncOpenAI
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from .infinigence_embeddings import InfinigenceEmbeddings
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from .http import get_http_client, get_async_http_client
+from .retry_policy import RetryPolicy, get_circuit_breaker
+from .usage import check_token_budget, record_usage
+from .tokenizer import estimate_message_tokens, estimate_tokens
 import logging
 logger = logging.getLogger("websocietysimulator")
 
@@ -15,6 +23,7 @@ class LLMBase:
             model: Model name, defaults to deepseek-chat
         """
         self.model = model
+        self._usage_local = threading.local()
         
     def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
         """
@@ -31,7 +40,52 @@ class LLMBase:
             Union[str, List[str]]: Response text from LLM, either a single string or list of strings
         """
         raise NotImplementedError("Subclasses need to implement this method")
+
+    async def acall(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Async counterpart of __call__, same arguments and return value
+
+        The default implementation runs __call__ in a worker thread, subclasses with a
+        native async client should override it.
+        """
+        return await asyncio.to_thread(
+            self.__call__,
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop_strs=stop_strs,
+            n=n
+        )
     
+    def stream_call(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, stop_when: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Call LLM with a streamed response, cancelling the stream as soon as the output is usable
+
+        The default implementation waits for the full response of __call__, subclasses with a
+        streaming client should override it. Wrappers use the default, so their own behaviour
+        (caching, recording, ...) still applies.
+
+        Args:
+            messages: List of input messages, each message is a dict containing role and content
+            model: Optional model override
+            max_tokens: Maximum tokens in response, defaults to 500
+            stop_strs: Optional list of stop strings
+            stop_when: Optional predicate over the text received so far (see stop_conditions),
+                the stream is cancelled once it returns True
+
+        Returns:
+            str: Response text received until the stream ended or stop_when fired
+        """
+        return self.__call__(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop_strs=stop_strs,
+            n=1
+        )
+
     def get_embedding_model(self):
         """
         Get the embedding model for text embeddings
@@ -41,27 +95,145 @@ class LLMBase:
         """
         raise NotImplementedError("Subclasses need to implement this method")
 
+    def _record_usage(self, usage):
+        """
+        Remember the token usage reported with the response of the current thread's last call,
+        and charge it to the active usage scopes (see usage.track_usage).
+        """
+        self._usage_local.usage = {
+            'prompt_tokens': usage.prompt_tokens,
+            'completion_tokens': usage.completion_tokens
+        } if usage is not None else None
+        if usage is not None:
+            record_usage(usage.prompt_tokens, usage.completion_tokens)
+
+    def get_last_usage(self) -> Optional[Dict[str, int]]:
+        """
+        Token usage of the last call made from the current thread
+
+        Returns:
+            Optional[Dict[str, int]]: prompt_tokens and completion_tokens, or None if the backend did not report usage
+        """
+        return getattr(getattr(self, '_usage_local', None), 'usage', None)
+
+    def reset_last_usage(self):
+        if hasattr(self, '_usage_local'):
+            self._usage_local.usage = None
+
+class LLMWrapper(LLMBase):
+    def __init__(self, llm: LLMBase):
+        """
+        Initialize a wrapper that adds behaviour around another LLM
+
+        Args:
+            llm: The wrapped LLM instance, all calls are delegated to it by default
+        """
+        super().__init__(llm.model)
+        self.llm = llm
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        return self.llm(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop_strs=stop_strs,
+            n=n
+        )
+
+    def get_last_usage(self) -> Optional[Dict[str, int]]:
+        return self.llm.get_last_usage()
+
+    def reset_last_usage(self):
+        self.llm.reset_last_usage()
+
+    def get_embedding_model(self):
+        return self.llm.get_embedding_model()
+
+def _response_content(response, n: int) -> Union[str, List[str]]:
+    if n == 1:
+        return response.choices[0].message.content
+    else:
+        return [choice.message.content for choice in response.choices]
+
+def _stream_content(client: OpenAI, stop_when: Optional[Callable[[str], bool]], include_usage: bool, **kwargs) -> Tuple[str, Optional[object]]:
+    extra = {'stream_options': {'include_usage': True}} if include_usage else {}
+    stream = client.chat.completions.create(stream=True, **kwargs, **extra)
+    text = ''
+    usage = None
+    try:
+        for chunk in stream:
+            if getattr(chunk, 'usage', None) is not None:
+                usage = chunk.usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            text += chunk.choices[0].delta.content
+            if stop_when is not None and stop_when(text):
+                break
+    finally:
+        # Closing the response mid-stream stops the generation on the server side
+        stream.close()
+    return text, usage
+
+def _estimated_usage(messages: List[Dict[str, str]], text: str):
+    """Usage of a cancelled stream, which never receives the usage chunk."""
+    return SimpleNamespace(prompt_tokens=estimate_message_tokens(messages), completion_tokens=estimate_tokens(text))
+
 class InfinigenceLLM(LLMBase):
-    def __init__(self, api_key: str, model: str = "qwen2.5-72b-instruct"):
+    def __init__(self, api_key: str, model: str = "qwen2.5-72b-instruct", base_url: str = "https://cloud.infini-ai.com/maas/v1", retry_policy: Optional[RetryPolicy] = None, embedding_model: Optional[Embeddings] = None):
         """
         Initialize Deepseek LLM
         
         Args:
             api_key: Deepseek API key
             model: Model name, defaults to qwen2.5-72b-instruct
+            base_url: API endpoint, defaults to Infinigence AI
+            retry_policy: Optional retry policy, defaults to one with a circuit breaker per base_url
+            embedding_model: Optional embeddings returned by get_embedding_model, e.g. LocalEmbeddings,
+                defaults to InfinigenceEmbeddings
         """
         super().__init__(model)
+        self.api_key = api_key
+        self.base_url = base_url
+        # Retries are handled by the retry policy, not by the OpenAI client
         self.client = OpenAI(
             api_key=api_key,
-            base_url="https://cloud.infini-ai.com/maas/v1"
+            base_url=base_url,
+            http_client=get_http_client(),
+            max_retries=0
         )
-        self.embedding_model = InfinigenceEmbeddings(api_key=api_key)
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.retry_policy = retry_policy or RetryPolicy(circuit_breaker=get_circuit_breaker(base_url))
+        self.embedding_model = embedding_model or InfinigenceEmbeddings(api_key=api_key, infinity_api_url=base_url)
+
+    def _get_async_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=get_async_http_client(), max_retries=0)
+            self._async_clients[loop] = client
+        return client
+
+    def _log_error(self, e: Exception):
+        if "429" in str(e):
+            logger.warning("Rate limit exceeded")
+        else:
+            logger.error(f"Other LLM Error: {e}")
+
+    def _create(self, **kwargs):
+        try:
+            return self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            self._log_error(e)
+            raise e
+
+    async def _acreate(self, **kwargs):
+        try:
+            return await self._get_async_client().chat.completions.create(**kwargs)
+        except Exception as e:
+            self._log_error(e)
+            raise e
         
-    @retry(
-        retry=retry_if_exception_type(Exception),
-        wait=wait_exponential(multiplier=1, min=10, max=300),  # 等待时间从10秒开始，指数增长，最长300秒
-        stop=stop_after_attempt(10)  # 最多重试10次
-    )
     def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
         """
         Call Infinigence AI API to get response with rate limit handling
@@ -76,42 +248,89 @@ class InfinigenceLLM(LLMBase):
         Returns:
             Union[str, List[str]]: Response text from LLM, either a single string or list of strings
         """
+        check_token_budget(messages, max_tokens, n)
+        response = self.retry_policy.call(
+            self._create,
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop_strs,
+            n=n,
+        )
+        self._record_usage(response.usage)
+        return _response_content(response, n)
+
+    async def acall(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Async version of __call__ on the shared pooled HTTP client
+        """
+        check_token_budget(messages, max_tokens, n)
+        response = await self.retry_policy.acall(
+            self._acreate,
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop_strs,
+            n=n,
+        )
+        self._record_usage(response.usage)
+        return _response_content(response, n)
+
+    def _stream(self, stop_when: Optional[Callable[[str], bool]], **kwargs) -> Tuple[str, Optional[object]]:
         try:
-            response = self.client.chat.completions.create(
-                model=model or self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                stop=stop_strs,
-                n=n,
-            )
-            
-            if n == 1:
-                return response.choices[0].message.content
-            else:
-                return [choice.message.content for choice in response.choices]
+            return _stream_content(self.client, stop_when, False, **kwargs)
         except Exception as e:
-            if "429" in str(e):
-                logger.warning("Rate limit exceeded")
-            else:
-                logger.error(f"Other LLM Error: {e}")
+            self._log_error(e)
             raise e
+
+    def stream_call(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, stop_when: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Streaming version of __call__, see LLMBase.stream_call
+        """
+        check_token_budget(messages, max_tokens, 1)
+        text, usage = self.retry_policy.call(
+            self._stream,
+            stop_when,
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop_strs,
+        )
+        self._record_usage(usage or _estimated_usage(messages, text))
+        return text
     
     def get_embedding_model(self):
         return self.embedding_model
 
 class OpenAILLM(LLMBase):
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo", retry_policy: Optional[RetryPolicy] = None, embedding_model: Optional[Embeddings] = None):
         """
         Initialize OpenAI LLM
         
         Args:
             api_key: OpenAI API key
             model: Model name, defaults to gpt-3.5-turbo
+            retry_policy: Optional retry policy, defaults to one with a circuit breaker for the OpenAI API
+            embedding_model: Optional embeddings returned by get_embedding_model, e.g. LocalEmbeddings,
+                defaults to OpenAIEmbeddings
         """
         super().__init__(model)
-        self.client = OpenAI(api_key=api_key)
-        self.embedding_model = OpenAIEmbeddings(api_key=api_key)
+        self.api_key = api_key
+        self.client = OpenAI(api_key=api_key, http_client=get_http_client(), max_retries=0)
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.retry_policy = retry_policy or RetryPolicy(circuit_breaker=get_circuit_breaker(str(self.client.base_url)))
+        self.embedding_model = embedding_model or OpenAIEmbeddings(api_key=api_key)
+
+    def _get_async_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(api_key=self.api_key, http_client=get_async_http_client(), max_retries=0)
+            self._async_clients[loop] = client
+        return client
         
     def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
         """
@@ -127,7 +346,9 @@ class OpenAILLM(LLMBase):
         Returns:
             Union[str, List[str]]: Response text from LLM, either a single string or list of strings
         """
-        response = self.client.chat.completions.create(
+        check_token_budget(messages, max_tokens, n)
+        response = self.retry_policy.call(
+            self.client.chat.completions.create,
             model=model or self.model,
             messages=messages,
             temperature=temperature,
@@ -135,11 +356,44 @@ class OpenAILLM(LLMBase):
             stop=stop_strs,
             n=n
         )
-        
-        if n == 1:
-            return response.choices[0].message.content
-        else:
-            return [choice.message.content for choice in response.choices]
+        self._record_usage(response.usage)
+        return _response_content(response, n)
+
+    async def acall(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Async version of __call__ on the shared pooled HTTP client
+        """
+        check_token_budget(messages, max_tokens, n)
+        response = await self.retry_policy.acall(
+            lambda **kwargs: self._get_async_client().chat.completions.create(**kwargs),
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop_strs,
+            n=n
+        )
+        self._record_usage(response.usage)
+        return _response_content(response, n)
+
+    def stream_call(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, stop_when: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Streaming version of __call__, see LLMBase.stream_call
+        """
+        check_token_budget(messages, max_tokens, 1)
+        text, usage = self.retry_policy.call(
+            _stream_content,
+            self.client,
+            stop_when,
+            True,
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop_strs
+        )
+        self._record_usage(usage or _estimated_usage(messages, text))
+        return text
     
     def get_embedding_model(self):
         return self.embedding_model 
@@ -0,0 +1,60 @@
+import threading
+from typing import List, Optional
+import torch
+from langchain_core.embeddings import Embeddings
+from sentence_transformers import SentenceTransformer
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+
+class LocalEmbeddings(Embeddings):
+    def __init__(
+        self,
+        model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        device: str = "cpu",
+        batch_size: int = 32,
+        backend: str = "torch",
+        quantize: Optional[str] = None,
+        num_threads: Optional[int] = None
+    ):
+        """
+        Sentence-transformers embeddings computed in-process, no network needed once the model is cached
+
+        encode() sorts the inputs by length before batching, so padding stays small, and torch
+        (or ONNX Runtime) spreads every batch over the CPU threads.
+
+        Args:
+            model: Sentence-transformers model name or local path
+            device: Torch device, defaults to cpu
+            batch_size: Number of texts encoded per forward pass
+            backend: "torch" or "onnx" (requires optimum[onnxruntime])
+            quantize: "int8" for dynamic int8 quantization of the linear layers, torch backend only
+            num_threads: Optional number of torch CPU threads, a process-wide setting
+        """
+        if quantize not in (None, 'int8'):
+            raise ValueError(f"Unsupported quantization {quantize}, use None or 'int8'")
+        if quantize and backend != 'torch':
+            raise ValueError("Dynamic quantization is only available with the torch backend")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.model = model
+        self.batch_size = batch_size
+        self.encoder = SentenceTransformer(model, device=device, backend=backend)
+        if quantize == 'int8':
+            self.encoder = torch.quantization.quantize_dynamic(self.encoder, {torch.nn.Linear}, dtype=torch.qint8)
+        # Concurrent encodes would compete for the same cores, run them one at a time
+        self._lock = threading.Lock()
+        logger.info(f"Loaded local embedding model {model} on {device} ({backend}{', int8' if quantize else ''})")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents into vectors"""
+        if not texts:
+            return []
+        with self._lock, torch.inference_mode():
+            vectors = self.encoder.encode(texts, batch_size=self.batch_size, normalize_embeddings=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query text into a vector"""
+        return self.embed_documents([text])[0]
@@ -0,0 +1,239 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple, Union
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, StoppingCriteria, StoppingCriteriaList
+from .llm import LLMBase
+from .local_embeddings import LocalEmbeddings
+from .usage import check_token_budget
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+
+@dataclass
+class _GenerationRequest:
+    prompt: str
+    temperature: float
+    max_tokens: int
+    stop_strs: List[str]
+    n: int
+    future: Future = field(default_factory=Future)
+
+
+def _truncate_at_stop(text: str, stop_strs: List[str]) -> str:
+    positions = [text.find(stop) for stop in stop_strs if stop and stop in text]
+    return text[:min(positions)] if positions else text
+
+
+class _StopOnStrings(StoppingCriteria):
+    """Marks every row finished as soon as its generated text contains one of its stop strings."""
+
+    def __init__(self, tokenizer, prompt_length: int, stops_per_row: List[List[str]]):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stops_per_row = stops_per_row
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        texts = self.tokenizer.batch_decode(input_ids[:, self.prompt_length:], skip_special_tokens=True)
+        done = [any(stop in text for stop in stops) for text, stops in zip(texts, self.stops_per_row)]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class LocalLLM(LLMBase):
+    def __init__(self, model: str = "Qwen/Qwen2.5-0.5B-Instruct", embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2", max_batch_size: int = 8, batch_wait: float = 0.01, num_threads: Optional[int] = None, n_ctx: int = 4096):
+        """
+        Small causal LM served in-process on CPU, for offline runs, CI and as a CPU-bound load generator
+
+        Calls from concurrent threads are queued and generated together: a worker collects the
+        requests arriving within batch_wait seconds (up to max_batch_size sequences) into one
+        left-padded forward pass. A model path ending in .gguf is served with llama-cpp-python
+        instead, one request at a time.
+
+        Args:
+            model: Hugging Face model name or local path, or the path of a GGUF file
+            embedding_model: Sentence-transformers model returned by get_embedding_model
+            max_batch_size: Maximum number of sequences (n counts per request) in one forward pass
+            batch_wait: Seconds the worker waits for more requests to join a batch
+            num_threads: Optional number of CPU threads used by torch or llama.cpp
+            n_ctx: Context size of a GGUF model
+        """
+        super().__init__(model)
+        self.embedding_model_name = embedding_model
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self._embedding_model = None
+        self._embedding_lock = threading.Lock()
+        self._llama = None
+
+        if model.endswith('.gguf'):
+            try:
+                from llama_cpp import Llama
+            except ImportError as e:
+                raise ImportError("Serving GGUF models requires llama-cpp-python: pip install llama-cpp-python") from e
+            self._llama = Llama(model_path=model, n_ctx=n_ctx, n_threads=num_threads, verbose=False)
+            self._llama_lock = threading.Lock()
+            logger.info(f"Loaded GGUF model {model}")
+            return
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        # Decoder-only models need left padding so every row continues right after its prompt
+        self.tokenizer.padding_side = 'left'
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.hf_model = AutoModelForCausalLM.from_pretrained(model, torch_dtype=torch.float32)
+        self.hf_model.eval()
+        eos = self.hf_model.generation_config.eos_token_id
+        self._end_ids = set(eos if isinstance(eos, list) else [eos]) | {self.tokenizer.eos_token_id, self.tokenizer.pad_token_id}
+        self._end_ids.discard(None)
+        self._has_chat_template = bool(getattr(self.tokenizer, 'chat_template', None))
+
+        self._queue: "queue.Queue[Optional[_GenerationRequest]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run_worker, name='local-llm-worker', daemon=True)
+        self._worker.start()
+        logger.info(f"Loaded local model {model}")
+
+    def _format_prompt(self, messages: List[Dict[str, str]]) -> str:
+        if self._has_chat_template:
+            return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        return '\n'.join(f"{message['role']}: {message['content']}" for message in messages) + '\nassistant:'
+
+    def _run_worker(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            rows = first.n
+            deadline = time.monotonic() + self.batch_wait
+            while rows < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                batch.append(request)
+                rows += request.n
+
+            # Greedy and sampled requests (or different temperatures) cannot share a generate call
+            groups: Dict[float, List[_GenerationRequest]] = {}
+            for request in batch:
+                groups.setdefault(request.temperature, []).append(request)
+            for group in groups.values():
+                try:
+                    self._generate(group)
+                except Exception as e:
+                    logger.error(f"Local generation failed: {e}")
+                    for request in group:
+                        if not request.future.done():
+                            request.future.set_exception(e)
+
+    def _generate(self, group: List[_GenerationRequest]):
+        rows = [request for request in group for _ in range(request.n)]
+        inputs = self.tokenizer(
+            [request.prompt for request in rows],
+            return_tensors='pt',
+            padding=True,
+            # The chat template already contains the special tokens
+            add_special_tokens=not self._has_chat_template
+        )
+        prompt_length = inputs['input_ids'].shape[1]
+        temperature = group[0].temperature
+        kwargs = {
+            'max_new_tokens': max(request.max_tokens for request in group),
+            'pad_token_id': self.tokenizer.pad_token_id,
+            'do_sample': temperature > 0
+        }
+        if temperature > 0:
+            kwargs['temperature'] = temperature
+        stops_per_row = [request.stop_strs for request in rows]
+        if any(stops_per_row):
+            kwargs['stopping_criteria'] = StoppingCriteriaList([_StopOnStrings(self.tokenizer, prompt_length, stops_per_row)])
+
+        with torch.inference_mode():
+            output = self.hf_model.generate(**inputs, **kwargs)
+        generated = output[:, prompt_length:].tolist()
+        prompt_lengths = inputs['attention_mask'].sum(dim=1).tolist()
+
+        row = 0
+        for request in group:
+            texts = []
+            completion_tokens = 0
+            for _ in range(request.n):
+                ids = generated[row][:request.max_tokens]
+                end = next((i for i, token in enumerate(ids) if token in self._end_ids), len(ids))
+                ids = ids[:end]
+                texts.append(_truncate_at_stop(self.tokenizer.decode(ids, skip_special_tokens=True), request.stop_strs))
+                completion_tokens += len(ids)
+                row += 1
+            request.future.set_result((texts, int(prompt_lengths[row - 1]), completion_tokens))
+
+    def _llama_generate(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int, stop_strs: Optional[List[str]], n: int) -> Tuple[List[str], int, int]:
+        texts = []
+        prompt_tokens = completion_tokens = 0
+        with self._llama_lock:
+            for _ in range(n):
+                response = self._llama.create_chat_completion(
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stop=stop_strs or None
+                )
+                texts.append(response['choices'][0]['message']['content'])
+                prompt_tokens = response['usage']['prompt_tokens']
+                completion_tokens += response['usage']['completion_tokens']
+        return texts, prompt_tokens, completion_tokens
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        """
+        Generate with the local model, model overrides are ignored
+
+        Args:
+            messages: List of input messages, each message is a dict containing role and content
+            model: Ignored, only the loaded model is available
+            max_tokens: Maximum tokens in response, defaults to 500
+            stop_strs: Optional list of stop strings
+            n: Number of responses to generate, defaults to 1
+
+        Returns:
+            Union[str, List[str]]: Response text from LLM, either a single string or list of strings
+        """
+        check_token_budget(messages, max_tokens, n)
+        if self._llama is not None:
+            texts, prompt_tokens, completion_tokens = self._llama_generate(messages, temperature, max_tokens, stop_strs, n)
+        else:
+            request = _GenerationRequest(
+                prompt=self._format_prompt(messages),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop_strs=list(stop_strs or []),
+                n=n
+            )
+            self._queue.put(request)
+            texts, prompt_tokens, completion_tokens = request.future.result()
+        self._record_usage(SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+        return texts[0] if n == 1 else texts
+
+    def get_embedding_model(self):
+        # Loaded on first use, runs that never embed do not pay for it
+        with self._embedding_lock:
+            if self._embedding_model is None:
+                self._embedding_model = LocalEmbeddings(model=self.embedding_model_name)
+            return self._embedding_model
+
+    def close(self):
+        """Stop the batching worker."""
+        if self._llama is None:
+            self._queue.put(None)
+            self._worker.join()
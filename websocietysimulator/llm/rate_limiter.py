@@ -0,0 +1,195 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
+from .llm import LLMBase, LLMWrapper
+from .retry_policy import before_retry
+from .tokenizer import estimate_message_tokens
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+
+class _LocalState:
+    """Bucket state shared by the threads of one process."""
+
+    def __init__(self, initial: Dict[str, float]):
+        self._state = dict(initial)
+        self._lock = threading.Lock()
+
+    def transact(self, fn: Callable[[Dict[str, float]], object]):
+        with self._lock:
+            return fn(self._state)
+
+
+class _SQLiteState:
+    """Bucket state shared by every process that opens the same SQLite file."""
+
+    def __init__(self, path: str, initial: Dict[str, float]):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS bucket (id INTEGER PRIMARY KEY CHECK (id = 0), state TEXT NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO bucket (id, state) VALUES (0, ?)", (json.dumps(initial),))
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def transact(self, fn: Callable[[Dict[str, float]], object]):
+        conn = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front so read-modify-write is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = json.loads(conn.execute("SELECT state FROM bucket WHERE id = 0").fetchone()[0])
+            result = fn(state)
+            conn.execute("UPDATE bucket SET state = ? WHERE id = 0", (json.dumps(state),))
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None, path: Optional[str] = None):
+        """
+        Client-side token-bucket limiter for requests-per-minute and tokens-per-minute budgets
+
+        Share one instance between LLMs (and threads) to make them draw from the same quota.
+        Give a path to share the budget between processes through an SQLite file.
+
+        Args:
+            requests_per_minute: Request budget, None for no request limit
+            tokens_per_minute: Token (prompt + completion) budget, None for no token limit
+            path: Optional SQLite file holding the bucket state for cross-process sharing
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        initial = {
+            'requests': requests_per_minute or 0.0,
+            'tokens': tokens_per_minute or 0.0,
+            'updated_at': time.time()
+        }
+        self._state = _SQLiteState(path, initial) if path else _LocalState(initial)
+
+    def _refill(self, state: Dict[str, float], now: float):
+        elapsed = max(0.0, now - state['updated_at'])
+        if self.requests_per_minute:
+            state['requests'] = min(self.requests_per_minute, state['requests'] + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            state['tokens'] = min(self.tokens_per_minute, state['tokens'] + elapsed * self.tokens_per_minute / 60)
+        state['updated_at'] = now
+
+    def _try_acquire(self, tokens: int) -> Callable[[Dict[str, float]], float]:
+        def fn(state: Dict[str, float]) -> float:
+            now = time.time()
+            self._refill(state, now)
+            wait = 0.0
+            if self.requests_per_minute and state['requests'] < 1:
+                wait = max(wait, (1 - state['requests']) * 60 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                # A request larger than the whole budget only waits for a full bucket
+                needed = min(tokens, self.tokens_per_minute)
+                if state['tokens'] < needed:
+                    wait = max(wait, (needed - state['tokens']) * 60 / self.tokens_per_minute)
+            if wait == 0.0:
+                if self.requests_per_minute:
+                    state['requests'] -= 1
+                if self.tokens_per_minute:
+                    state['tokens'] -= tokens
+            return wait
+        return fn
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until one request and the given number of tokens can be reserved
+
+        Args:
+            tokens: Estimated prompt + completion tokens of the request
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            wait = self._state.transact(self._try_acquire(tokens))
+            if wait == 0.0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def reconcile(self, reserved_tokens: int, actual_tokens: int):
+        """Correct a reservation with the usage reported by the API, refunding or charging the difference."""
+        if not self.tokens_per_minute or reserved_tokens == actual_tokens:
+            return
+
+        def fn(state: Dict[str, float]):
+            self._refill(state, time.time())
+            # The level may go negative, which delays the next callers instead of overshooting the quota
+            state['tokens'] = min(self.tokens_per_minute, state['tokens'] + reserved_tokens - actual_tokens)
+
+        self._state.transact(fn)
+
+
+class RateLimitedLLM(LLMWrapper):
+    def __init__(self, llm: LLMBase, rate_limiter: RateLimiter, token_estimator: Callable[[List[Dict[str, str]]], int] = estimate_message_tokens):
+        """
+        Reserve request and token budget before every attempt and reconcile it with the reported usage
+
+        Retries made by the RetryPolicy of the wrapped LLM take a new reservation, so they wait for
+        the quota like new calls instead of hitting a rate-limited backend again at once.
+
+        Args:
+            llm: LLM instance to limit
+            rate_limiter: RateLimiter shared by every LLM drawing from the same quota
+            token_estimator: Estimates the prompt tokens of a list of messages, defaults to estimate_message_tokens
+        """
+        super().__init__(llm)
+        self.rate_limiter = rate_limiter
+        self.token_estimator = token_estimator
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _acquire(self, tokens: int):
+        waited = self.rate_limiter.acquire(tokens)
+        if waited:
+            with self._lock:
+                self.waited_seconds += waited
+            logger.debug(f"Rate limiter delayed call by {waited:.2f}s")
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        reserved = self.token_estimator(messages) + max_tokens * n
+        self._acquire(reserved)
+
+        def reserve_retry():
+            # The failed attempt used no tokens, but the retry is a new request against the quota
+            self.rate_limiter.reconcile(reserved, 0)
+            self._acquire(reserved)
+
+        self.llm.reset_last_usage()
+        try:
+            # Retries of the wrapped LLM's RetryPolicy go through the limiter like the first attempt
+            with before_retry(reserve_retry):
+                response = self.llm(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stop_strs=stop_strs,
+                    n=n
+                )
+        except Exception:
+            # A failed call still counts against the request budget, but its tokens are refunded
+            self.rate_limiter.reconcile(reserved, 0)
+            raise
+        usage = self.llm.get_last_usage()
+        if usage is not None:
+            self.rate_limiter.reconcile(reserved, usage['prompt_tokens'] + usage['completion_tokens'])
+        return response
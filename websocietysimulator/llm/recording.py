@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+from langchain_core.embeddings import Embeddings
+from .llm import LLMBase, LLMWrapper
+from .utils import llm_request_payload, embedding_request_payload, embedding_model_name, request_key
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+LLM_RECORD_FILE = 'llm.jsonl'
+EMBEDDING_RECORD_FILE = 'embeddings.jsonl'
+
+
+class ReplayMissError(KeyError):
+    """Raised when a replayed request was never recorded."""
+
+
+class _RecordWriter:
+    """Thread-safe append-only JSONL writer shared by the recording wrappers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class _RecordReader:
+    """Loads a JSONL recording and serves responses per key in recorded order."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.records.setdefault(record['key'], []).append(record)
+        else:
+            logger.warning(f"Recording file {path} not found, every request will miss")
+
+    def next(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the next recorded response for a key. Repeated identical requests are
+        served in the order they were recorded, the last one is reused once exhausted.
+        """
+        with self._lock:
+            entries = self.records.get(key)
+            if not entries:
+                return None
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return entries[min(cursor, len(entries) - 1)]
+
+
+def _simulate_latency(latency: Union[None, float, str], record: Dict[str, Any]):
+    if latency is None:
+        return
+    delay = record.get('latency', 0.0) if latency == 'recorded' else float(latency)
+    if delay > 0:
+        time.sleep(delay)
+
+
+class RecordingEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, record_dir: str):
+        """
+        Wrap an embedding model and persist every request/response pair
+
+        Args:
+            embeddings: Embedding model that serves the requests
+            record_dir: Directory the recording is appended to
+        """
+        self.embeddings = embeddings
+        self.model = embedding_model_name(embeddings)
+        self.writer = _RecordWriter(os.path.join(record_dir, EMBEDDING_RECORD_FILE))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        payload = embedding_request_payload(self.model, texts)
+        start = time.time()
+        vectors = self.embeddings.embed_documents(texts)
+        self.writer.write({
+            'key': request_key(payload),
+            'request': payload,
+            'response': [list(map(float, vector)) for vector in vectors],
+            'latency': time.time() - start
+        })
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class ReplayEmbeddings(Embeddings):
+    def __init__(self, record_dir: str, model: Optional[str] = None, latency: Union[None, float, str] = None):
+        """
+        Serve embeddings from a recording made by RecordingEmbeddings
+
+        Args:
+            record_dir: Directory containing the recording
+            model: Model name used when the recording was made, inferred from the recording if omitted
+            latency: None for no delay, a number of seconds, or 'recorded' to replay the recorded latency
+        """
+        self.reader = _RecordReader(os.path.join(record_dir, EMBEDDING_RECORD_FILE))
+        self.model = model or _recorded_model(self.reader) or 'unknown'
+        self.latency = latency
+        self.missing_requests: List[Dict[str, Any]] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        payload = embedding_request_payload(self.model, texts)
+        record = self.reader.next(request_key(payload))
+        if record is None:
+            self.missing_requests.append(payload)
+            logger.error(f"Embedding request for {len(texts)} texts missing from recording")
+            raise ReplayMissError(request_key(payload))
+        _simulate_latency(self.latency, record)
+        return record['response']
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class RecordingLLM(LLMWrapper):
+    def __init__(self, llm: LLMBase, record_dir: str):
+        """
+        Wrap an LLM and persist every request/response pair, including the embedding traffic
+        of its embedding model, so the run can later be replayed offline with ReplayLLM
+
+        Args:
+            llm: LLM instance that serves the requests
+            record_dir: Directory the recording is appended to
+        """
+        super().__init__(llm)
+        self.record_dir = record_dir
+        self.writer = _RecordWriter(os.path.join(record_dir, LLM_RECORD_FILE))
+        self.embedding_model = RecordingEmbeddings(llm.get_embedding_model(), record_dir)
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        payload = llm_request_payload(messages, model or self.model, temperature, max_tokens, stop_strs, n)
+        start = time.time()
+        response = self.llm(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop_strs=stop_strs,
+            n=n
+        )
+        self.writer.write({
+            'key': request_key(payload),
+            'request': payload,
+            'response': response,
+            'latency': time.time() - start
+        })
+        return response
+
+    def get_embedding_model(self):
+        return self.embedding_model
+
+
+class ReplayLLM(LLMBase):
+    def __init__(self, record_dir: str, model: Optional[str] = None, latency: Union[None, float, str] = None):
+        """
+        Serve LLM and embedding responses from a recording made by RecordingLLM, without network access
+
+        Args:
+            record_dir: Directory containing the recording
+            model: Default model name used when recording, inferred from the recording if omitted
+            latency: None for no delay, a number of seconds, or 'recorded' to replay the recorded latency
+        """
+        self.reader = _RecordReader(os.path.join(record_dir, LLM_RECORD_FILE))
+        super().__init__(model or _recorded_model(self.reader) or "qwen2.5-72b-instruct")
+        self.latency = latency
+        self.missing_requests: List[Dict[str, Any]] = []
+        self.embedding_model = ReplayEmbeddings(record_dir, latency=latency)
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        payload = llm_request_payload(messages, model or self.model, temperature, max_tokens, stop_strs, n)
+        key = request_key(payload)
+        record = self.reader.next(key)
+        if record is None:
+            self.missing_requests.append(payload)
+            logger.error(f"LLM request {key[:12]} missing from recording")
+            raise ReplayMissError(key)
+        _simulate_latency(self.latency, record)
+        return record['response']
+
+    def get_embedding_model(self):
+        return self.embedding_model
+
+
+def _recorded_model(reader: _RecordReader) -> Optional[str]:
+    for entries in reader.records.values():
+        return entries[0]['request'].get('model')
+    return None
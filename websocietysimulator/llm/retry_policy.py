@@ -0,0 +1,275 @@
+import asyncio
+import contextlib
+import contextvars
+import email.utils
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+import httpx
+import openai
+import requests
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429}
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('llm_task_deadline', default=None)
+_before_retry: contextvars.ContextVar[Optional[Callable[[], None]]] = contextvars.ContextVar('llm_before_retry', default=None)
+
+
+@contextlib.contextmanager
+def task_deadline(seconds: Optional[float]):
+    """
+    Bound the time retries may spend inside the block, e.g. the time limit of a task.
+    A retry whose backoff would end past the deadline is not attempted.
+    """
+    token = _deadline.set(time.time() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_task_deadline() -> Optional[float]:
+    """Absolute deadline (epoch seconds) of the current task, if any."""
+    return _deadline.get()
+
+
+@contextlib.contextmanager
+def before_retry(hook: Callable[[], None]):
+    """
+    Call hook after the backoff of every retry made inside the block, before the attempt.
+    Used by RateLimitedLLM to take a new rate limiter reservation for each attempt.
+    """
+    token = _before_retry.set(hook)
+    try:
+        yield
+    finally:
+        _before_retry.reset(token)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the backend while its circuit breaker is open."""
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code
+    response = getattr(exc, 'response', None)
+    if isinstance(exc, (requests.HTTPError, httpx.HTTPStatusError)) and response is not None:
+        return response.status_code
+    return None
+
+
+def _headers(exc: BaseException):
+    response = getattr(exc, 'response', None)
+    return getattr(response, 'headers', None) or {}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Transient errors (rate limits, server errors, connection problems) are retryable, everything else is fatal."""
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    return isinstance(exc, (
+        openai.APIConnectionError,
+        requests.ConnectionError,
+        requests.Timeout,
+        httpx.TransportError,
+        CircuitOpenError,
+    ))
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Delay requested by the server through the retry-after-ms or Retry-After headers."""
+    headers = _headers(exc)
+    try:
+        if headers.get('retry-after-ms') is not None:
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            retry_date = email.utils.parsedate_to_datetime(value)
+            return max(0.0, retry_date.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Stop calling a backend after consecutive transient failures
+
+        After failure_threshold consecutive failures the circuit opens and calls fail fast with
+        CircuitOpenError. After reset_timeout seconds one trial call is let through (half-open),
+        its success closes the circuit again.
+
+        Args:
+            name: Backend name used in logs
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.time() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self) -> bool:
+        """Raise CircuitOpenError unless a call may go through, return whether it is the half-open trial."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return False
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            remaining = max(0.0, self.opened_at + self.reset_timeout - time.time())
+        raise CircuitOpenError(f"Circuit for {self.name} is open, retry in {remaining:.1f}s")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """End a call whose outcome says nothing about the backend health, e.g. a 400 for a malformed request."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit for {self.name} opened after {self.failures} consecutive failures")
+                self.opened_at = time.time()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """Process-wide circuit breaker of a backend, shared by every client talking to it."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        return _breakers[name]
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 6, base_delay: float = 0.5, max_delay: float = 30.0, min_delay: float = 0.05, circuit_breaker: Optional[CircuitBreaker] = None):
+        """
+        Retry transient errors with full-jitter exponential backoff
+
+        Fatal errors (e.g. 400 from a malformed prompt) are raised immediately. Retry-After from
+        the server takes precedence over the backoff. No retry is attempted once its delay would
+        exceed the deadline set with task_deadline.
+
+        Args:
+            max_attempts: Maximum number of attempts including the first one
+            base_delay: Backoff cap of the first retry in seconds, doubled on every attempt
+            max_delay: Upper bound of a single backoff in seconds
+            min_delay: Lower bound of a single backoff in seconds
+            circuit_breaker: Optional circuit breaker of the backend
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_delay = min_delay
+        self.circuit_breaker = circuit_breaker
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform between min_delay and the exponential cap of this attempt."""
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return max(self.min_delay, random.uniform(0, cap))
+
+    def _next_delay(self, exc: Exception, attempt: int) -> Optional[float]:
+        """Delay before the next attempt, or None if the error must be raised."""
+        retryable = is_retryable(exc)
+        if self.circuit_breaker is not None and not isinstance(exc, CircuitOpenError):
+            # Fatal client errors say nothing about the backend health, the breaker state is kept
+            if retryable:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.release_trial()
+        if not retryable or attempt + 1 >= self.max_attempts:
+            return None
+        delay = retry_after_seconds(exc)
+        if delay is None:
+            delay = self.backoff(attempt)
+        deadline = get_task_deadline()
+        if deadline is not None and time.time() + delay > deadline:
+            logger.warning(f"Not retrying, backoff of {delay:.2f}s exceeds the task deadline")
+            return None
+        logger.info(f"Retrying after {type(exc).__name__} in {delay:.2f}s (attempt {attempt + 1}/{self.max_attempts})")
+        return delay
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            trial = False
+            try:
+                if self.circuit_breaker is not None:
+                    trial = self.circuit_breaker.allow()
+                result = fn(*args, **kwargs)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_success()
+                return result
+            except Exception as e:
+                delay = self._next_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                hook = _before_retry.get()
+                if hook is not None:
+                    hook()
+            except BaseException:
+                # A cancelled or interrupted trial must not leave the circuit waiting for it forever
+                if trial:
+                    self.circuit_breaker.release_trial()
+                raise
+
+    async def acall(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            trial = False
+            try:
+                if self.circuit_breaker is not None:
+                    trial = self.circuit_breaker.allow()
+                result = await fn(*args, **kwargs)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_success()
+                return result
+            except Exception as e:
+                delay = self._next_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                hook = _before_retry.get()
+                if hook is not None:
+                    # The hook may block, e.g. waiting for the rate limiter
+                    await asyncio.to_thread(hook)
+            except BaseException:
+                # A cancelled or interrupted trial must not leave the circuit waiting for it forever
+                if trial:
+                    self.circuit_breaker.release_trial()
+                raise
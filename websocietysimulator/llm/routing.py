@@ -0,0 +1,173 @@
+import ast
+import contextlib
+import contextvars
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from .llm import LLMBase
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+_call_tag: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('llm_call_tag', default=None)
+
+Validator = Callable[[Union[str, List[str]]], bool]
+
+
+@contextlib.contextmanager
+def call_tag(tag: str):
+    """Label the LLM calls made inside the block with the call site they come from, e.g. "planning"."""
+    token = _call_tag.set(tag)
+    try:
+        yield
+    finally:
+        _call_tag.reset(token)
+
+
+def current_call_tag() -> Optional[str]:
+    return _call_tag.get()
+
+
+def _outputs(output: Union[str, List[str]]) -> List[str]:
+    return [output] if isinstance(output, str) else list(output)
+
+
+def valid_plan(output: Union[str, List[str]]) -> bool:
+    """At least one subtask dict that PlanningBase can parse."""
+    for dict_string in re.findall(r"\{[^{}]*\}", _outputs(output)[0]):
+        try:
+            ast.literal_eval(dict_string)
+            return True
+        except (ValueError, SyntaxError):
+            continue
+    return False
+
+
+def valid_score(output: Union[str, List[str]]) -> bool:
+    """A relevance score between 1 and 10."""
+    match = re.search(r'\d+', _outputs(output)[0])
+    return match is not None and 1 <= int(match.group()) <= 10
+
+
+def valid_case_scores(output: Union[str, List[str]]) -> bool:
+    """At least one "Case N Score: S" line, with every score between 1 and 10."""
+    scores = re.findall(r'Case\s*\d+\s*Score:\s*(\d+)', _outputs(output)[0])
+    return bool(scores) and all(1 <= int(score) <= 10 for score in scores)
+
+
+def valid_votes(output: Union[str, List[str]]) -> bool:
+    """At least half of the votes name an answer."""
+    votes = _outputs(output)
+    return sum(1 for vote in votes if re.match(r".*best answer is .*(\d+).*", vote, re.DOTALL)) * 2 >= len(votes)
+
+
+DEFAULT_VALIDATORS: Dict[str, Validator] = {
+    'planning': valid_plan,
+    'memory_scoring': valid_score,
+    'memory_batch_scoring': valid_case_scores,
+    'tot_voting': valid_votes,
+}
+
+
+@dataclass
+class TierStats:
+    calls: int = 0
+    errors: int = 0
+    escalations: int = 0
+    total_latency: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'escalations': self.escalations,
+            'total_latency': self.total_latency,
+            'mean_latency': self.mean_latency
+        }
+
+
+class CascadeLLM(LLMBase):
+    def __init__(self, small: LLMBase, large: LLMBase, small_tags: Iterable[str] = tuple(DEFAULT_VALIDATORS), validators: Optional[Dict[str, Validator]] = None):
+        """
+        Route tagged calls to a small model and escalate to the large one when the output looks wrong
+
+        Calls made inside call_tag(tag) with a tag in small_tags go to the small model first. The
+        call is repeated on the large model if the small one fails, returns an empty output, or
+        the validator of the tag rejects the output. All other calls go to the large model.
+
+        Args:
+            small: Fast, cheap model
+            large: Default model, also provides the embedding model
+            small_tags: Call tags served by the small model
+            validators: Output checks by tag, defaults to DEFAULT_VALIDATORS for the built-in call sites
+        """
+        super().__init__(large.model)
+        self.small = small
+        self.large = large
+        self.small_tags = set(small_tags)
+        self.validators = dict(DEFAULT_VALIDATORS)
+        self.validators.update(validators or {})
+        self.stats = {'small': TierStats(), 'large': TierStats()}
+        self.escalations_by_tag: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _call_tier(self, tier: str, llm: LLMBase, kwargs: Dict[str, Any]) -> Union[str, List[str]]:
+        start = time.perf_counter()
+        try:
+            return llm(**kwargs)
+        except Exception:
+            with self._lock:
+                self.stats[tier].errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.stats[tier].calls += 1
+                self.stats[tier].total_latency += time.perf_counter() - start
+            self._usage_local.usage = llm.get_last_usage()
+
+    def _accept(self, tag: str, output: Union[str, List[str]]) -> bool:
+        if not all(text and text.strip() for text in _outputs(output)):
+            return False
+        validator = self.validators.get(tag)
+        return validator is None or validator(output)
+
+    def __call__(self, messages: List[Dict[str, str]], model: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500, stop_strs: Optional[List[str]] = None, n: int = 1) -> Union[str, List[str]]:
+        # The model override names a model of the large tier, the small tier always uses its own
+        kwargs = {
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stop_strs': stop_strs,
+            'n': n
+        }
+        tag = current_call_tag()
+        if tag in self.small_tags:
+            try:
+                output = self._call_tier('small', self.small, kwargs)
+                if self._accept(tag, output):
+                    return output
+                logger.debug(f"Escalating {tag} call: small model output rejected")
+            except Exception as e:
+                logger.debug(f"Escalating {tag} call: small model failed with {e}")
+            with self._lock:
+                self.stats['small'].escalations += 1
+                self.escalations_by_tag[tag] = self.escalations_by_tag.get(tag, 0) + 1
+        return self._call_tier('large', self.large, dict(kwargs, model=model))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-tier call counts, errors, escalations and latency, plus escalations by tag."""
+        with self._lock:
+            return {
+                'small': self.stats['small'].to_dict(),
+                'large': self.stats['large'].to_dict(),
+                'escalations_by_tag': dict(self.escalations_by_tag)
+            }
+
+    def get_embedding_model(self):
+        return self.large.get_embedding_model()
@@ -0,0 +1,50 @@
+import re
+from typing import Callable
+
+
+def balanced_list_literal(text: str) -> bool:
+    """
+    Whether text contains a complete list literal, e.g. the ranked list "['a', 'b']"
+
+    Brackets inside quoted strings are ignored.
+    """
+    start = text.find('[')
+    if start < 0:
+        return False
+    depth = 0
+    quote = None
+    escaped = False
+    for char in text[start:]:
+        if quote is not None:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+            if depth == 0:
+                return True
+    return False
+
+
+def fields_complete(*fields: str) -> Callable[[str], bool]:
+    """
+    Predicate that fires once every "field: value" line has been emitted and terminated by a newline
+
+    Args:
+        fields: Field names, e.g. "stars", "review"
+
+    Returns:
+        Callable[[str], bool]: Stop predicate for LLMBase.stream_call
+    """
+    patterns = [re.compile(rf'^[ \t*#-]*{re.escape(field)}\s*:[^\n]*\S[^\n]*\n', re.IGNORECASE | re.MULTILINE) for field in fields]
+
+    def predicate(text: str) -> bool:
+        return all(pattern.search(text) for pattern in patterns)
+    return predicate
@@ -0,0 +1,95 @@
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+import tiktoken
+import logging
+
+logger = logging.getLogger("websocietysimulator")
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Encodings that could not be loaded (tiktoken downloads them on first use), not retried
+_unavailable_encodings: Set[str] = set()
+_unavailable_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = DEFAULT_ENCODING) -> tiktoken.Encoding:
+    """Load a tiktoken encoding once per process."""
+    return tiktoken.get_encoding(encoding_name)
+
+
+def _encode(text: str, encoding_name: str) -> List[int]:
+    # Special-token text (e.g. "<|endoftext|>") in user data is encoded as plain text instead of raising
+    return get_encoding(encoding_name).encode(text, disallowed_special=())
+
+
+def count_tokens(text: str, encoding_name: str = DEFAULT_ENCODING) -> int:
+    """
+    Count the tokens of a text
+
+    Args:
+        text: Text to count
+        encoding_name: tiktoken encoding, defaults to cl100k_base
+
+    Returns:
+        int: Number of tokens
+    """
+    return len(_encode(text, encoding_name))
+
+
+def truncate_tokens(text: str, max_tokens: int, encoding_name: str = DEFAULT_ENCODING) -> str:
+    """
+    Truncate a text to at most max_tokens tokens
+
+    Args:
+        text: Text to truncate
+        max_tokens: Maximum number of tokens to keep
+        encoding_name: tiktoken encoding, defaults to cl100k_base
+
+    Returns:
+        str: The text itself if it fits, otherwise its first max_tokens tokens
+    """
+    tokens = _encode(text, encoding_name)
+    if len(tokens) <= max_tokens:
+        return text
+    return get_encoding(encoding_name).decode(tokens[:max_tokens])
+
+
+def count_message_tokens(messages: List[Dict[str, str]], encoding_name: str = DEFAULT_ENCODING) -> int:
+    """Prompt tokens of a list of chat messages, including the per-message formatting overhead."""
+    return sum(count_tokens(str(message.get('content', '')), encoding_name) + 4 for message in messages)
+
+
+def _available_encoding(encoding_name: str) -> Optional[tiktoken.Encoding]:
+    with _unavailable_lock:
+        if encoding_name in _unavailable_encodings:
+            return None
+    try:
+        return get_encoding(encoding_name)
+    except Exception as e:
+        # Threads that tried to load the encoding at the same time all fail, only the first one warns
+        with _unavailable_lock:
+            if encoding_name in _unavailable_encodings:
+                return None
+            _unavailable_encodings.add(encoding_name)
+        logger.warning(f"tiktoken encoding {encoding_name} is unavailable ({e}), estimating 4 characters per token")
+        return None
+
+
+def estimate_tokens(text: str, encoding_name: str = DEFAULT_ENCODING) -> int:
+    """
+    Token count for accounting that must not fail
+
+    Exact if the tiktoken encoding can be loaded. Otherwise, e.g. offline without a cached
+    encoding, the count is estimated at 4 characters per token.
+    """
+    encoding = _available_encoding(encoding_name)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]], encoding_name: str = DEFAULT_ENCODING) -> int:
+    """count_message_tokens falling back to the estimate of estimate_tokens."""
+    return sum(estimate_tokens(str(message.get('content', '')), encoding_name) + 4 for message in messages)
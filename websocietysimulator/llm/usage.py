@@ -0,0 +1,109 @@
+import contextlib
+import contextvars
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from .tokenizer import estimate_message_tokens
+
+
+class TokenBudgetExceeded(RuntimeError):
+    """Raised before an LLM call that could exceed the token budget of the current task or run."""
+
+
+@dataclass
+class TokenUsage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    calls: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.total_tokens,
+            'calls': self.calls
+        }
+
+
+class UsageScope:
+    def __init__(self, name: str, budget: Optional[int] = None):
+        """
+        Token usage accumulated by the LLM calls made while the scope is active
+
+        Args:
+            name: Name used in budget errors, e.g. "run" or "task 3"
+            budget: Optional maximum number of total (prompt + completion) tokens
+        """
+        self.name = name
+        self.budget = budget
+        self.usage = TokenUsage()
+        self.exceeded = False
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether the budget is used up or a call was already refused."""
+        return self.exceeded or (self.budget is not None and self.usage.total_tokens >= self.budget)
+
+    def charge(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.usage.prompt_tokens += prompt_tokens
+            self.usage.completion_tokens += completion_tokens
+            self.usage.calls += 1
+
+    def check(self, estimated_tokens: int):
+        if self.budget is None:
+            return
+        with self._lock:
+            used = self.usage.total_tokens
+            if used + estimated_tokens > self.budget:
+                self.exceeded = True
+                raise TokenBudgetExceeded(
+                    f"Token budget of {self.name} would be exceeded: {used} of {self.budget} tokens used, "
+                    f"next call may need up to {estimated_tokens}"
+                )
+
+
+_scopes: contextvars.ContextVar[Tuple[UsageScope, ...]] = contextvars.ContextVar('llm_usage_scopes', default=())
+
+
+@contextlib.contextmanager
+def track_usage(*scopes: UsageScope):
+    """
+    Charge the LLM calls made inside the block to the given scopes, in addition to the enclosing ones
+
+    Scopes are context-local: threads started inside the block must enter them again.
+    """
+    token = _scopes.set(_scopes.get() + scopes)
+    try:
+        yield scopes[0] if len(scopes) == 1 else scopes
+    finally:
+        _scopes.reset(token)
+
+
+def current_scopes() -> Tuple[UsageScope, ...]:
+    return _scopes.get()
+
+
+def record_usage(prompt_tokens: int, completion_tokens: int):
+    """Charge the usage reported by the API to every active scope."""
+    for scope in _scopes.get():
+        scope.charge(prompt_tokens, completion_tokens)
+
+
+def check_token_budget(messages: List[Dict[str, Any]], max_tokens: int, n: int = 1):
+    """
+    Fail fast before a call whose prompt plus maximum completion could exceed an active budget
+
+    The prompt is only tokenized if a budget is active, see estimate_message_tokens.
+    """
+    scopes = [scope for scope in _scopes.get() if scope.budget is not None]
+    if not scopes:
+        return
+    estimated = estimate_message_tokens(messages) + max_tokens * n
+    for scope in scopes:
+        scope.check(estimated)
@@ -0,0 +1,56 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+
+def canonical_json(payload: Any) -> str:
+    """Serialize a payload deterministically so equal requests map to equal strings."""
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+def request_key(payload: Any) -> str:
+    """Content-addressed key (sha256 hex digest) of a canonicalized payload."""
+    return hashlib.sha256(canonical_json(payload).encode('utf-8')).hexdigest()
+
+
+def llm_request_payload(
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    stop_strs: Optional[List[str]],
+    n: int
+) -> Dict[str, Any]:
+    """
+    Build the canonical description of an LLM call
+
+    Args:
+        messages: List of input messages, each message is a dict containing role and content
+        model: Resolved model name
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens in response
+        stop_strs: Optional list of stop strings
+        n: Number of responses to generate
+
+    Returns:
+        Dict[str, Any]: Payload whose canonical JSON identifies the call
+    """
+    return {
+        'model': model,
+        'messages': [{'role': m.get('role'), 'content': m.get('content')} for m in messages],
+        'temperature': float(temperature),
+        'max_tokens': max_tokens,
+        'stop': list(stop_strs) if stop_strs else None,
+        'n': n,
+    }
+
+
+def embedding_request_payload(model: str, texts: List[str]) -> Dict[str, Any]:
+    """Canonical description of an embedding call."""
+    return {'model': model, 'texts': list(texts)}
+
+
+def embedding_model_name(embeddings: Any) -> str:
+    """Best-effort model name of a LangChain embeddings instance."""
+    name = getattr(embeddings, 'model', None) or getattr(embeddings, 'model_name', None)
+    return str(name) if name else type(embeddings).__name__
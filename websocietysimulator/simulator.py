@@ -6,6 +6,9 @@ from .tools import InteractionTool, CacheInteractionTool
 from .tools.evaluation_tool import RecommendationEvaluator, SimulationEvaluator
 from .agent.simulation_agent import SimulationAgent
 from .llm import LLMBase
+from .llm.batch import BatchLLM, OpenAIBatchClient
+from .llm.retry_policy import task_deadline
+from .llm.usage import TokenBudgetExceeded, TokenUsage, UsageScope, track_usage
 from .agent.recommendation_agent import RecommendationAgent
 from .tasks.simulation_task import SimulationTask
 from .tasks.recommendation_task import RecommendationTask
@@ -41,6 +44,7 @@ class Simulator:
         self.simulation_evaluator = SimulationEvaluator(device)
         self.simulation_outputs = []
         self.evaluation_results = []
+        self.run_usage = None
         logger.info("Simulator initialized")
 
     def set_interaction_tool(self, interaction_tool: Union[InteractionTool, CacheInteractionTool]):
@@ -120,7 +124,7 @@ class Simulator:
         self.llm = llm
         logger.info("LLM set")
 
-    def run_simulation(self, number_of_tasks: int = None, enable_threading: bool = False, max_workers: int = None, time_limitation: float = None) -> List[Any]:
+    def run_simulation(self, number_of_tasks: int = None, enable_threading: bool = False, max_workers: int = None, time_limitation: float = None, batch_client: OpenAIBatchClient = None, task_token_budget: int = None, run_token_budget: int = None) -> List[Any]:
         """
         Run the simulation with optional multi-threading support and time limitation.
         
@@ -129,8 +133,16 @@ class Simulator:
             enable_threading: Whether to enable multi-threading. Default is False.
             max_workers: Maximum number of threads to use. If None, will use min(32, number_of_tasks).
             time_limitation: Time limit in minutes. If None, no time limit is applied.
+            batch_client: Optional batch client. If given, the LLM calls of all agents are collected and
+                submitted through the batch endpoint round by round (see BatchLLM). Only suited to agents
+                making their LLM calls sequentially; enable_threading and time_limitation are ignored and
+                max_workers bounds the number of agents in flight (all tasks by default).
+            task_token_budget: Optional maximum total tokens per task. A call that could exceed it fails with TokenBudgetExceeded.
+            run_token_budget: Optional maximum total tokens of the whole run. Once exhausted, no further tasks are started.
         Returns:
-            List of outputs from agents for each scenario.
+            List of outputs from agents for each scenario. Every output includes the token usage of its task.
+            Tasks stopped or not started because of a token budget have 'budget_skipped' set and are
+            scored as failed tasks by evaluate().
         """
         import time
         from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
@@ -147,6 +159,12 @@ class Simulator:
         task_to_run = self.tasks[:number_of_tasks] if number_of_tasks is not None else self.tasks
         logger.info(f"Total tasks: {len(task_to_run)}")
 
+        run_scope = UsageScope("run", budget=run_token_budget)
+        self.run_usage = run_scope.usage
+
+        if batch_client is not None:
+            return self._run_batch_simulation(task_to_run, batch_client, max_workers, run_scope, task_token_budget)
+
         # 如果不启用多线程，使用原始的串行处理
         if not enable_threading:
             self.simulation_outputs = []
@@ -155,6 +173,10 @@ class Simulator:
                 if timeout_seconds and (time.time() - start_time) > timeout_seconds:
                     logger.warning(f"Time limit ({time_limitation} minutes) reached. Stopping simulation.")
                     break
+                if run_scope.exhausted:
+                    logger.warning(f"Task {index} skipped: run token budget ({run_token_budget}) exhausted")
+                    self.simulation_outputs.append(self._budget_skipped(task, "Run token budget exhausted"))
+                    continue
 
                 if isinstance(self.llm, list):
                     agent = self.agent_class(llm=self.llm[index%len(self.llm)])
@@ -162,18 +184,24 @@ class Simulator:
                     agent = self.agent_class(llm=self.llm)
                 agent.set_interaction_tool(self.interaction_tool)
                 agent.insert_task(task)
+                task_scope = UsageScope(f"task {index}", budget=task_token_budget)
                 
                 try:
-                    output = agent.workflow()
+                    with track_usage(run_scope, task_scope):
+                        output = agent.workflow()
                     result = {
                         "task": task.to_dict(),
-                        "output": output
+                        "output": output,
+                        "usage": task_scope.usage.to_dict()
                     }
                 except NotImplementedError:
                     result = {
                         "task": task.to_dict(),
                         "error": "Forward method not implemented by participant."
                     }
+                except TokenBudgetExceeded as e:
+                    logger.warning(f"Task {index} stopped: {str(e)}")
+                    result = self._budget_skipped(task, str(e), task_scope)
                 self.simulation_outputs.append(result)
                 logger.info(f"Simulation finished for task {index}")
         else:
@@ -187,14 +215,22 @@ class Simulator:
             def process_task(task_index_tuple):
                 from concurrent.futures import ThreadPoolExecutor, TimeoutError
                 
+                task_timeout = 300  # 5 minutes
+
                 def run_agent_task(agent, task):
-                    output = agent.workflow()
+                    # LLM retries give up once their backoff would outlive the task timeout
+                    with task_deadline(task_timeout), track_usage(run_scope, task_scope):
+                        output = agent.workflow()
                     return output
                 
                 index, task = task_index_tuple
                 # 检查是否已经被要求取消
                 if cancel_event.is_set():
                     return index, None
+                if run_scope.exhausted:
+                    logger.warning(f"Task {index} skipped: run token budget ({run_token_budget}) exhausted")
+                    return index, self._budget_skipped(task, "Run token budget exhausted")
+                task_scope = UsageScope(f"task {index}", budget=task_token_budget)
                     
                 if isinstance(self.llm, list):
                     agent = self.agent_class(llm=self.llm[index%len(self.llm)])
@@ -208,10 +244,11 @@ class Simulator:
                     with ThreadPoolExecutor(max_workers=1) as single_task_executor:
                         future = single_task_executor.submit(run_agent_task, agent, task)
                         try:
-                            output = future.result(timeout=300)  # 5 minutes timeout
+                            output = future.result(timeout=task_timeout)
                             result = {
                                 "task": task.to_dict(),
-                                "output": output
+                                "output": output,
+                                "usage": task_scope.usage.to_dict()
                             }
                         except TimeoutError:
                             logger.warning(f"Task {index} timed out")
@@ -224,6 +261,9 @@ class Simulator:
                         "task": task.to_dict(),
                         "error": "Forward method not implemented by participant."
                     }
+                except TokenBudgetExceeded as e:
+                    logger.warning(f"Task {index} stopped: {str(e)}")
+                    return index, self._budget_skipped(task, str(e), task_scope)
                 except Exception as e:
                     logger.error(f"Task {index} failed with error: {str(e)}")
                     return index, None
@@ -266,10 +306,66 @@ class Simulator:
                     executor.shutdown(wait=False)
                     raise TimeoutError
 
-        logger.info("Simulation finished")
+        logger.info(f"Simulation finished, token usage: {run_scope.usage.to_dict()}")
         # 过滤掉None值（未完成的任务）
         return self.simulation_outputs
 
+    def _run_batch_simulation(self, task_to_run: List[Any], batch_client: OpenAIBatchClient, max_workers: int, run_scope: UsageScope, task_token_budget: int = None) -> List[Any]:
+        """
+        Run all tasks with their LLM calls answered by batch submissions.
+        """
+        if isinstance(self.llm, list):
+            raise ValueError("Batch simulation needs a single LLM, not a list.")
+        batch_llm = BatchLLM(self.llm, batch_client)
+
+        task_scopes = [UsageScope(f"task {index}", budget=task_token_budget) for index in range(len(task_to_run))]
+
+        def make_job(task, task_scope):
+            def job():
+                if run_scope.exhausted:
+                    raise TokenBudgetExceeded("Run token budget exhausted")
+                agent = self.agent_class(llm=batch_llm)
+                agent.set_interaction_tool(self.interaction_tool)
+                agent.insert_task(task)
+                with track_usage(run_scope, task_scope):
+                    return agent.workflow()
+            return job
+
+        outcomes = batch_llm.run([make_job(task, task_scope) for task, task_scope in zip(task_to_run, task_scopes)], max_workers=max_workers)
+        self.simulation_outputs = []
+        for index, (task, (output, error)) in enumerate(zip(task_to_run, outcomes)):
+            if error is None:
+                result = {
+                    "task": task.to_dict(),
+                    "output": output,
+                    "usage": task_scopes[index].usage.to_dict()
+                }
+            elif isinstance(error, NotImplementedError):
+                result = {
+                    "task": task.to_dict(),
+                    "error": "Forward method not implemented by participant."
+                }
+            elif isinstance(error, TokenBudgetExceeded):
+                logger.warning(f"Task {index} stopped: {str(error)}")
+                result = self._budget_skipped(task, str(error), task_scopes[index])
+            else:
+                logger.error(f"Task {index} failed with error: {str(error)}")
+                result = None
+            self.simulation_outputs.append(result)
+
+        logger.info(f"Simulation finished with {batch_llm.batches_submitted} batches and {batch_llm.requests_submitted} requests, token usage: {run_scope.usage.to_dict()}")
+        return self.simulation_outputs
+
+    @staticmethod
+    def _budget_skipped(task, reason: str, task_scope: UsageScope = None) -> Dict[str, Any]:
+        """Output of a task stopped or never started because of a token budget."""
+        return {
+            "task": task.to_dict(),
+            "error": reason,
+            "budget_skipped": True,
+            "usage": task_scope.usage.to_dict() if task_scope is not None else TokenUsage().to_dict()
+        }
+
     def evaluate(self) -> Dict[str, Any]:
         """
         Evaluate the simulation results using the loaded groundtruth data.
@@ -292,27 +388,40 @@ class Simulator:
             self.simulation_outputs = self.simulation_outputs[:eval_count]
         else:
             groundtruth_data = self.groundtruth_data
+
+        # Tasks stopped by a token budget have no output, they are scored as failed tasks
+        outputs = [
+            None if output is not None and output.get('budget_skipped') else output
+            for output in self.simulation_outputs
+        ]
+        budget_skipped_count = sum(1 for output in self.simulation_outputs if output is not None and output.get('budget_skipped'))
+        if budget_skipped_count:
+            logger.warning(f"{budget_skipped_count} tasks stopped by a token budget are scored as failed")
         
         evaluation_results = {}
         
         # 根据agent类型选择评估方法
         if issubclass(self.agent_class, RecommendationAgent):
-            evaluation_results = self._evaluate_recommendation(groundtruth_data)
+            evaluation_results = self._evaluate_recommendation(groundtruth_data, outputs)
         elif issubclass(self.agent_class, SimulationAgent):
-            evaluation_results = self._evaluate_simulation(groundtruth_data)
+            evaluation_results = self._evaluate_simulation(groundtruth_data, outputs)
         
         # 添加数据条目信息到评估结果中
         evaluation_results['data_info'] = {
-            'evaluated_count': eval_count if sim_count != gt_count else sim_count,
+            'evaluated_count': len(groundtruth_data),
+            'budget_skipped_count': budget_skipped_count,
             'original_simulation_count': sim_count,
             'original_ground_truth_count': gt_count
         }
         
+        if self.run_usage is not None:
+            evaluation_results['usage'] = self.run_usage.to_dict()
+
         self.evaluation_results.append(evaluation_results)
         logger.info("Evaluation finished")
         return evaluation_results
 
-    def _evaluate_recommendation(self, ground_truth_data: List[Dict]) -> Dict[str, Any]:
+    def _evaluate_recommendation(self, ground_truth_data: List[Dict], outputs: List[Any]) -> Dict[str, Any]:
         """
         Evaluate recommendation results using groundtruth
         """
@@ -320,7 +429,7 @@ class Simulator:
         gt_pois = [item['ground truth'] for item in ground_truth_data]
         
         pred_pois = []
-        for output in self.simulation_outputs:
+        for output in outputs:
             if output is not None:
                 pred_pois.append(output['output'])
             else:
@@ -337,12 +446,12 @@ class Simulator:
             'metrics': metrics.__dict__,
         }
 
-    def _evaluate_simulation(self, ground_truth_data: List[Dict]) -> Dict[str, Any]:
+    def _evaluate_simulation(self, ground_truth_data: List[Dict], outputs: List[Any]) -> Dict[str, Any]:
         """
         Evaluate simulation results
         """
         simulated_data = []
-        for output in self.simulation_outputs:
+        for output in outputs:
             if output is not None:
                 simulated_data.append(output['output'])
             else:
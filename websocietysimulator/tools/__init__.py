@@ -1,5 +1,6 @@
 from .interaction_tool import InteractionTool
 from .evaluation_tool import RecommendationEvaluator, SimulationEvaluator
 from .cache_interaction_tool import CacheInteractionTool
+from .review_embedding_index import ReviewEmbeddingIndex
 
-__all__ = ['InteractionTool', 'RecommendationEvaluator', 'SimulationEvaluator', 'CacheInteractionTool']
\ No newline at end of file
+__all__ = ['InteractionTool', 'RecommendationEvaluator', 'SimulationEvaluator', 'CacheInteractionTool', 'ReviewEmbeddingIndex']
\ No newline at end of file
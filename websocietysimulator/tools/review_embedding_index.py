@@ -0,0 +1,171 @@
+import logging
+import os
+import json
+import numpy as np
+from typing import Optional, Dict, List, Tuple, Any, Iterator
+from tqdm import tqdm
+from ..agent.modules.vector_store import normalize, top_k
+from ..llm.utils import embedding_model_name
+
+logger = logging.getLogger("websocietysimulator")
+
+
+def _source_signature(data_dir: str) -> Dict[str, int]:
+    stat = os.stat(os.path.join(data_dir, 'review.json'))
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class ReviewEmbeddingIndex:
+    def __init__(self, index_dir: str, embeddings: Any = None):
+        """
+        Load a review embedding index built with ReviewEmbeddingIndex.build.
+
+        The vectors are memory-mapped, so processes sharing the index share the pages and only the
+        rows of the items that are queried are read from disk.
+
+        Args:
+            index_dir: Directory written by build
+            embeddings: Embeddings for query texts, must be the model the index was built with
+        """
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as file:
+            self.meta = json.load(file)
+        with open(os.path.join(index_dir, 'review_ids.json'), 'r', encoding='utf-8') as file:
+            self.review_ids: List[str] = json.load(file)
+        with open(os.path.join(index_dir, 'items.json'), 'r', encoding='utf-8') as file:
+            # item_id -> [first row, end row], the reviews of an item are stored contiguously
+            self.item_rows: Dict[str, List[int]] = json.load(file)
+        self.vectors = np.memmap(
+            os.path.join(index_dir, 'vectors.f32'),
+            dtype=np.float32,
+            mode='r',
+            shape=(self.meta['count'], self.meta['dim'])
+        )
+        self.review_rows = {review_id: row for row, review_id in enumerate(self.review_ids)}
+        self.embeddings = embeddings
+        if embeddings is not None and embedding_model_name(embeddings) != self.model:
+            raise ValueError(
+                f"Index was built with {self.model}, queries would be embedded with {embedding_model_name(embeddings)}"
+            )
+
+    @property
+    def model(self) -> str:
+        """Name of the embedding model the vectors were computed with."""
+        return self.meta['model']
+
+    @classmethod
+    def load(cls, data_dir: str, embeddings: Any = None, index_dir: Optional[str] = None) -> "ReviewEmbeddingIndex":
+        """Load the index of a dataset directory, warning when review.json changed since the build."""
+        index = cls(index_dir or os.path.join(data_dir, 'review_embeddings'), embeddings)
+        if index.meta.get('source') != _source_signature(data_dir):
+            logger.warning(f"review.json in {data_dir} changed since the review embedding index was built")
+        return index
+
+    @classmethod
+    def build(cls, data_dir: str, embeddings: Any, index_dir: Optional[str] = None, batch_size: int = 1024) -> "ReviewEmbeddingIndex":
+        """
+        Embed every review in review.json once and write the index.
+
+        review.json is read twice: once for the ids that fix the row of every review, then again
+        to embed the texts batch by batch, so no more than batch_size texts are held in memory.
+
+        Args:
+            data_dir: Path to the directory containing Yelp dataset files
+            embeddings: LangChain embeddings used for the review texts
+            index_dir: Output directory, defaults to <data_dir>/review_embeddings
+            batch_size: Reviews per embed_documents call
+
+        Returns:
+            ReviewEmbeddingIndex: The loaded index
+        """
+        index_dir = index_dir or os.path.join(data_dir, 'review_embeddings')
+        os.makedirs(index_dir, exist_ok=True)
+        logger.info(f"Building review embedding index in {index_dir}")
+
+        ids = [(review['item_id'], review['review_id']) for review in cls._iter_reviews(data_dir)]
+        if not ids:
+            raise ValueError(f"No reviews found in {data_dir}")
+        # Rows are sorted by item so the reviews of an item are one contiguous block
+        order = sorted(range(len(ids)), key=lambda i: ids[i][0])
+        rows = np.empty(len(ids), dtype=np.int64)
+        rows[order] = np.arange(len(ids))
+        review_ids = [ids[i][1] for i in order]
+        item_rows: Dict[str, List[int]] = {}
+        for row, i in enumerate(order):
+            item_rows.setdefault(ids[i][0], [row, row])[1] = row + 1
+        del ids, order
+
+        vectors_path = os.path.join(index_dir, 'vectors.f32')
+        vectors = None
+        start = 0
+        for texts in tqdm(cls._iter_text_batches(data_dir, batch_size), total=-(-len(rows) // batch_size)):
+            batch = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+            if vectors is None:
+                vectors = np.memmap(vectors_path, dtype=np.float32, mode='w+', shape=(len(rows), batch.shape[1]))
+            vectors[rows[start:start + len(batch)]] = normalize(batch)
+            start += len(batch)
+        vectors.flush()
+        dim = vectors.shape[1]
+        del vectors
+
+        with open(os.path.join(index_dir, 'review_ids.json'), 'w', encoding='utf-8') as file:
+            json.dump(review_ids, file)
+        with open(os.path.join(index_dir, 'items.json'), 'w', encoding='utf-8') as file:
+            json.dump(item_rows, file)
+        # Written last, an interrupted build leaves no meta.json and cannot be loaded
+        with open(os.path.join(index_dir, 'meta.json'), 'w', encoding='utf-8') as file:
+            json.dump({
+                'model': embedding_model_name(embeddings),
+                'dim': dim,
+                'count': len(review_ids),
+                'source': _source_signature(data_dir)
+            }, file)
+        return cls(index_dir, embeddings)
+
+    @staticmethod
+    def _iter_reviews(data_dir: str) -> Iterator[Dict]:
+        with open(os.path.join(data_dir, 'review.json'), 'r', encoding='utf-8') as file:
+            for line in file:
+                yield json.loads(line)
+
+    @classmethod
+    def _iter_text_batches(cls, data_dir: str, batch_size: int) -> Iterator[List[str]]:
+        batch = []
+        for review in cls._iter_reviews(data_dir):
+            batch.append(review['text'])
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def get_vector(self, review_id: str) -> Optional[np.ndarray]:
+        """Normalized vector of a review."""
+        row = self.review_rows.get(review_id)
+        return None if row is None else np.array(self.vectors[row])
+
+    def item_vectors(self, item_id: str) -> Tuple[List[str], np.ndarray]:
+        """Review ids of an item and their normalized vectors, in the same order."""
+        start, end = self.item_rows.get(item_id, (0, 0))
+        return self.review_ids[start:end], np.array(self.vectors[start:end])
+
+    def similar_reviews(self, item_id: str, query_text: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Reviews of an item closest to a query text.
+
+        Args:
+            item_id: Item whose reviews are searched
+            query_text: Text embedded with the index's embeddings
+            k: Number of reviews to return
+
+        Returns:
+            List[Tuple[str, float]]: Review ids with their cosine similarity, most similar first
+        """
+        if self.embeddings is None:
+            raise ValueError("similar_reviews needs the embeddings the index was built with")
+        start, end = self.item_rows.get(item_id, (0, 0))
+        if start == end:
+            return []
+        query = normalize(np.asarray(self.embeddings.embed_query(query_text), dtype=np.float32))
+        scores = self.vectors[start:end] @ query
+        return [(self.review_ids[start + i], float(scores[i])) for i in top_k(scores, k)]